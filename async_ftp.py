@@ -0,0 +1,291 @@
+import asyncio
+import re
+import ssl
+from ftplib import error_perm, error_proto, error_reply, error_temp
+from ftp_operations import parse_mlsd_line
+from list_parser import ListParser, server_dialects
+
+BLOCK_SIZE = 64 * 1024
+# Size of the StreamReader buffer for data connections
+DATA_LIMIT = 1024 * 1024
+
+
+class AsyncFTP:
+    """FTP client on asyncio streams, the coroutine counterpart of ftplib.FTP.
+
+    One event loop can drive many of these at once, each costing a pair
+    of sockets and a few buffers instead of an OS thread. Replies raise
+    the same ftplib error classes, so callers can treat failures alike.
+    Data connections use EPSV, falling back to PASV, and are wrapped in
+    TLS after prot_p(). Works on any asyncio loop, qasync's included.
+    """
+
+    def __init__(self, encoding="utf-8", timeout=None):
+        self.encoding = encoding
+        self.timeout = timeout
+        self.host = None
+        self.port = None
+        self.reader = None
+        self.writer = None
+        self.ssl_context = None
+        self.data_ssl = False
+        self.use_epsv = True
+        self.welcome = None
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, credentials, remote_path="/", ssl_context=None):
+        ftp = cls()
+        await ftp.connect(credentials["server"], credentials["port"])
+        if ssl_context is not None:
+            await ftp.auth_tls(ssl_context)
+        await ftp.login(credentials["username"], credentials["password"])
+        if ssl_context is not None:
+            await ftp.prot_p()
+        if remote_path != "/":
+            await ftp.cwd(remote_path)
+        return ftp
+
+    # Control channel
+
+    async def connect(self, host, port=21):
+        self.host = host
+        self.port = port
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+        self.welcome = await self.getresp()
+        return self.welcome
+
+    async def getresp(self):
+        line = await self.readline()
+        if line[3:4] == "-":
+            code = line[:3]
+            lines = [line]
+            while True:
+                line = await self.readline()
+                lines.append(line)
+                if line[:3] == code and line[3:4] == " ":
+                    break
+            line = "\n".join(lines)
+        code = line[:1]
+        if code in "123":
+            return line
+        if code == "4":
+            raise error_temp(line)
+        if code == "5":
+            raise error_perm(line)
+        raise error_proto(line)
+
+    async def readline(self):
+        line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        if not line:
+            raise EOFError("Connection closed by the server.")
+        return line.decode(self.encoding).rstrip("\r\n")
+
+    async def send(self, cmd):
+        self.writer.write(f"{cmd}\r\n".encode(self.encoding))
+        await self.writer.drain()
+
+    async def sendcmd(self, cmd):
+        async with self.lock:
+            await self.send(cmd)
+            return await self.getresp()
+
+    async def voidcmd(self, cmd):
+        resp = await self.sendcmd(cmd)
+        if resp[:1] != "2":
+            raise error_reply(resp)
+        return resp
+
+    async def login(self, user="anonymous", passwd=""):
+        resp = await self.sendcmd(f"USER {user}")
+        if resp[:1] == "3":
+            resp = await self.sendcmd(f"PASS {passwd}")
+        if resp[:1] != "2":
+            raise error_reply(resp)
+        return resp
+
+    async def auth_tls(self, ssl_context=None):
+        """Switch the control connection to TLS (AUTH TLS), before login."""
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        resp = await self.voidcmd("AUTH TLS")
+        await self.writer.start_tls(self.ssl_context, server_hostname=self.host)
+        return resp
+
+    async def prot_p(self):
+        """Protect data connections with TLS as well."""
+        await self.voidcmd("PBSZ 0")
+        resp = await self.voidcmd("PROT P")
+        self.data_ssl = True
+        return resp
+
+    # Data channel
+
+    async def passive_address(self):
+        if self.use_epsv:
+            try:
+                resp = await self.sendcmd("EPSV")
+                return self.host, int(re.search(r"\(([^\d])\1\1(\d+)\1\)", resp).group(2))
+            except (error_perm, AttributeError):
+                self.use_epsv = False
+        resp = await self.sendcmd("PASV")
+        numbers = re.search(r"(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)", resp)
+        if numbers is None:
+            raise error_proto(resp)
+        # Like ftplib, connect to the control host rather than the advertised
+        # address, which is often private behind NAT
+        return self.host, int(numbers.group(5)) * 256 + int(numbers.group(6))
+
+    async def transfercmd(self, cmd, rest=None):
+        """Open a data connection for `cmd` and return its (reader, writer).
+
+        Like ftplib, the connection is made in plain text and only wrapped
+        in TLS once the server has accepted `cmd`; servers such as vsftpd
+        do not start the data handshake before that.
+        """
+        host, port = await self.passive_address()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, limit=DATA_LIMIT), self.timeout)
+        try:
+            if rest:
+                resp = await self.sendcmd(f"REST {rest}")
+                if resp[:1] != "3":
+                    raise error_reply(resp)
+            resp = await self.sendcmd(cmd)
+            if resp[:1] != "1":
+                raise error_reply(resp)
+            if self.data_ssl:
+                await asyncio.wait_for(writer.start_tls(self.ssl_context, server_hostname=self.host), self.timeout)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def close_data(self, writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+    async def voidresp(self):
+        async with self.lock:
+            resp = await self.getresp()
+        if resp[:1] != "2":
+            raise error_reply(resp)
+        return resp
+
+    # Operations
+
+    async def iter_listing(self, path):
+        """Yield a FileEntry per item of `path` (MLSD, or LIST when it is missing)."""
+        await self.voidcmd("TYPE A")
+        parser = None
+        try:
+            reader, writer = await self.transfercmd(f"MLSD {path}")
+            parse = parse_mlsd_line
+        except error_perm:
+            reader, writer = await self.transfercmd(f"LIST {path}")
+            parser = ListParser(server_dialects.get((self.host, self.port)))
+            parse = parser.parse
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                entry = parse(line.decode(self.encoding).rstrip("\r\n"))
+                if entry:
+                    yield entry
+        finally:
+            await self.close_data(writer)
+        await self.voidresp()
+        if parser is not None and parser.dialect is not None:
+            server_dialects[(self.host, self.port)] = parser.dialect
+
+    async def list(self, path="/"):
+        return [entry async for entry in self.iter_listing(path)]
+
+    async def size(self, file_name):
+        await self.voidcmd("TYPE I")
+        resp = await self.sendcmd(f"SIZE {file_name}")
+        return int(resp[3:].strip()) if resp[:3] == "213" else None
+
+    async def download(self, file_name, local_path, callback=None, offset=0):
+        """Save `file_name` to `local_path`; `callback` gets the number of bytes received by each step."""
+        await self.voidcmd("TYPE I")
+        reader, writer = await self.transfercmd(f"RETR {file_name}", offset)
+        try:
+            with open(local_path, "r+b" if offset else "wb") as f:
+                f.seek(offset)
+                f.truncate()
+                while True:
+                    data = await reader.read(BLOCK_SIZE)
+                    if not data:
+                        break
+                    f.write(data)
+                    if callback:
+                        callback(len(data))
+        finally:
+            await self.close_data(writer)
+        return await self.voidresp()
+
+    async def upload(self, local_path, file_name, callback=None, offset=0):
+        """Send `local_path` as `file_name`; `callback` gets the number of bytes sent by each step."""
+        await self.voidcmd("TYPE I")
+        with open(local_path, "rb") as f:
+            f.seek(offset)
+            reader, writer = await self.transfercmd(f"STOR {file_name}", offset)
+            try:
+                while True:
+                    data = f.read(BLOCK_SIZE)
+                    if not data:
+                        break
+                    writer.write(data)
+                    await writer.drain()
+                    if callback:
+                        callback(len(data))
+                if writer.can_write_eof():
+                    writer.write_eof()
+            finally:
+                await self.close_data(writer)
+        return await self.voidresp()
+
+    async def delete(self, file_name):
+        resp = await self.sendcmd(f"DELE {file_name}")
+        if resp[:3] not in ("250", "200"):
+            raise error_reply(resp)
+        return resp
+
+    async def rename(self, from_name, to_name):
+        resp = await self.sendcmd(f"RNFR {from_name}")
+        if resp[:1] != "3":
+            raise error_reply(resp)
+        return await self.voidcmd(f"RNTO {to_name}")
+
+    async def mkd(self, path):
+        return await self.voidcmd(f"MKD {path}")
+
+    async def rmd(self, path):
+        return await self.voidcmd(f"RMD {path}")
+
+    async def cwd(self, path):
+        return await self.voidcmd(f"CWD {path}")
+
+    async def pwd(self):
+        resp = await self.voidcmd("PWD")
+        match = re.search(r'"((?:[^"]|"")*)"', resp)
+        return match.group(1).replace('""', '"') if match else ""
+
+    async def quit(self):
+        try:
+            return await self.voidcmd("QUIT")
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
\ No newline at end of file
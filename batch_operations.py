@@ -0,0 +1,261 @@
+import posixpath
+import re
+import threading
+from file_entries import DIR
+from ftp_operations import iter_listing, make_remote_dirs, pipeline
+
+# Items handed to one session at a time; each chunk goes out as pipelined windows
+CHUNK_SIZE = 256
+
+
+class BatchCancelled(Exception):
+    pass
+
+
+def chunks(items, size=CHUNK_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def depth(path):
+    return posixpath.normpath(path).count("/")
+
+
+def rename_plan(names, pattern, replacement, existing=()):
+    """(old, new) pairs for the `names` whose new name differs.
+
+    `pattern` is a regular expression replaced by `replacement` (which may
+    use \\1 style groups). Raises ValueError for a bad pattern, an empty or
+    path-like result, or when two items would end up with the same name or
+    one would replace an item that is not being renamed.
+    """
+    try:
+        regex = re.compile(pattern)
+        plan = [(name, regex.sub(replacement, name)) for name in names]
+    except (re.error, IndexError) as e:
+        raise ValueError(f"Invalid pattern: {e}")
+    plan = [(old, new) for old, new in plan if new != old]
+    targets = set()
+    sources = {old for old, _ in plan}
+    for old, new in plan:
+        if not new or "/" in new or new in (".", ".."):
+            raise ValueError(f"{old} would be renamed to an invalid name: {new!r}")
+        if new in targets:
+            raise ValueError(f"More than one item would be renamed to {new}")
+        if new in sources or new in existing:
+            raise ValueError(f"{old} would replace the existing item {new}")
+        targets.add(new)
+    return plan
+
+
+class RemoteBatch:
+    """Runs a metadata operation over many remote items on pooled sessions.
+
+    Work is split into tasks that up to `sessions` threads take from a
+    shared list, each on its own session from the TransferQueue's pool,
+    with commands sent as pipelined windows. An item that fails is
+    recorded in `errors` and the rest carry on; on_finished is called once
+    at the end. `done` counts the items handled successfully.
+    """
+
+    # Past tense of the operation, for reports
+    action = "processed"
+
+    def __init__(self, queue, credentials, on_finished=None, sessions=4):
+        self.queue = queue
+        self.credentials = credentials
+        self.on_finished = on_finished
+        self.sessions = sessions
+        self.done = 0
+        self.errors = []
+        self.error = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        try:
+            self.execute(self.queue.session_pool(self.credentials))
+            if self.cancelled:
+                raise BatchCancelled()
+        except BatchCancelled:
+            self.error = "Operation cancelled."
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            if self.on_finished:
+                self.on_finished(self)
+
+    def execute(self, pool):
+        raise NotImplementedError
+
+    def succeeded(self, count=1):
+        with self.lock:
+            self.done += count
+
+    def failed(self, path, error):
+        with self.lock:
+            self.errors.append((path, str(error)))
+
+    def check_results(self, paths, results):
+        """Record the pipelined reply of each path."""
+        done = 0
+        for path, result in zip(paths, results):
+            if isinstance(result, Exception):
+                self.failed(path, result)
+            else:
+                done += 1
+        self.succeeded(done)
+
+    def run_tasks(self, pool, tasks, handler):
+        """Call handler(ftp, task) for every task, on up to `sessions` sessions at once.
+
+        The handler may return further tasks, which are queued too. If it
+        raises, every path of the task is marked failed and the session,
+        which may be broken, is closed.
+        """
+        pending = list(tasks)
+        busy = [0]
+        condition = threading.Condition()
+
+        def work():
+            ftp = None
+            try:
+                while True:
+                    with condition:
+                        while not pending and busy[0]:
+                            condition.wait()
+                        if not pending or self.cancelled:
+                            return
+                        task = pending.pop()
+                        busy[0] += 1
+                    more = []
+                    try:
+                        if ftp is None:
+                            ftp = pool.acquire()
+                        more = handler(ftp, task) or []
+                    except Exception as e:
+                        for path in task if isinstance(task, list) else [task]:
+                            self.failed(path, e)
+                        if ftp is not None:
+                            pool.release(ftp, discard=True)
+                            ftp = None
+                    with condition:
+                        pending.extend(more)
+                        busy[0] -= 1
+                        condition.notify_all()
+            finally:
+                with condition:
+                    condition.notify_all()
+                if ftp is not None:
+                    pool.release(ftp)
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(max(1, self.sessions))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+class RemoteDelete(RemoteBatch):
+    """Deletes remote files and whole directory trees (rm -r).
+
+    Directories are listed in parallel first. Then all files are deleted,
+    and finally the directories, deepest first so each is empty by then.
+    """
+
+    action = "deleted"
+
+    def __init__(self, queue, credentials, files=(), directories=(), on_finished=None, sessions=4):
+        super().__init__(queue, credentials, on_finished, sessions)
+        self.files = list(files)
+        self.directories = list(directories)
+
+    def execute(self, pool):
+        files = list(self.files)
+        directories = list(self.directories)
+        found = threading.Lock()
+
+        def walk(ftp, path):
+            subdirs = []
+            for entry in iter_listing(ftp, path):
+                child = posixpath.join(path, entry.name)
+                with found:
+                    if entry.kind == DIR:
+                        directories.append(child)
+                        subdirs.append(child)
+                    else:
+                        files.append(child)
+            return subdirs
+
+        self.run_tasks(pool, self.directories, walk)
+        # A directory that could not be listed is reported already; removing it could only fail again
+        unlisted = {path for path, error in self.errors}
+        directories = [path for path in directories if path not in unlisted]
+        self.run_tasks(pool, chunks(files), self.send("DELE"))
+        for level in sorted({depth(path) for path in directories}, reverse=True):
+            self.run_tasks(pool, chunks([path for path in directories if depth(path) == level]), self.send("RMD"))
+
+    def send(self, verb):
+        def handler(ftp, paths):
+            self.check_results(paths, pipeline(ftp, [f"{verb} {path}" for path in paths]))
+        return handler
+
+
+class RemoteRename(RemoteBatch):
+    """Renames many items of one remote directory, as (old, new) name pairs."""
+
+    action = "renamed"
+
+    def __init__(self, queue, credentials, directory, renames, on_finished=None, sessions=4):
+        super().__init__(queue, credentials, on_finished, sessions)
+        self.directory = directory
+        self.renames = list(renames)
+        self.renamed = []
+
+    def execute(self, pool):
+        self.run_tasks(pool, chunks(self.renames), self.rename)
+
+    def rename(self, ftp, pairs):
+        commands = []
+        for old, new in pairs:
+            commands.append(f"RNFR {posixpath.join(self.directory, old)}")
+            commands.append(f"RNTO {posixpath.join(self.directory, new)}")
+        results = pipeline(ftp, commands)
+        for (old, new), source, target in zip(pairs, results[::2], results[1::2]):
+            # RNTO is refused after a failed RNFR, so report the RNFR reply then
+            error = source if isinstance(source, Exception) else target
+            if isinstance(error, Exception):
+                self.failed(old, error)
+            else:
+                with self.lock:
+                    self.renamed.append((old, new))
+                self.succeeded()
+
+
+class RemoteMakeDirs(RemoteBatch):
+    """Creates remote directories with their missing parents (mkdir -p)."""
+
+    action = "created"
+
+    def __init__(self, queue, credentials, paths, on_finished=None, sessions=4):
+        super().__init__(queue, credentials, on_finished, sessions)
+        self.paths = list(paths)
+
+    def execute(self, pool):
+        self.run_tasks(pool, self.paths, self.make)
+
+    def make(self, ftp, path):
+        make_remote_dirs(ftp, path)
+        self.succeeded()
\ No newline at end of file
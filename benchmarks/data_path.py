@@ -0,0 +1,95 @@
+"""Compare ftplib's stock transfer loops with the client's data path.
+
+Uploads and downloads a file over loopback to a pyftpdlib server running
+in a separate process, and reports wall time and the CPU time spent by
+the client process alone. Requires pyftpdlib (pip install pyftpdlib).
+
+    python benchmarks/data_path.py --size 512
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from ftplib import FTP
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ftp_operations import download_file, upload_file
+
+MB = 1024 * 1024
+
+
+def serve(root, ready):
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import FTPServer
+
+    logging.basicConfig(level=logging.WARNING)
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("bench", "bench", root, perm="elradfmwMT")
+    FTPHandler.authorizer = authorizer
+    server = FTPServer(("127.0.0.1", 0), FTPHandler)
+    ready.put(server.address[1])
+    server.serve_forever(handle_exit=False)
+
+
+def timed(label, func, size):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    func()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    print(f"{label:<20} {wall:7.2f} s {size / MB / wall:9.1f} MB/s   client CPU {cpu:6.2f} s"
+          f" ({cpu / (size / MB) * 1000:.2f} ms/MB)")
+
+
+def stock_upload(ftp, path, name):
+    with open(path, "rb") as f:
+        ftp.storbinary(f"STOR {name}", f)
+
+
+def stock_download(ftp, path, name):
+    with open(path, "wb") as f:
+        ftp.retrbinary(f"RETR {name}", f.write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=512, help="file size in MB")
+    args = parser.parse_args()
+    size = args.size * MB
+
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as local:
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(root, ready), daemon=True)
+        server.start()
+        port = ready.get()
+
+        source = os.path.join(local, "source.bin")
+        with open(source, "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(MB))
+
+        ftp = FTP()
+        ftp.connect("127.0.0.1", port)
+        ftp.login("bench", "bench")
+        ftp.voidcmd("TYPE I")
+        target = os.path.join(local, "target.bin")
+        try:
+            timed("ftplib upload", lambda: stock_upload(ftp, source, "a.bin"), size)
+            timed("sendfile upload", lambda: upload_file(ftp, source, "b.bin"), size)
+            timed("ftplib download", lambda: stock_download(ftp, target, "a.bin"), size)
+            timed("recv_into download", lambda: download_file(ftp, target, "b.bin"), size)
+            with open(source, "rb") as a, open(target, "rb") as b:
+                if a.read() != b.read():
+                    print("Downloaded copy differs from the source!")
+        finally:
+            ftp.close()
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
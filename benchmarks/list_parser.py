@@ -0,0 +1,77 @@
+"""Time the LIST parser on generated 100k-line listings of each dialect.
+
+Compares it with the whitespace-splitting parser it replaced, which only
+handled Unix listings (and dropped times, links and leading spaces).
+
+    python benchmarks/list_parser.py --lines 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_entries import FileEntry, DIR, FILE
+from list_parser import ListParser
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def split_parser(line):
+    parts = line.split()
+    if len(parts) < 6:
+        return None
+    is_dir = parts[0].startswith('d')
+    name = ' '.join(parts[8:])
+    size = int(parts[4]) if parts[4].isdigit() and not is_dir else None
+    return FileEntry(name, size, None, DIR if is_dir else FILE, parts[0])
+
+
+def unix_lines(count):
+    for i in range(count):
+        kind = "d" if i % 10 == 0 else "-"
+        when = f"{i % 24:02d}:{i % 60:02d}" if i % 3 else f" {2000 + i % 20}"
+        yield f"{kind}rw-r--r--  1 owner group {i * 37:>10} {MONTHS[i % 12]} {1 + i % 28:>2} {when} file_{i:06d}.dat"
+
+
+def dos_lines(count):
+    for i in range(count):
+        size = "<DIR>         " if i % 10 == 0 else f"{i * 37:>14}"
+        yield f"{1 + i % 12:02d}-{1 + i % 28:02d}-{i % 100:02d}  {1 + i % 12:02d}:{i % 60:02d}{'AM' if i % 2 else 'PM'} {size} file_{i:06d}.dat"
+
+
+def vms_lines(count):
+    for i in range(count):
+        name = f"SUB{i:06d}.DIR" if i % 10 == 0 else f"FILE{i:06d}.DAT"
+        yield f"{name};1   {i % 500}/{i % 500 + 3}   {1 + i % 28}-{MONTHS[i % 12].upper()}-2004 11:24:53  [GROUP,OWNER]  (RWED,RWED,RE,)"
+
+
+def eplf_lines(count):
+    for i in range(count):
+        kind = "/" if i % 10 == 0 else f"r,s{i * 37}"
+        yield f"+i8388621.{i},m{825718503 + i},{kind},\tfile_{i:06d}.dat"
+
+
+def timed(label, parse, lines):
+    start = time.perf_counter()
+    entries = [entry for entry in map(parse, lines) if entry is not None]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:6.3f} s  {len(lines) / elapsed:>11,.0f} lines/s  {len(entries):>7} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000)
+    args = parser.parse_args()
+
+    unix = list(unix_lines(args.lines))
+    timed("unix (split parser)", split_parser, unix)
+    timed("unix (detected)", ListParser().parse, unix)
+    timed("unix (known dialect)", ListParser("unix").parse, unix)
+    for label, lines in (("dos", dos_lines), ("vms", vms_lines), ("eplf", eplf_lines)):
+        timed(label, ListParser().parse, list(lines(args.lines)))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Compare single-stream and segmented downloads on a local pyftpdlib server.
+
+Each control reply is delayed by --latency and every data connection is
+capped at --stream-limit, which mimics the per-stream ceiling of a
+high-latency link. Requires pyftpdlib (pip install pyftpdlib).
+
+    python benchmarks/segmented_download.py --size 64 --latency 50 --stream-limit 8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler, ThrottledDTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+from ftp_operations import download_file, remote_size
+from segmented_download import MAX_SEGMENTS, download_segmented
+from session_pool import SessionPool
+
+MB = 1024 * 1024
+
+
+def start_server(root, latency, stream_limit):
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("bench", "bench", root, perm="elradfmwMT")
+
+    class DelayedDTPHandler(ThrottledDTPHandler):
+        write_limit = stream_limit
+
+    class DelayedHandler(FTPHandler):
+        dtp_handler = DelayedDTPHandler
+
+        def respond(self, resp, logfun=None):
+            time.sleep(latency)
+            super().respond(resp)
+
+    DelayedHandler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), DelayedHandler)
+    threading.Thread(target=server.serve_forever, kwargs={"handle_exit": False}, daemon=True).start()
+    return server
+
+
+def timed(label, func, size):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:8.2f} s {size / MB / elapsed:8.2f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=64, help="file size in MB")
+    parser.add_argument("--latency", type=float, default=50, help="delay per control reply in ms")
+    parser.add_argument("--stream-limit", type=float, default=8, help="MB/s cap per data connection")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as target:
+        with open(os.path.join(root, "big.bin"), "wb") as f:
+            f.write(os.urandom(args.size * MB))
+
+        server = start_server(root, args.latency / 1000, int(args.stream_limit * MB))
+        credentials = {"server": "127.0.0.1", "port": server.address[1], "username": "bench", "password": "bench"}
+        pool = SessionPool(credentials, MAX_SEGMENTS)
+        ftp = pool.acquire()
+        size = remote_size(ftp, "big.bin")
+
+        single = timed("single", lambda: download_file(ftp, os.path.join(target, "single.bin"), "big.bin"), size)
+        segmented = timed(
+            f"{MAX_SEGMENTS} segments",
+            lambda: download_segmented(ftp, pool, "/", "big.bin", os.path.join(target, "segmented.bin"), size, int),
+            size,
+        )
+        print(f"speedup      {single / segmented:8.2f}x")
+        with open(os.path.join(target, "single.bin"), "rb") as a, open(os.path.join(target, "segmented.bin"), "rb") as b:
+            assert a.read() == b.read(), "segmented copy differs"
+
+        pool.release(ftp)
+        pool.close()
+        server.close_all()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
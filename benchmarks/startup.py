@@ -0,0 +1,141 @@
+"""Measure time-to-first-window and time-to-first-listing of the GUI against a local pyftpdlib server.
+
+Each control reply is delayed by --latency to mimic a remote server. The
+login dialog is filled in as a user would, --typing seconds pass before
+Connect is clicked, and the main window is timed until the remote
+listing is on screen. The serial figure is the network work the client
+used to do before showing its window: log in on one connection, then log
+in again on another and list. Runs offscreen unless QT_QPA_PLATFORM is
+set. Requires PyQt5 and pyftpdlib.
+
+    python benchmarks/startup.py --latency 50 --typing 2 --repeat 5
+"""
+import time
+
+started = time.perf_counter()
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+import client
+from ftp_operations import iter_listing, open_connection
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+from session_pool import close_session
+
+imported = time.perf_counter()
+
+
+def start_server(root, latency):
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("bench", "bench", root, perm="elr")
+
+    class DelayedHandler(FTPHandler):
+        def respond(self, resp, logfun=None):
+            time.sleep(latency)
+            super().respond(resp)
+
+    DelayedHandler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), DelayedHandler)
+    threading.Thread(target=server.serve_forever, kwargs={"handle_exit": False}, daemon=True).start()
+    return server
+
+
+def process_until(app, condition, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("The listing did not arrive in time.")
+        app.processEvents(QEventLoop.AllEvents, 5)
+    return time.perf_counter()
+
+
+def idle(app, seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents(QEventLoop.AllEvents, 5)
+
+
+def serial(credentials):
+    start = time.perf_counter()
+    main = open_connection(credentials)
+    lister = open_connection(credentials)
+    list(iter_listing(lister, "/"))
+    elapsed = time.perf_counter() - start
+    close_session(main)
+    close_session(lister)
+    return elapsed
+
+
+def fast(app, credentials, typing):
+    dialog = client.LoginWindow()
+    dialog.server_input.setText(credentials["server"])
+    dialog.port_input.setText(str(credentials["port"]))
+    dialog.username_input.setText(credentials["username"])
+    dialog.password_input.setText(credentials["password"])
+    dialog.show()
+    # Leaving the server and port fields is what starts the early connection
+    dialog.preconnect()
+    idle(app, typing)
+
+    clicked = time.perf_counter()
+    dialog.on_connect()
+    window = client.MainWindow()
+    window.show()
+    shown = time.perf_counter()
+    window.connect_ftp(credentials["server"], credentials["port"], credentials["username"],
+                       credentials["password"], preconnector=dialog.preconnector)
+    listed = process_until(app, lambda: window.remote_path_label.text() == "Remote Dir: /")
+    window.remote_lister.shutdown()
+    window.transfer_engine.shutdown()
+    window.ftp.close()
+    window.close()
+    return shown - clicked, listed - clicked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=50, help="delay per control reply in ms")
+    parser.add_argument("--typing", type=float, default=2, help="seconds between filling in the server and Connect")
+    parser.add_argument("--entries", type=int, default=500, help="items in the listed directory")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    app = QApplication(sys.argv)
+    dialog = client.LoginWindow()
+    dialog.show()
+    first_window = process_until(app, dialog.isVisible)
+    dialog.close()
+    print(f"imports      {(imported - started) * 1000:8.1f} ms")
+    print(f"login window {(first_window - started) * 1000:8.1f} ms after start")
+
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(args.entries):
+            open(os.path.join(root, f"file{i:05}.txt"), "w").close()
+        server = start_server(root, args.latency / 1000)
+        credentials = {"server": "127.0.0.1", "port": server.address[1], "username": "bench", "password": "bench"}
+
+        serial_times = [serial(credentials) for _ in range(args.repeat)]
+        results = [fast(app, credentials, args.typing) for _ in range(args.repeat)]
+        server.close_all()
+
+    print(f"after Connect, median of {args.repeat}:")
+    print(f"main window  {statistics.median(shown for shown, _ in results) * 1000:8.1f} ms")
+    print(f"listing      {statistics.median(listed for _, listed in results) * 1000:8.1f} ms"
+          f"   (serial connect and list: {statistics.median(serial_times) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
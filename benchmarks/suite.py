@@ -0,0 +1,354 @@
+"""Benchmark listing and transfer paths against a local pyftpdlib server.
+
+Every scenario runs in its own process, so the CPU time and peak RSS it
+reports belong to the client alone. With --rtt or --bandwidth, the
+client talks to the server through a local proxy that delays and
+throttles both the control and the data connections (PASV and EPSV
+replies are rewritten to point at the proxy). Results are printed as
+JSON; with --baseline, a result that got worse by more than --tolerance
+is reported and the exit status is 1. Requires pyftpdlib.
+
+    python benchmarks/suite.py --quick
+    python benchmarks/suite.py --rtt 40 --bandwidth 20 --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ftp_operations import open_connection, list_remote, upload_file, download_file
+from transfer_queue import TransferQueue, TransferJob, UPLOAD, DOWNLOAD, DONE
+
+MB = 1024 * 1024
+SCENARIOS = ("list_1k", "list_100k", "small_upload", "small_download", "huge_upload", "huge_download")
+# Metrics where a larger value is better; for all others smaller is better
+HIGHER_IS_BETTER = {"ops_per_s", "throughput_mb_s"}
+COMPARED = ("ops_per_s", "throughput_mb_s", "p50_ms", "p99_ms", "cpu_s", "peak_rss_mb")
+
+
+# Server and proxy
+
+def serve(root, ready):
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import FTPServer
+
+    logging.basicConfig(level=logging.WARNING)
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("bench", "bench", root, perm="elradfmwMT")
+    FTPHandler.authorizer = authorizer
+    server = FTPServer(("127.0.0.1", 0), FTPHandler)
+    ready.put(server.address[1])
+    server.serve_forever(handle_exit=False)
+
+
+class Link:
+    """One direction of a proxied connection: delays each chunk by `delay`
+    seconds and caps the rate at `rate` bytes per second."""
+
+    def __init__(self, delay, rate):
+        self.delay = delay
+        self.rate = rate
+
+    async def pump(self, reader, writer, read=None):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(64)
+
+        async def receive():
+            while True:
+                data = await (read() if read else reader.read(64 * 1024))
+                await queue.put((loop.time() + self.delay, data))
+                if not data:
+                    return
+
+        async def send():
+            while True:
+                due, data = await queue.get()
+                if due > loop.time():
+                    await asyncio.sleep(due - loop.time())
+                if not data:
+                    if writer.can_write_eof():
+                        writer.write_eof()
+                    return
+                writer.write(data)
+                await writer.drain()
+                if self.rate:
+                    await asyncio.sleep(len(data) / self.rate)
+
+        try:
+            await asyncio.gather(receive(), send())
+        except (ConnectionError, OSError):
+            pass
+
+
+class Proxy:
+    def __init__(self, server_port, rtt, bandwidth):
+        self.server_port = server_port
+        self.link = Link(rtt / 2, bandwidth)
+
+    async def start(self):
+        server = await asyncio.start_server(self.control, "127.0.0.1", 0)
+        return server.sockets[0].getsockname()[1]
+
+    async def connect(self, client_reader, client_writer, port, rewrite=False):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def read_reply():
+            line = await server_reader.readline()
+            return await self.rewrite(line) if line else line
+
+        await asyncio.gather(
+            self.link.pump(client_reader, server_writer),
+            self.link.pump(server_reader, client_writer, read_reply if rewrite else None),
+        )
+        server_writer.close()
+        client_writer.close()
+
+    async def control(self, reader, writer):
+        await self.connect(reader, writer, self.server_port, rewrite=True)
+
+    async def rewrite(self, line):
+        text = line.decode("latin-1")
+        if text.startswith("227 "):
+            numbers = re.search(r"(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)", text)
+            port = await self.data_listener(int(numbers.group(5)) * 256 + int(numbers.group(6)))
+            return f"227 Entering passive mode (127,0,0,1,{port // 256},{port % 256}).\r\n".encode()
+        if text.startswith("229 "):
+            port = await self.data_listener(int(re.search(r"\|\|\|(\d+)\|", text).group(1)))
+            return f"229 Entering extended passive mode (|||{port}|).\r\n".encode()
+        return line
+
+    async def data_listener(self, target_port):
+        async def accept(reader, writer):
+            listener.close()
+            await self.connect(reader, writer, target_port)
+
+        listener = await asyncio.start_server(accept, "127.0.0.1", 0)
+        return listener.sockets[0].getsockname()[1]
+
+
+def run_proxy(server_port, rtt, bandwidth, ready):
+    async def main():
+        ready.put(await Proxy(server_port, rtt, bandwidth).start())
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+# Scenarios, each run in a child process
+
+def make_fixtures(root, local, args):
+    for name, count in (("list_1k", 1000), ("list_100k", args.list_entries)):
+        directory = os.path.join(root, name)
+        os.makedirs(directory)
+        for i in range(count):
+            open(os.path.join(directory, f"file_{i:06d}.txt"), "wb").close()
+
+    # Download scenarios read their own server-side copies, so any subset can run alone
+    for directory in (os.path.join(local, "small"), os.path.join(root, "small"), os.path.join(root, "uploads")):
+        os.makedirs(directory)
+    for i in range(args.small_files):
+        data = os.urandom(args.small_size)
+        for directory in (local, root):
+            with open(os.path.join(directory, "small", f"small_{i:05d}.bin"), "wb") as f:
+                f.write(data)
+
+    with open(os.path.join(local, "huge.bin"), "wb") as f, open(os.path.join(root, "huge.bin"), "wb") as g:
+        for _ in range(args.size):
+            data = os.urandom(MB)
+            f.write(data)
+            g.write(data)
+
+
+def listing(credentials, path, repeat):
+    ftp = open_connection(credentials)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list_remote(ftp, path)
+        latencies.append(time.perf_counter() - start)
+    ftp.close()
+    return {"ops": repeat, "latencies": latencies, "bytes": 0}
+
+
+def small_files(credentials, local, direction, jobs):
+    directory = os.path.join(local, "small")
+    names = sorted(os.listdir(directory))
+    queue = TransferQueue(jobs, jobs)
+    submitted = []
+    for name in names:
+        if direction == UPLOAD:
+            job = TransferJob(UPLOAD, os.path.join(directory, name), "/uploads", name, credentials)
+        else:
+            job = TransferJob(DOWNLOAD, os.path.join(local, "back_" + name), "/small", name, credentials)
+        queue.submit(job)
+        submitted.append(job)
+    queue.wait()
+    queue.shutdown()
+    failed = [job.error for job in submitted if job.status != DONE]
+    if failed:
+        raise RuntimeError(f"{len(failed)} transfer(s) failed: {failed[0]}")
+    return {
+        "ops": len(submitted),
+        "latencies": [job.elapsed for job in submitted],
+        "bytes": sum(job.transferred for job in submitted),
+    }
+
+
+def huge_file(credentials, local, direction):
+    ftp = open_connection(credentials)
+    start = time.perf_counter()
+    if direction == UPLOAD:
+        ftp.cwd("/uploads")
+        upload_file(ftp, os.path.join(local, "huge.bin"), "huge.bin", compress=False)
+    else:
+        download_file(ftp, os.path.join(local, "huge_back.bin"), "huge.bin", compress=False)
+    elapsed = time.perf_counter() - start
+    ftp.close()
+    return {"ops": 1, "latencies": [elapsed], "bytes": os.path.getsize(os.path.join(local, "huge.bin"))}
+
+
+def run_scenario(name, credentials, local, args):
+    if name == "list_1k":
+        return listing(credentials, "/list_1k", args.repeat)
+    if name == "list_100k":
+        return listing(credentials, "/list_100k", max(1, args.repeat // 5))
+    if name == "small_upload":
+        return small_files(credentials, local, UPLOAD, args.jobs)
+    if name == "small_download":
+        return small_files(credentials, local, DOWNLOAD, args.jobs)
+    if name == "huge_upload":
+        return huge_file(credentials, local, UPLOAD)
+    return huge_file(credentials, local, DOWNLOAD)
+
+
+def measure(name, credentials, local, args, results):
+    logging.basicConfig(level=logging.WARNING)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        result = run_scenario(name, credentials, local, args)
+    except Exception as e:
+        results.put({"error": str(e)})
+        return
+    wall = time.perf_counter() - wall
+    latencies = sorted(result.pop("latencies"))
+    results.put({
+        "wall_s": round(wall, 3),
+        "ops": result["ops"],
+        "ops_per_s": round(result["ops"] / wall, 2),
+        "throughput_mb_s": round(result["bytes"] / MB / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "cpu_s": round(time.process_time() - cpu, 3),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (MB if sys.platform == "darwin" else 1024), 1),
+    })
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, -(-len(values) * percent // 100) - 1))]
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, metrics in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "error" in metrics or "error" in old:
+            continue
+        for metric in COMPARED:
+            before, after = old.get(metric), metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (change < -tolerance) if metric in HIGHER_IS_BETTER else (change > tolerance):
+                found.append(f"{name}.{metric}: {before} -> {after} ({change:+.0%})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--rtt", type=float, default=0, help="round-trip time added by the proxy, in ms")
+    parser.add_argument("--bandwidth", type=float, default=0, help="per-connection cap in MB/s (0: none)")
+    parser.add_argument("--size", type=int, default=256, help="huge file size in MB")
+    parser.add_argument("--list-entries", type=int, default=100000)
+    parser.add_argument("--small-files", type=int, default=1000)
+    parser.add_argument("--small-size", type=int, default=4096, help="small file size in bytes")
+    parser.add_argument("--repeat", type=int, default=20, help="listings per listing scenario")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="parallel transfers for small files")
+    parser.add_argument("--quick", action="store_true", help="smaller defaults for a fast smoke run")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    if parser.parse_known_args()[0].quick:
+        parser.set_defaults(size=32, list_entries=10000, small_files=200, repeat=5)
+    args = parser.parse_args()
+    names = [name for name in args.scenarios.split(",") if name]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    processes = []
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as local:
+        make_fixtures(root, local, args)
+        try:
+            ready = multiprocessing.Queue()
+            processes.append(multiprocessing.Process(target=serve, args=(root, ready), daemon=True))
+            processes[-1].start()
+            port = ready.get()
+            if args.rtt or args.bandwidth:
+                processes.append(multiprocessing.Process(
+                    target=run_proxy, args=(port, args.rtt / 1000, args.bandwidth * MB, ready), daemon=True))
+                processes[-1].start()
+                port = ready.get()
+            credentials = {"server": "127.0.0.1", "port": port, "username": "bench", "password": "bench"}
+
+            results = {}
+            for name in names:
+                queue = multiprocessing.Queue()
+                child = multiprocessing.Process(target=measure, args=(name, credentials, local, args, queue))
+                child.start()
+                results[name] = queue.get()
+                child.join()
+                print(f"{name:<15} {json.dumps(results[name])}", file=sys.stderr)
+        finally:
+            for process in processes:
+                process.terminate()
+
+    report = {
+        "config": {key: getattr(args, key) for key in
+                   ("rtt", "bandwidth", "size", "list_entries", "small_files", "small_size", "repeat", "jobs")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failed = [name for name, result in results.items() if "error" in result]
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"regression: {line}", file=sys.stderr)
+        if found:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import queue
+import threading
+import zlib
+from ftplib import error_perm
+from ftp_operations import has_feature, remote_size, server_features
+
+BLOCK_SIZE = 1024 * 1024
+# Blocks a StreamHasher holds before update() waits for the worker to catch up
+QUEUED_BLOCKS = 16
+
+# Names used by the HASH command, mapped to hashlib's
+HASH_ALGORITHMS = {"SHA-256": "sha256", "SHA-512": "sha512", "SHA-1": "sha1", "MD5": "md5"}
+# Older per-algorithm commands, best first
+CHECKSUM_COMMANDS = (("SHA-256", "XSHA256"), ("SHA-512", "XSHA512"), ("SHA-1", "XSHA1"),
+                     ("MD5", "XMD5"), ("CRC32", "XCRC"))
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class Crc32:
+    """zlib.crc32 behind the update()/hexdigest() interface of hashlib."""
+
+    def __init__(self):
+        self.crc = 0
+
+    def update(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+
+    def hexdigest(self):
+        return f"{self.crc:08x}"
+
+
+def new_digest(algorithm):
+    return Crc32() if algorithm == "CRC32" else hashlib.new(HASH_ALGORITHMS[algorithm])
+
+
+def hash_algorithm(ftp):
+    """Algorithm HASH currently uses on this server, from its FEAT line ("HASH SHA-256*;MD5")."""
+    for feature in server_features(ftp):
+        if feature.startswith("HASH "):
+            names = feature[5:].split(";")
+            for name in names:
+                if name.endswith("*"):
+                    return name[:-1]
+            return names[0] if names else None
+    return None
+
+
+def checksum_algorithm(ftp):
+    """Best algorithm the server can checksum a whole file with, or None."""
+    algorithm = hash_algorithm(ftp)
+    if algorithm in HASH_ALGORITHMS:
+        return algorithm
+    for algorithm, command in CHECKSUM_COMMANDS:
+        if has_feature(ftp, command):
+            return algorithm
+    return None
+
+
+def remote_checksum(ftp, path, algorithm=None):
+    """Ask the server for a checksum of `path`.
+
+    Uses HASH when the server advertises it, else XSHA256, XMD5, XCRC and
+    the like; `algorithm` picks one of those instead of the best. Returns
+    (algorithm, lowercase hex digest), or None if the server offers no
+    checksum we can also compute locally.
+    """
+    try:
+        if algorithm is None:
+            algorithm = checksum_algorithm(ftp)
+        if algorithm is not None and algorithm == hash_algorithm(ftp):
+            # 213 SHA-256 0-49 169cd22282da7f147cb491e559e9dd path
+            parts = ftp.sendcmd(f"HASH {path}")[4:].split(" ", 3)
+            return algorithm, parts[2].lower()
+        command = dict(CHECKSUM_COMMANDS).get(algorithm)
+        if command is not None and has_feature(ftp, command):
+            digest = ftp.sendcmd(f"{command} {path}").split()[-1].lower()
+            return algorithm, digest.zfill(8) if algorithm == "CRC32" else digest
+    except (error_perm, IndexError):
+        pass
+    return None
+
+
+def local_checksum(path, algorithm):
+    digest = new_digest(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StreamHasher:
+    """Checksums the data of a transfer as it passes, on a worker thread.
+
+    update() hands a block over and returns at once; hashlib and zlib
+    release the GIL on large blocks, so hashing overlaps the network I/O
+    instead of adding a pass over the file afterwards. For a transfer
+    resumed at `offset`, the first `offset` bytes of `prefix_path` are
+    hashed first. close() must be called once the data has all been given.
+    """
+
+    def __init__(self, algorithm, prefix_path=None, offset=0):
+        self.algorithm = algorithm
+        self.digest = new_digest(algorithm)
+        self.blocks = queue.Queue(QUEUED_BLOCKS)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=(prefix_path, offset), daemon=True)
+        self.thread.start()
+
+    def update(self, data):
+        # Callers reuse their buffers, so keep a copy
+        self.blocks.put(bytes(data))
+
+    def run(self, prefix_path, offset):
+        try:
+            if offset:
+                with open(prefix_path, "rb") as f:
+                    while offset > 0:
+                        block = f.read(min(BLOCK_SIZE, offset))
+                        if not block:
+                            raise EOFError(f"{prefix_path} is shorter than the resumed part.")
+                        self.digest.update(block)
+                        offset -= len(block)
+        except (OSError, EOFError) as e:
+            self.error = e
+        # Keep taking blocks even after an error, so update() never blocks
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                break
+            self.digest.update(block)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.blocks.put(None)
+            self.thread.join()
+
+    def hexdigest(self):
+        self.close()
+        if self.error is not None:
+            raise self.error
+        return self.digest.hexdigest()
+
+
+def verify_transfer(ftp, local_path, remote_name, hasher=None):
+    """Check a finished transfer against the server.
+
+    The sizes must match, and with a `hasher` the server's checksum must
+    match its digest too. Raises ChecksumMismatch otherwise. Returns what
+    was compared: the algorithm, or "SIZE" when no checksum was to be had.
+    """
+    local = os.path.getsize(local_path)
+    remote = remote_size(ftp, remote_name)
+    if remote is not None and remote != local:
+        raise ChecksumMismatch(f"Size mismatch: {remote} bytes on the server, {local} bytes locally.")
+    expected = remote_checksum(ftp, remote_name, hasher.algorithm) if hasher is not None else None
+    if expected is None:
+        return "SIZE" if remote is not None else None
+    actual = hasher.hexdigest()
+    if actual != expected[1]:
+        raise ChecksumMismatch(f"{hasher.algorithm} mismatch: {expected[1]} on the server, {actual} locally.")
+    return hasher.algorithm
\ No newline at end of file
@@ -0,0 +1,314 @@
+"""Command-line FTP client sharing the GUI's transfer queue, without Qt.
+
+    python cli.py -H ftp.example.com -u user ls /pub
+    python cli.py -H ftp.example.com -u user -j 8 put build/ -d /site
+    python cli.py -H ftp.example.com -u user sync build /site --delete --dry-run
+    python cli.py -H ftp.example.com -u user rm -r /site/old /site/tmp
+    python cli.py -H ftp.example.com -u user batch script.txt
+
+The password is taken from -p or the FTP_PASSWORD environment variable.
+A batch script holds one command per line (without the connection
+options); transfers from all lines share the -j parallel jobs.
+"""
+import argparse
+import fnmatch
+import os
+import posixpath
+import shlex
+import sys
+import time
+from ftplib import error_perm
+from batch_operations import RemoteDelete, RemoteRename, RemoteMakeDirs, rename_plan
+from file_entries import DIR, PARENT, format_size
+from ftp_operations import open_connection, iter_listing
+from metrics import registry
+from mirror import TreeMirror
+from session_pool import close_session
+from sync import TreeSync
+from transfer_queue import TransferQueue, TransferListener, TransferJob, UPLOAD, DOWNLOAD
+
+
+class ConsoleListener(TransferListener):
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def job_finished(self, job):
+        self.done += 1
+        self.bytes += job.transferred - job.offset
+        if not self.quiet:
+            arrow = "put" if job.direction == UPLOAD else "get"
+            verified = f", {job.verified} verified" if job.verified else ""
+            print(f"{arrow} {posixpath.join(job.remote_path, job.remote_name)} "
+                  f"({format_size(job.transferred)}, {format_size(job.average_rate())}/s{verified})", flush=True)
+
+    def job_failed(self, job, message):
+        self.failed += 1
+        print(f"error: {posixpath.join(job.remote_path, job.remote_name)}: {message}", file=sys.stderr, flush=True)
+
+
+class Runner:
+    """Executes commands against one account; transfers go through a shared TransferQueue."""
+
+    def __init__(self, credentials, jobs=4, quiet=False, verify=False):
+        self.credentials = credentials
+        self.quiet = quiet
+        self.listener = ConsoleListener(quiet)
+        self.queue = TransferQueue(jobs, jobs, self.listener, verify=verify)
+        self.mirrors = []
+        self.batches = []
+        self.errors = 0
+        self.ftp = None
+
+    def session(self):
+        if self.ftp is None:
+            self.ftp = open_connection(self.credentials)
+        return self.ftp
+
+    def run(self, args):
+        getattr(self, "cmd_" + args.command)(args)
+
+    def finish(self):
+        """Wait for every queued transfer and walk; returns the number of failures."""
+        for mirror in self.mirrors:
+            mirror.wait()
+            if mirror.error:
+                self.error(f"{mirror.remote_path}: {mirror.error}")
+        for batch in self.batches:
+            batch.wait()
+            if not self.quiet:
+                print(f"{batch.done} item(s) {batch.action}", flush=True)
+            for path, message in batch.errors:
+                self.error(f"{path}: {message}")
+            if batch.error:
+                self.error(batch.error)
+        self.queue.wait()
+        self.queue.shutdown()
+        if self.ftp is not None:
+            close_session(self.ftp)
+        return self.errors + self.listener.failed
+
+    def error(self, message):
+        self.errors += 1
+        print(f"error: {message}", file=sys.stderr, flush=True)
+
+    def remote_is_dir(self, path):
+        ftp = self.session()
+        try:
+            ftp.cwd(path)
+            return True
+        except error_perm:
+            return False
+
+    def submit(self, direction, local_path, remote_path):
+        remote_dir, name = posixpath.split(remote_path)
+        self.queue.submit(TransferJob(direction, local_path, remote_dir or "/", name, self.credentials))
+
+    def mirror(self, direction, local_path, remote_path):
+        self.mirrors.append(TreeMirror(self.queue, self.credentials, direction, local_path, remote_path).start())
+
+    def cmd_ls(self, args):
+        for path in args.paths or ["/"]:
+            if len(args.paths) > 1:
+                print(f"{path}:")
+            for entry in sorted(iter_listing(self.session(), path), key=lambda e: (e.kind != DIR, e.name)):
+                if args.long:
+                    modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime)) if entry.mtime else ""
+                    size = "" if entry.kind == DIR else entry.size if entry.size is not None else "?"
+                    print(f"{entry.permissions or entry.kind:10} {size:>12} {modified:16} {entry.name}")
+                else:
+                    print(entry.name + ("/" if entry.kind == DIR else ""))
+
+    def cmd_get(self, args):
+        os.makedirs(args.output, exist_ok=True)
+        for remote_path in args.paths:
+            remote_path = posixpath.normpath(remote_path)
+            local_path = os.path.join(args.output, posixpath.basename(remote_path))
+            if self.remote_is_dir(remote_path):
+                self.mirror(DOWNLOAD, local_path, remote_path)
+            else:
+                self.submit(DOWNLOAD, local_path, remote_path)
+
+    def cmd_put(self, args):
+        for local_path in args.paths:
+            local_path = os.path.normpath(local_path)
+            remote_path = posixpath.join(args.directory, os.path.basename(local_path))
+            if os.path.isdir(local_path):
+                self.mirror(UPLOAD, local_path, remote_path)
+            elif os.path.isfile(local_path):
+                self.submit(UPLOAD, local_path, remote_path)
+            else:
+                self.error(f"{local_path}: no such file or directory")
+
+    def cmd_mirror(self, args):
+        self.mirror(DOWNLOAD if args.download else UPLOAD, args.local, args.remote)
+
+    def cmd_sync(self, args):
+        sync = TreeSync(self.queue, self.credentials, DOWNLOAD if args.download else UPLOAD, args.local, args.remote,
+                        dry_run=args.dry_run, delete=args.delete, use_hash=args.checksum).start()
+        self.mirrors.append(sync)
+        if args.dry_run:
+            sync.wait()
+            for action in sync.actions:
+                print(action)
+            print(f"{len(sync.actions)} change(s), {sync.skipped} file(s) up to date")
+
+    def run_batch(self, batch):
+        self.batches.append(batch.start())
+
+    def cmd_rm(self, args):
+        files, directories = [], []
+        for path in args.paths:
+            path = posixpath.normpath(path)
+            if not self.remote_is_dir(path):
+                files.append(path)
+            elif args.recursive:
+                directories.append(path)
+            else:
+                self.error(f"{path}: is a directory (use -r)")
+        if files or directories:
+            self.run_batch(RemoteDelete(self.queue, self.credentials, files, directories, sessions=self.queue.per_host))
+
+    def cmd_mkdir(self, args):
+        if args.parents:
+            self.run_batch(RemoteMakeDirs(self.queue, self.credentials, args.paths, sessions=self.queue.per_host))
+            return
+        for path in args.paths:
+            self.session().mkd(path)
+
+    def cmd_rename(self, args):
+        listed = [entry.name for entry in iter_listing(self.session(), args.directory) if entry.kind != PARENT]
+        names = listed
+        if args.include:
+            names = [name for name in listed if fnmatch.fnmatch(name, args.include)]
+        # Everything else in the directory, including what --include left out, must not be overwritten
+        plan = rename_plan(names, args.pattern, args.replacement, set(listed) - set(names))
+        for old, new in plan:
+            if args.dry_run or not self.quiet:
+                print(f"{old} -> {new}")
+        if not args.dry_run:
+            self.run_batch(RemoteRename(self.queue, self.credentials, args.directory, plan,
+                                        sessions=self.queue.per_host))
+
+    def cmd_batch(self, args):
+        script = sys.stdin if args.script == "-" else open(args.script, encoding="utf-8")
+        with script:
+            for number, line in enumerate(script, 1):
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                try:
+                    command = build_parser(batch=True).parse_args(words)
+                except (SystemExit, argparse.ArgumentError):
+                    self.error(f"{args.script}:{number}: invalid command: {line.strip()}")
+                    continue
+                if command.command == "batch":
+                    self.error(f"{args.script}:{number}: batch scripts cannot be nested")
+                    continue
+                try:
+                    self.run(command)
+                except Exception as e:
+                    self.error(f"{args.script}:{number}: {e}")
+
+
+def build_parser(batch=False):
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Transfer files over FTP without the GUI.",
+        exit_on_error=not batch,
+    )
+    if not batch:
+        parser.add_argument("-H", "--host", required=True, help="FTP server address")
+        parser.add_argument("-P", "--port", type=int, default=21)
+        parser.add_argument("-u", "--user", default="anonymous")
+        parser.add_argument("-p", "--password", help="defaults to $FTP_PASSWORD")
+        parser.add_argument("--tls", action="store_true", help="use FTPS (explicit TLS) for commands and data")
+        parser.add_argument("--insecure", action="store_true", help="with --tls, do not verify the server certificate")
+        parser.add_argument("-j", "--jobs", type=int, default=4, help="parallel transfers (default 4)")
+        parser.add_argument("-q", "--quiet", action="store_true", help="only report errors")
+        parser.add_argument("--verify", action="store_true",
+                            help="check each transfer against the server's checksum (or size) and retry mismatches")
+        parser.add_argument("--metrics", metavar="FILE", help="write command and transfer metrics (Prometheus text)")
+        parser.add_argument("--metrics-log", metavar="FILE", help="append every command and transfer as JSON lines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ls = commands.add_parser("ls", help="list remote directories")
+    ls.add_argument("-l", "--long", action="store_true")
+    ls.add_argument("paths", nargs="*")
+
+    get = commands.add_parser("get", help="download files or folders")
+    get.add_argument("-o", "--output", default=".", help="local directory (default: current)")
+    get.add_argument("paths", nargs="+")
+
+    put = commands.add_parser("put", help="upload files or folders")
+    put.add_argument("-d", "--directory", default="/", help="remote directory (default: /)")
+    put.add_argument("paths", nargs="+")
+
+    for name, help_text in (("mirror", "copy a whole folder"), ("sync", "copy only new and changed files")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("local")
+        command.add_argument("remote")
+        command.add_argument("--download", action="store_true", help="remote to local (default: local to remote)")
+        if name == "sync":
+            command.add_argument("--delete", action="store_true", help="remove items missing from the source")
+            command.add_argument("--dry-run", action="store_true", help="only report what would change")
+            command.add_argument("--checksum", action="store_true",
+                                 help="compare same-size files by server checksum when it looks older")
+
+    rm = commands.add_parser("rm", help="delete remote files or folders")
+    rm.add_argument("-r", "--recursive", action="store_true", help="delete folders with everything inside")
+    rm.add_argument("paths", nargs="+")
+
+    mkdir = commands.add_parser("mkdir", help="create remote folders")
+    mkdir.add_argument("-p", "--parents", action="store_true", help="create missing parent folders too")
+    mkdir.add_argument("paths", nargs="+")
+
+    rename = commands.add_parser("rename", help="rename the items of a remote folder by regular expression")
+    rename.add_argument("directory")
+    rename.add_argument("pattern", help="regular expression matched against each name")
+    rename.add_argument("replacement", help=r"replacement text; \1 refers to a group of the pattern")
+    rename.add_argument("-i", "--include", help="only names matching this wildcard, e.g. '*.jpg'")
+    rename.add_argument("--dry-run", action="store_true", help="only print the new names")
+
+    batch_command = commands.add_parser("batch", help="run commands from a script (- for stdin)")
+    batch_command.add_argument("script")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    credentials = {
+        "server": args.host,
+        "port": args.port,
+        "username": args.user,
+        "password": args.password if args.password is not None else os.environ.get("FTP_PASSWORD", ""),
+        "tls": args.tls,
+        "tls_verify": not args.insecure,
+    }
+    if args.metrics_log:
+        registry.log_to(args.metrics_log)
+    runner = Runner(credentials, max(1, args.jobs), args.quiet, args.verify)
+    started = time.monotonic()
+    try:
+        runner.run(args)
+        failures = runner.finish()
+    except KeyboardInterrupt:
+        runner.queue.shutdown()
+        return 130
+    except Exception as e:
+        runner.error(str(e))
+        runner.queue.shutdown()
+        return 1
+    finally:
+        if args.metrics:
+            registry.write_prometheus(args.metrics)
+    listener = runner.listener
+    if listener.done and not args.quiet:
+        print(f"{listener.done} file(s), {format_size(listener.bytes)} in {time.monotonic() - started:.1f} s"
+              + (f", {failures} error(s)" if failures else ""))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
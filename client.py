@@ -1,17 +1,34 @@
 import sys
 import os
-from ftplib import FTP, error_perm
-from ftp_operations import FTPClient
+import posixpath
+import ssl
+import threading
+import time
+from ftplib import error_perm
+from ftp_operations import FTPClient, parent_dirs
+from listing_cache import ListingCache, child_key
+from remote_lister import RemoteLister
+from session_pool import ReconnectingFTP, Preconnector, close_session
+from local_lister import LocalLister
+from transfer_engine import TransferEngine, UPLOAD, DOWNLOAD
+from transfer_queue import CANCELLED
+from transfer_panel import TransferPanel
+from file_entries import FileEntry, PARENT, format_size
+from sync import COPY, DELETE
+from batch_operations import RemoteDelete, RemoteRename, rename_plan
+from file_model import FileTableModel, FileFilterProxy, EntryRole, NAME
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout,
-    QListWidget, QAbstractItemView, QMessageBox, QLabel, QMenu, QAction, QLineEdit, QInputDialog, QPushButton,
-    QFormLayout, QDialog, QProgressDialog
+    QTableView, QHeaderView, QAbstractItemView, QMessageBox, QLabel, QMenu, QAction, QLineEdit, QInputDialog,
+    QPushButton, QFormLayout, QDialog, QCheckBox
 )
-from PyQt5.QtCore import Qt, QMimeData, pyqtSignal
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer, pyqtSignal
 
 class LoginWindow(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
+        # Connects to the server as soon as it is filled in, while the rest is typed
+        self.preconnector = Preconnector()
         self.setWindowTitle("FTP Login")
         self.resize(400, 200)
         layout = QVBoxLayout(self)
@@ -22,11 +39,22 @@ class LoginWindow(QDialog):
         self.username_input = QLineEdit("")
         self.password_input = QLineEdit("")
         self.password_input.setEchoMode(QLineEdit.Password)
+        self.tls_checkbox = QCheckBox("Use TLS (FTPS)")
+        self.verify_checkbox = QCheckBox("Verify certificate")
+        self.verify_checkbox.setChecked(True)
+        self.verify_checkbox.setEnabled(False)
+        self.tls_checkbox.toggled.connect(self.verify_checkbox.setEnabled)
+        self.server_input.editingFinished.connect(self.preconnect)
+        self.port_input.editingFinished.connect(self.preconnect)
+        self.tls_checkbox.toggled.connect(self.preconnect)
+        self.verify_checkbox.toggled.connect(self.preconnect)
 
         form_layout.addRow("Server:", self.server_input)
         form_layout.addRow("Port:", self.port_input)
         form_layout.addRow("Username:", self.username_input)
         form_layout.addRow("Password:", self.password_input)
+        form_layout.addRow("", self.tls_checkbox)
+        form_layout.addRow("", self.verify_checkbox)
 
         layout.addLayout(form_layout)
 
@@ -40,14 +68,14 @@ class LoginWindow(QDialog):
         layout.addLayout(button_layout)
 
     def on_connect(self):
-        self.progress_dialog = QProgressDialog("Connecting to FTP server...", "Cancel", 0, 0, self)
-        self.progress_dialog.setWindowTitle("Connecting")
-        self.progress_dialog.setWindowModality(Qt.WindowModal)
-        self.progress_dialog.setMinimumDuration(0)
-        self.progress_dialog.setCancelButton(None)
-        self.progress_dialog.setRange(0, 0)
+        self.preconnect()
         self.accept()
 
+    def preconnect(self):
+        credentials = self.get_credentials()
+        self.preconnector.start(credentials["server"], credentials["port"], credentials["tls"],
+                                credentials["tls_verify"])
+
     def get_credentials(self):
         default_port = 21
         port_text = self.port_input.text()
@@ -60,29 +88,123 @@ class LoginWindow(QDialog):
             "server": self.server_input.text(),
             "port": port,
             "username": self.username_input.text(),
-            "password": self.password_input.text()
+            "password": self.password_input.text(),
+            "tls": self.tls_checkbox.isChecked(),
+            "tls_verify": self.verify_checkbox.isChecked()
         }
 
-class DraggableListWidget(QListWidget):
-    double_clicked = pyqtSignal(str)
+class RenamePatternDialog(QDialog):
+    """Asks for a find/replace pattern and previews what it does to `names`."""
+
+    def __init__(self, names, existing, parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.existing = existing
+        self.plan = []
+        self.setWindowTitle("Rename by Pattern")
+        self.resize(450, 250)
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+        self.find_input = QLineEdit("")
+        self.find_input.setPlaceholderText(r"Regular expression, e.g. ^IMG_(\d+)")
+        self.replace_input = QLineEdit("")
+        self.replace_input.setPlaceholderText(r"e.g. photo_\1")
+        form_layout.addRow("Find:", self.find_input)
+        form_layout.addRow("Replace with:", self.replace_input)
+        layout.addLayout(form_layout)
+        self.preview_label = QLabel("")
+        self.preview_label.setWordWrap(True)
+        layout.addWidget(self.preview_label)
+        layout.addStretch()
+
+        button_layout = QHBoxLayout()
+        self.rename_button = QPushButton("Rename")
+        self.cancel_button = QPushButton("Cancel")
+        self.rename_button.clicked.connect(self.accept)
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.rename_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        self.find_input.textChanged.connect(self.update_preview)
+        self.replace_input.textChanged.connect(self.update_preview)
+        self.update_preview()
+
+    def update_preview(self):
+        try:
+            self.plan = rename_plan(self.names, self.find_input.text(), self.replace_input.text(), self.existing)
+        except ValueError as e:
+            self.plan = []
+            self.preview_label.setText(str(e))
+            self.rename_button.setEnabled(False)
+            return
+        shown = "\n".join(f"{old} → {new}" for old, new in self.plan[:5])
+        more = f"\n... and {len(self.plan) - 5} more" if len(self.plan) > 5 else ""
+        self.preview_label.setText(f"{len(self.plan)} of {len(self.names)} item(s) will be renamed"
+                                   + (f":\n{shown}{more}" if shown else "."))
+        self.rename_button.setEnabled(bool(self.plan))
+
+
+class FilePanel(QTableView):
+    double_clicked = pyqtSignal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.file_model = FileTableModel(self)
+        self.proxy = FileFilterProxy(self)
+        self.proxy.setSourceModel(self.file_model)
+        self.setModel(self.proxy)
         self.setDragDropMode(QAbstractItemView.DragDrop)
         self.setAcceptDrops(True)
         self.setDragEnabled(True)
-        self.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+        self.horizontalHeader().setSectionResizeMode(NAME, QHeaderView.Stretch)
+        self.horizontalHeader().setHighlightSections(False)
+        self.setSortingEnabled(True)
+        self.sortByColumn(NAME, Qt.AscendingOrder)
+        self.doubleClicked.connect(self.on_item_double_clicked)
+
+    def on_item_double_clicked(self, index):
+        self.double_clicked.emit(index.data(EntryRole))
+
+    def entry_at(self, pos):
+        index = self.indexAt(pos)
+        return index.data(EntryRole) if index.isValid() else None
+
+    def selected_entries(self):
+        return [index.data(EntryRole) for index in self.selectionModel().selectedRows()]
+
+    def entries_for_menu(self, item):
+        """The selection if `item` is part of it, otherwise just `item`; never the '..' row."""
+        selected = self.selected_entries()
+        entries = selected if item in selected else [item]
+        return [entry for entry in entries if entry.kind != PARENT]
+
+    def all_entries(self):
+        return self.file_model.entries
+
+    def set_entries(self, entries, show_parent=False):
+        self.file_model.set_entries(entries, show_parent)
 
-    def on_item_double_clicked(self, item):
-        text = item.text()
-        self.double_clicked.emit(text)
+    def append_entries(self, entries):
+        self.file_model.append_entries(entries)
 
-    def mimeData(self, items):
-        mime_data = QMimeData()
-        texts = [item.text() for item in items]
-        combined_text = "\n".join(texts)
-        mime_data.setText(combined_text)
-        return mime_data
+    def finish_entries(self):
+        self.file_model.finish_entries()
+
+    def refresh_rows(self):
+        self.file_model.refresh_rows()
+
+    def apply_changes(self, added, removed):
+        self.file_model.apply_changes(added, removed)
+
+    def set_filter(self, text):
+        self.proxy.set_pattern(text)
 
     def dragMoveEvent(self, event):
         event.acceptProposedAction()
@@ -106,17 +228,23 @@ class DraggableListWidget(QListWidget):
             event.acceptProposedAction()
             return
 
-        if mime_data.hasText():
-            dropped_text = mime_data.text().strip()
+        if isinstance(source_widget, FilePanel):
+            dropped = [entry for entry in source_widget.selected_entries() if entry.kind != PARENT]
             if self.objectName() == "localPanel" and source_widget.objectName() == "remotePanel":
-                main_window.download_file(dropped_text)
+                for entry in dropped:
+                    main_window.download_file(entry.name, entry.is_dir)
 
             elif self.objectName() == "remotePanel" and source_widget.objectName() == "localPanel":
-                main_window.upload_file(dropped_text)
+                for entry in dropped:
+                    main_window.upload_file(entry.name)
 
         event.acceptProposedAction()
 
 class MainWindow(QWidget):
+    # Result of the login made on a background thread: its token, and the session or the exception
+    logged_in = pyqtSignal(int, object)
+    login_failed = pyqtSignal(int, object)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("FTP Program")
@@ -131,7 +259,22 @@ class MainWindow(QWidget):
         self.btn_logout.setStyleSheet("background-color: #f44336; color: white; font-weight: bold;")
         self.btn_logout.clicked.connect(self.logout)
         top_bar.addWidget(self.btn_logout)
+        self.btn_sync = QPushButton("🔁 Sync")
+        self.btn_sync.clicked.connect(self.sync_directories)
+        top_bar.addWidget(self.btn_sync)
+        self.btn_transfers = QPushButton("📊 Transfers")
+        self.btn_transfers.setCheckable(True)
+        top_bar.addWidget(self.btn_transfers)
+        self.btn_search = QPushButton("🔍 Search")
+        self.btn_search.clicked.connect(self.open_search)
+        top_bar.addWidget(self.btn_search)
+        self.verify_check = QCheckBox("Verify transfers")
+        self.verify_check.setToolTip("Compare each copy with the server's checksum, or at least its size, "
+                                     "and transfer it again if they differ")
+        top_bar.addWidget(self.verify_check)
         top_bar.addStretch()
+        self.transfer_label = QLabel("")
+        top_bar.addWidget(self.transfer_label)
         main_layout.addLayout(top_bar)
         panels_layout = QHBoxLayout()
         main_layout.addLayout(panels_layout)
@@ -139,7 +282,7 @@ class MainWindow(QWidget):
         # Local
         left_panel = QVBoxLayout()
         self.local_path_label = QLabel("Local Dir:")
-        self.localList = DraggableListWidget()
+        self.localList = FilePanel()
         self.localList.setObjectName("localPanel")
         local_header = QHBoxLayout()
         self.local_path_label = QLabel("Local Dir:")
@@ -150,18 +293,22 @@ class MainWindow(QWidget):
         local_header.addWidget(self.btn_new_local_folder)
         local_header.addWidget(self.btn_refresh_local)
         left_panel.addLayout(local_header)
+        self.local_filter = QLineEdit()
+        self.local_filter.setPlaceholderText("Filter...")
+        self.local_filter.textChanged.connect(self.localList.set_filter)
+        left_panel.addWidget(self.local_filter)
         left_panel.addWidget(self.localList)
         panels_layout.addLayout(left_panel)
         left_panel.addWidget(self.local_path_label)
         left_panel.addWidget(self.localList)
         panels_layout.addLayout(left_panel)
         self.localList.double_clicked.connect(self.on_local_item_double_clicked)
-        self.btn_refresh_local.clicked.connect(lambda: FTPClient.refresh_local_list(self))
+        self.btn_refresh_local.clicked.connect(lambda: FTPClient.refresh_local_list(self, use_cache=False))
 
         # Server
         right_panel = QVBoxLayout()
         self.remote_path_label = QLabel("Remote Dir:")
-        self.remoteList = DraggableListWidget()
+        self.remoteList = FilePanel()
         self.remoteList.setObjectName("remotePanel")
         remote_header = QHBoxLayout()
         self.remote_path_label = QLabel("Remote Dir:")
@@ -172,13 +319,17 @@ class MainWindow(QWidget):
         remote_header.addWidget(self.btn_new_remote_folder)
         remote_header.addWidget(self.btn_refresh_remote)
         right_panel.addLayout(remote_header)
+        self.remote_filter = QLineEdit()
+        self.remote_filter.setPlaceholderText("Filter...")
+        self.remote_filter.textChanged.connect(self.remoteList.set_filter)
+        right_panel.addWidget(self.remote_filter)
         right_panel.addWidget(self.remoteList)
         panels_layout.addLayout(right_panel)
         right_panel.addWidget(self.remote_path_label)
         right_panel.addWidget(self.remoteList)
         panels_layout.addLayout(right_panel)
         self.remoteList.double_clicked.connect(self.on_remote_item_double_clicked)
-        self.btn_refresh_remote.clicked.connect(lambda: FTPClient.refresh_remote_list(self))
+        self.btn_refresh_remote.clicked.connect(lambda: FTPClient.refresh_remote_list(self, use_cache=False))
 
         # Menu
         self.localList.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -186,9 +337,46 @@ class MainWindow(QWidget):
         self.remoteList.setContextMenuPolicy(Qt.CustomContextMenu)
         self.remoteList.customContextMenuRequested.connect(self.show_remote_context_menu)
 
+        # Local scanning
+        self.local_previous_path = self.local_current_path
+        self.local_lister = LocalLister(self)
+        self.local_lister.listed.connect(self.on_local_listed)
+        self.local_lister.stats.connect(self.on_local_stats)
+        self.local_lister.changed.connect(self.on_local_changed)
+        self.local_lister.failed.connect(self.on_local_listing_failed)
+        self.local_watcher = QFileSystemWatcher(self)
+        self.local_watcher.directoryChanged.connect(self.on_local_directory_changed)
+        self.local_update_timer = QTimer(self)
+        self.local_update_timer.setSingleShot(True)
+        self.local_update_timer.setInterval(200)
+        self.local_update_timer.timeout.connect(lambda: FTPClient.update_local_list(self))
+
         # Connection
-        self.ftp = FTP()
+        self.ftp = ReconnectingFTP()
         self.login_credentials = {}
+        # Counts connect_ftp() calls; a login result with an older token belongs to a connection given up on
+        self.login_token = 0
+        self.listing_cache = ListingCache()
+        self.remote_previous_path = self.remote_current_path
+        self.remote_lister = RemoteLister(self)
+        self.remote_lister.batch.connect(self.on_remote_batch)
+        self.remote_lister.finished.connect(self.on_remote_listing_finished)
+        self.remote_lister.failed.connect(self.on_remote_listing_failed)
+        self.transfer_engine = TransferEngine(self)
+        self.transfer_engine.progress.connect(self.on_transfer_progress)
+        self.transfer_engine.finished.connect(self.on_transfer_finished)
+        self.transfer_engine.failed.connect(self.on_transfer_failed)
+        self.transfer_engine.mirror_finished.connect(self.on_mirror_finished)
+        self.transfer_engine.batch_finished.connect(self.on_batch_finished)
+        self.transfer_panel = TransferPanel(self.transfer_engine, self)
+        self.transfer_panel.setMaximumHeight(220)
+        self.transfer_panel.hide()
+        main_layout.addWidget(self.transfer_panel)
+        self.btn_transfers.toggled.connect(self.transfer_panel.setVisible)
+        self.search_dialog = None
+        self.verify_check.toggled.connect(self.transfer_engine.set_verify)
+        self.logged_in.connect(self.on_logged_in)
+        self.login_failed.connect(self.on_login_failed)
 
     def logout(self):
         reply = QMessageBox.question(
@@ -200,22 +388,28 @@ class MainWindow(QWidget):
         )
 
         if reply == QMessageBox.Yes:
-            try:
-                if self.ftp and self.ftp.sock:
-                    FTPClient.disconnect(self)
-            except:
-                pass
-            self.hide()
-
-            new_window, success = show_login_and_connect(self)
-            if success:
-                self.close()
-            else:
-                self.close()
-                QApplication.quit()
+            self.return_to_login()
+
+    def return_to_login(self):
+        self.login_token += 1
+        self.transfer_engine.shutdown()
+        self.remote_lister.shutdown()
+        try:
+            if self.ftp and self.ftp.sock:
+                FTPClient.disconnect(self)
+        except:
+            pass
+        self.hide()
+
+        new_window, success = show_login_and_connect(self)
+        if success:
+            self.close()
+        else:
+            self.close()
+            QApplication.quit()
 
     def show_local_context_menu(self, pos):
-        item = self.localList.itemAt(pos)
+        item = self.localList.entry_at(pos)
         if item:
             menu = QMenu()
             delete_action = QAction("Delete", self)
@@ -229,35 +423,41 @@ class MainWindow(QWidget):
             menu.exec_(self.localList.mapToGlobal(pos))
 
     def show_remote_context_menu(self, pos):
-        item = self.remoteList.itemAt(pos)
-        if item:
+        item = self.remoteList.entry_at(pos)
+        entries = self.remoteList.entries_for_menu(item) if item else []
+        if entries:
             menu = QMenu()
-            delete_action = QAction("Delete", self)
-            delete_action.triggered.connect(lambda: self.delete_remote_item(item))
+            delete_action = QAction("Delete" if len(entries) == 1 else f"Delete {len(entries)} Items", self)
+            delete_action.triggered.connect(lambda: self.delete_remote_items(entries))
 
-            rename_action = QAction("Rename", self)
-            rename_action.triggered.connect(lambda: self.rename_remote_item(item))
+            if len(entries) == 1:
+                rename_action = QAction("Rename", self)
+                rename_action.triggered.connect(lambda: self.rename_remote_item(item))
+            else:
+                rename_action = QAction("Rename by Pattern...", self)
+                rename_action.triggered.connect(lambda: self.rename_remote_items(entries))
 
             menu.addAction(rename_action)
             menu.addAction(delete_action)
             menu.exec_(self.remoteList.mapToGlobal(pos))
 
-    def on_local_item_double_clicked(self, text):
-        if text == "..":
+    def on_local_item_double_clicked(self, entry):
+        if entry.kind == PARENT:
             try:
                 parent = os.path.dirname(self.local_current_path)
                 if parent and parent != self.local_current_path:
+                    self.local_previous_path = self.local_current_path
                     self.local_current_path = parent
                     FTPClient.refresh_local_list(self)
             except Exception as ex:
                 QMessageBox.warning(self, "Error", f"Could not move to the parent directory.: {ex}")
-                return
+            return
 
-        if text.startswith("📁 "):
-            folder_name = text.replace("📁 ", "")
-            new_path = os.path.join(self.local_current_path, folder_name)
+        if entry.is_dir:
+            new_path = os.path.join(self.local_current_path, entry.name)
             try:
                 if os.path.isdir(new_path):
+                    self.local_previous_path = self.local_current_path
                     self.local_current_path = new_path
                     FTPClient.refresh_local_list(self)
                 else:
@@ -265,101 +465,331 @@ class MainWindow(QWidget):
             except Exception as ex:
                 QMessageBox.warning(self, "Error", f"Error: {ex}")
 
-    def on_remote_item_double_clicked(self, text):
-        if text == "..":
-            try:
-                self.ftp.cwd("..")
-                self.remote_current_path = self.ftp.pwd()
-                FTPClient.refresh_remote_list(self)
-            except Exception as ex:
-                QMessageBox.warning(self, "Error", f"Could not move to the parent directory.: {ex}")
+    def on_local_listed(self, path, entries):
+        if path == self.local_current_path:
+            self.localList.set_entries(entries, show_parent=True)
+
+    def on_local_stats(self, path, finished):
+        if path != self.local_current_path:
+            return
+        self.localList.refresh_rows()
+        if finished:
+            self.localList.finish_entries()
+            self.local_path_label.setText(f"Local Dir: {path}")
+
+    def on_local_changed(self, path, added, removed):
+        if path == self.local_current_path:
+            self.localList.apply_changes(added, removed)
+            self.localList.refresh_rows()
+            self.local_path_label.setText(f"Local Dir: {path}")
+
+    def on_local_listing_failed(self, path, message):
+        if path != self.local_current_path:
             return
+        QMessageBox.warning(self, "Error", f"Could not list {path}: {message}")
+        if self.local_previous_path != path:
+            self.local_current_path = self.local_previous_path
+            FTPClient.refresh_local_list(self)
 
-        if text.startswith("📁 "):
-            folder_name = text.replace("📁 ", "")
-            try:
-                self.ftp.cwd(folder_name)
-                self.remote_current_path = self.ftp.pwd()
-                FTPClient.refresh_remote_list(self)
-            except Exception as ex:
-                QMessageBox.warning(self, "Error", f"Error: {ex}")
+    def on_local_directory_changed(self, path):
+        if path == self.local_current_path:
+            self.local_update_timer.start()
 
-    def connect_ftp(self, server, port, username, password):
-        try:
-            self.login_credentials = {
-                "server": server,
-                "port": port,
-                "username": username,
-                "password": password
-            }
-
-            FTPClient.connect(self, server, port, username, password)
+    def on_remote_item_double_clicked(self, entry):
+        if entry.kind == PARENT:
+            self.remote_previous_path = self.remote_current_path
+            self.remote_current_path = posixpath.dirname(self.remote_current_path.rstrip("/")) or "/"
             FTPClient.refresh_remote_list(self)
-            FTPClient.refresh_local_list(self)
-            return True
+            return
 
-        except error_perm as e:
-            QMessageBox.critical(self, "Error", "Credentials could be wrong. Try again.")
-            return False
+        if entry.is_dir:
+            self.remote_previous_path = self.remote_current_path
+            self.remote_current_path = posixpath.join(self.remote_current_path, entry.name)
+            FTPClient.refresh_remote_list(self)
+
+    def show_remote_path(self, path):
+        self.remote_previous_path = self.remote_current_path
+        self.remote_current_path = path
+        FTPClient.refresh_remote_list(self)
+
+    def open_search(self):
+        if self.search_dialog is None:
+            # Loaded on first use, like the index it searches
+            from search_dialog import SearchDialog
+            self.search_dialog = SearchDialog(self.transfer_engine, self)
+            self.search_dialog.open_path.connect(self.show_remote_path)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def on_remote_batch(self, path, entries):
+        if path == self.remote_current_path:
+            self.remoteList.append_entries(entries)
+
+    def on_remote_listing_finished(self, path, entries):
+        self.listing_cache.put(FTPClient.remote_cache_key(self, path), entries)
+        if path == self.remote_current_path:
+            self.remoteList.finish_entries()
+            self.remote_path_label.setText(f"Remote Dir: {path}")
+        # Keep an indexed server's index current with what is browsed; until a
+        # search or crawl opens the index, browsing leaves it closed
+        index = self.transfer_engine.index
+        if index is not None and index.has_directory(self.login_credentials, path):
+            index.update_directory(self.login_credentials, path, entries)
+
+    def on_remote_listing_failed(self, path, message):
+        if path != self.remote_current_path:
+            return
+        QMessageBox.warning(self, "Error", f"Could not list {path}: {message}")
+        if self.remote_previous_path != path:
+            self.remote_current_path = self.remote_previous_path
+            FTPClient.refresh_remote_list(self)
 
+    def connect_ftp(self, server, port, username, password, tls=False, tls_verify=True, preconnector=None):
+        """Log in on a background thread; the window is usable meanwhile and fills in once it is done."""
+        self.login_credentials = {
+            "server": server,
+            "port": port,
+            "username": username,
+            "password": password,
+            "tls": tls,
+            "tls_verify": tls_verify
+        }
+        self.remote_path_label.setText(f"Remote Dir: {self.remote_current_path} (connecting...)")
+        # Transfers can be queued before the login is through; they log in on their own sessions
+        self.transfer_engine.set_credentials(self.login_credentials)
+        FTPClient.refresh_local_list(self)
+        preconnector = preconnector or Preconnector()
+        credentials = dict(self.login_credentials)
+        self.login_token += 1
+        threading.Thread(target=self.log_in,
+                         args=(self.login_token, preconnector, credentials, self.remote_current_path),
+                         daemon=True).start()
+
+    def log_in(self, token, preconnector, credentials, remote_path):
+        try:
+            ftp = preconnector.login(credentials, remote_path)
         except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not connect to FTP Server: {e}")
-            return False
+            self.login_failed.emit(token, e)
+            return
+        self.logged_in.emit(token, ftp)
+
+    def on_logged_in(self, token, ftp):
+        if token != self.login_token:
+            close_session(ftp)
+            return
+        # The session that just logged in lists the first directory; the
+        # long-lived session for commands connects alongside it
+        self.remote_lister.set_credentials(self.login_credentials, ftp)
+        FTPClient.refresh_remote_list(self)
+        self.ftp.open(self.login_credentials, self.remote_current_path)
+        resumed = self.transfer_engine.resume_pending()
+        if resumed:
+            self.transfer_label.setText(f"Resuming {len(resumed)} interrupted transfer(s)...")
+
+    def on_login_failed(self, token, error):
+        if token != self.login_token:
+            return
+        if isinstance(error, error_perm):
+            QMessageBox.critical(self, "Error", "Credentials could be wrong. Try again.")
+        elif isinstance(error, ssl.SSLCertVerificationError):
+            QMessageBox.critical(self, "Error",
+                                 f"The server's certificate could not be verified:\n{error.verify_message}")
+        else:
+            QMessageBox.critical(self, "Error", f"Could not connect to FTP Server: {error}")
+        self.return_to_login()
 
     def upload_file(self, filename):
-        clean_name = filename.replace("📁 ", "") if filename.startswith("📁 ") else filename
-        local_path = os.path.join(self.local_current_path, clean_name)
+        local_path = os.path.join(self.local_current_path, filename)
         if not os.path.exists(local_path):
             QMessageBox.warning(self, "Error", f"File not found.")
             return
 
-        try:
-            FTPClient.upload(self, local_path, clean_name)
-            FTPClient.refresh_remote_list(self)
-            QMessageBox.information(self, "Successful", f"{clean_name} has been uploaded successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Upload failed.:\n{e}")
+        self.upload_external_file(local_path)
 
     def upload_external_file(self, file_path):
-        filename = os.path.basename(file_path)
-        try:
-            FTPClient.upload(self, file_path, filename)
-            FTPClient.refresh_remote_list(self)
-            QMessageBox.information(self, "Successful", "File has been uploaded successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Upload failed.:\n{e}")
+        filename = os.path.basename(file_path.rstrip("/\\"))
+        if os.path.isdir(file_path):
+            remote_path = posixpath.join(self.remote_current_path, filename)
+            self.transfer_engine.mirror(UPLOAD, file_path, remote_path)
+            self.transfer_label.setText(f"Uploading folder {filename}...")
+            return
+        self.transfer_engine.upload(file_path, self.remote_current_path, filename)
 
-    def download_file(self, filename):
+    def download_file(self, filename, is_dir=False):
         local_path = os.path.join(self.local_current_path, filename)
-        try:
-            FTPClient.download(self, local_path, filename)
-            FTPClient.refresh_local_list(self)
-            QMessageBox.information(self, "Successful", "File has been downloaded successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Download failed:\n{e}")
+        if is_dir:
+            remote_path = posixpath.join(self.remote_current_path, filename)
+            self.transfer_engine.mirror(DOWNLOAD, local_path, remote_path)
+            self.transfer_label.setText(f"Downloading folder {filename}...")
+            return
+        self.transfer_engine.download(local_path, self.remote_current_path, filename)
+
+    def sync_directories(self):
+        box = QMessageBox(self)
+        box.setWindowTitle("Sync")
+        box.setText(f"Synchronize\n{self.local_current_path}\nand\n{self.remote_current_path}\n\n"
+                    "Only new and changed files are transferred.")
+        btn_upload = box.addButton("Local → Remote", QMessageBox.AcceptRole)
+        btn_download = box.addButton("Remote → Local", QMessageBox.AcceptRole)
+        box.addButton(QMessageBox.Cancel)
+        box.setCheckBox(QCheckBox("Delete items that only exist on the destination", box))
+        box.exec_()
+        if box.clickedButton() not in (btn_upload, btn_download):
+            return
+        direction = UPLOAD if box.clickedButton() == btn_upload else DOWNLOAD
+        # Compare first and let the user confirm what would change
+        self.transfer_engine.sync(direction, self.local_current_path, self.remote_current_path,
+                                  dry_run=True, delete=box.checkBox().isChecked(), use_hash=True)
+        self.transfer_label.setText("Comparing folders...")
+
+    def confirm_sync(self, sync):
+        self.transfer_label.setText(self.queued_text().strip(" ,"))
+        copies = [a for a in sync.actions if a.action == COPY]
+        deletes = [a for a in sync.actions if a.action == DELETE]
+        if not copies and not deletes:
+            QMessageBox.information(self, "Sync", f"Everything is up to date ({sync.skipped} file(s) checked).")
+            return
+        box = QMessageBox(self)
+        box.setWindowTitle("Sync")
+        box.setText(f"{len(copies)} file(s) to transfer ({format_size(sum(a.size or 0 for a in copies))}), "
+                    f"{len(deletes)} item(s) to delete, {sync.skipped} up to date.\n\nContinue?")
+        box.setDetailedText("\n".join(str(a) for a in sync.actions))
+        box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        if box.exec_() == QMessageBox.Yes:
+            self.transfer_engine.sync(sync.direction, sync.local_path, sync.remote_path,
+                                      delete=sync.delete, use_hash=sync.use_hash)
+
+    def on_mirror_finished(self, mirror):
+        if getattr(mirror, "dry_run", False):
+            if mirror.error:
+                QMessageBox.critical(self, "Error", f"Could not compare folders:\n{mirror.error}")
+            else:
+                self.confirm_sync(mirror)
+            return
+        if mirror.direction == UPLOAD:
+            # Directories were created (or removed) on the server while walking
+            self.listing_cache.invalidate_tree(FTPClient.remote_cache_key(self, mirror.remote_path))
+            parent = posixpath.dirname(mirror.remote_path)
+            self.listing_cache.invalidate(FTPClient.remote_cache_key(self, parent))
+            if self.remote_current_path in (parent, mirror.remote_path):
+                FTPClient.refresh_remote_list(self, use_cache=False)
+        if mirror.error:
+            QMessageBox.critical(self, "Error", f"Folder transfer stopped:\n{mirror.error}")
+        else:
+            self.transfer_label.setText(
+                f"{len(mirror.job_ids)} file(s) in {mirror.directories} folder(s) queued{self.queued_text()}"
+            )
+
+    def on_transfer_progress(self, job_id, transferred, total, rate):
+        job = self.transfer_engine.job(job_id)
+        if job is None:
+            return
+        percent = f"{transferred * 100 // total}%" if total else format_size(transferred)
+        arrow = "⬆" if job.direction == UPLOAD else "⬇"
+        self.transfer_label.setText(f"{arrow} {job.name} {percent} ({format_size(rate)}/s){self.queued_text()}")
+
+    def on_transfer_finished(self, job_id):
+        job = self.transfer_engine.job(job_id)
+        if job.direction == UPLOAD:
+            self.listing_cache.add_entry(
+                FTPClient.remote_cache_key(self, job.remote_path), FileEntry(job.remote_name, job.total, time.time())
+            )
+            if job.remote_path == self.remote_current_path:
+                FTPClient.refresh_remote_list(self)
+            action = "uploaded"
+        else:
+            local_dir, local_name = os.path.split(job.local_path)
+            entry = self.local_lister.update_entry(local_dir, local_name)
+            if entry is not None and local_dir == self.local_current_path:
+                self.localList.apply_changes([entry], [])
+            action = "downloaded"
+        verified = f", {job.verified} verified" if job.verified else ""
+        self.transfer_label.setText(
+            f"{job.name} has been {action} successfully! "
+            f"({format_size(job.transferred)} in {job.elapsed:.1f} s, {format_size(job.average_rate())}/s{verified})"
+            f"{self.queued_text()}"
+        )
+
+    def on_transfer_failed(self, job_id, message):
+        job = self.transfer_engine.job(job_id)
+        self.transfer_label.setText(self.queued_text().strip(" ,"))
+        if job.status == CANCELLED:
+            return
+        if job.direction == UPLOAD:
+            QMessageBox.critical(self, "Error", f"Upload failed.:\n{message}")
+        else:
+            QMessageBox.critical(self, "Error", f"Download failed:\n{message}")
+
+    def queued_text(self):
+        queued, running = self.transfer_engine.counts()
+        if not queued and not running:
+            return ""
+        return f", {running} running, {queued} queued"
 
     def delete_local_item(self, item):
         try:
             FTPClient.delete(self, item, True)
-            FTPClient.refresh_local_list(self)
+            FTPClient.update_local_list(self)
             QMessageBox.information(self, "Successful", f"Item has been deleted successfully!")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not delete: {str(e)}")
 
-    def delete_remote_item(self, item):
-        try:
-            FTPClient.delete(self, item, False)
-            FTPClient.refresh_remote_list(self)
-            QMessageBox.information(self, "Successful", f"Item has been deleted successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not delete: {str(e)}")
+    def delete_remote_items(self, entries):
+        folders = [entry for entry in entries if entry.is_dir]
+        text = f"Delete {entries[0].name}?" if len(entries) == 1 else f"Delete {len(entries)} items?"
+        if folders:
+            text += "\n\nFolders are deleted with everything inside them."
+        reply = QMessageBox.question(self, "Delete", text, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        paths = [(posixpath.join(self.remote_current_path, entry.name), entry.is_dir) for entry in entries]
+        self.transfer_engine.delete_remote([path for path, is_dir in paths if not is_dir],
+                                           [path for path, is_dir in paths if is_dir])
+        self.transfer_label.setText(f"Deleting {len(entries)} item(s)...")
+
+    def rename_remote_items(self, entries):
+        names = [entry.name for entry in entries]
+        existing = {entry.name for entry in self.remoteList.all_entries()} - set(names)
+        dialog = RenamePatternDialog(names, existing, self)
+        if dialog.exec_() != QDialog.Accepted or not dialog.plan:
+            return
+        self.transfer_engine.rename_remote(self.remote_current_path, dialog.plan)
+        self.transfer_label.setText(f"Renaming {len(dialog.plan)} item(s)...")
+
+    def on_batch_finished(self, batch):
+        if isinstance(batch, RemoteDelete):
+            for path in batch.files + batch.directories:
+                parent, name = posixpath.split(path)
+                self.listing_cache.remove_entry(FTPClient.remote_cache_key(self, parent), name)
+            for path in batch.directories:
+                self.listing_cache.invalidate_tree(FTPClient.remote_cache_key(self, path))
+        elif isinstance(batch, RemoteRename):
+            key = FTPClient.remote_cache_key(self, batch.directory)
+            for old, new in batch.renamed:
+                self.listing_cache.invalidate_tree(child_key(key, old))
+                self.listing_cache.rename_entry(key, old, new)
+        else:
+            for path in batch.paths:
+                for directory in parent_dirs(path):
+                    self.listing_cache.invalidate(FTPClient.remote_cache_key(self, posixpath.dirname(directory)))
+        # Entries of failed items may be stale, so list again in that case
+        FTPClient.refresh_remote_list(self, use_cache=not batch.errors and not batch.error)
+        self.transfer_label.setText(f"{batch.done} item(s) {batch.action}{self.queued_text()}")
+        if batch.error or batch.errors:
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Warning)
+            box.setWindowTitle("Error")
+            box.setText(f"{batch.done} item(s) {batch.action}, {len(batch.errors)} failed."
+                        + (f"\n{batch.error}" if batch.error else ""))
+            if batch.errors:
+                box.setDetailedText("\n".join(f"{path}: {message}" for path, message in batch.errors))
+            box.exec_()
 
     def rename_local_item(self, item):
-        old_text = item.text()
-        if old_text == "..":
+        if item.kind == PARENT:
             return
-        is_dir = old_text.startswith("📁 ")
-        old_name = old_text.replace("📁 ", "") if is_dir else old_text
+        old_name = item.name
 
         new_name, ok = QInputDialog.getText(
             self,
@@ -372,17 +802,15 @@ class MainWindow(QWidget):
         if ok and new_name:
             try:
                 FTPClient.rename(self, old_name, new_name, True)
-                FTPClient.refresh_local_list(self)
+                FTPClient.update_local_list(self)
                 QMessageBox.information(self, "Successful", f"Item has been renamed successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Could not rename:\n{str(e)}")
 
     def rename_remote_item(self, item):
-        old_text = item.text()
-        if old_text == "..":
+        if item.kind == PARENT:
             return
-        is_dir = old_text.startswith("📁 ")
-        old_name = old_text.replace("📁 ", "") if is_dir else old_text
+        old_name = item.name
 
         new_name, ok = QInputDialog.getText(
             self,
@@ -411,7 +839,7 @@ class MainWindow(QWidget):
         if ok and dir_name:
             try:
                 FTPClient.create_directory(self, dir_name, True)
-                FTPClient.refresh_local_list(self)
+                FTPClient.update_local_list(self)
                 QMessageBox.information(self, "Successful", f"Directory has been created successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Directory creation failed:\n{str(e)}")
@@ -425,6 +853,10 @@ class MainWindow(QWidget):
         )
 
         if ok and dir_name:
+            if "/" in dir_name.strip("/"):
+                # Nested path: create the missing parents as well
+                self.transfer_engine.make_remote_dirs([posixpath.join(self.remote_current_path, dir_name)])
+                return
             try:
                 FTPClient.create_directory(self, dir_name, False)
                 FTPClient.refresh_remote_list(self)
@@ -437,26 +869,21 @@ def show_login_and_connect(parent=None):
     if login_dialog.exec_() == QDialog.Accepted:
         credentials = login_dialog.get_credentials()
 
-        progress_dialog = login_dialog.progress_dialog
-        progress_dialog.setValue(30)
+        # Show the window right away; connect_ftp() fills it in once logged in
         main_window = MainWindow()
-        progress_dialog.setValue(60)
-        progress_dialog.setLabelText("Connecting to FTP server... Please wait")
-        connect_result = main_window.connect_ftp(
+        main_window.show()
+        main_window.connect_ftp(
             credentials["server"],
             credentials["port"],
             credentials["username"],
-            credentials["password"]
+            credentials["password"],
+            credentials["tls"],
+            credentials["tls_verify"],
+            login_dialog.preconnector
         )
-        progress_dialog.setValue(100)
-        progress_dialog.close()
-
-        if connect_result:
-            main_window.show()
-            return main_window, True
-        else:
-            return None, False
+        return main_window, True
     else:
+        login_dialog.preconnector.close()
         return None, False
 
 if __name__ == "__main__":
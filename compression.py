@@ -0,0 +1,41 @@
+import os
+import zlib
+
+# Formats that are compressed already; deflating them again only costs CPU
+COMPRESSED_EXTENSIONS = {
+    ".7z", ".apk", ".avi", ".br", ".bz2", ".cab", ".deb", ".docx", ".flac", ".gif", ".gz", ".heic", ".jar",
+    ".jpeg", ".jpg", ".lz", ".lz4", ".lzma", ".m4a", ".mkv", ".mov", ".mp3", ".mp4", ".ogg", ".png", ".pptx",
+    ".rar", ".rpm", ".tbz2", ".tgz", ".txz", ".webm", ".webp", ".whl", ".xlsx", ".xz", ".zip", ".zst",
+}
+# Smaller files gain too little to be worth the extra MODE command
+MIN_COMPRESS_SIZE = 16 * 1024
+SAMPLE_SIZE = 64 * 1024
+# Sampled data must deflate below this fraction of its size
+MAX_RATIO = 0.9
+COMPRESSION_LEVEL = 6
+
+
+def compressed_extension(name):
+    return os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+def worth_compressing(local_path):
+    """Whether deflating `local_path` in transit should pay off.
+
+    Checks the extension first, then deflates samples from the start and
+    the middle of the file at the fastest level.
+    """
+    if compressed_extension(local_path):
+        return False
+    try:
+        with open(local_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < MIN_COMPRESS_SIZE:
+                return False
+            sample = f.read(SAMPLE_SIZE)
+            if size > 4 * SAMPLE_SIZE:
+                f.seek(size // 2)
+                sample += f.read(SAMPLE_SIZE)
+    except OSError:
+        return False
+    return len(zlib.compress(sample, 1)) < len(sample) * MAX_RATIO
\ No newline at end of file
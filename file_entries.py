@@ -0,0 +1,92 @@
+import calendar
+import stat
+
+FILE = "file"
+DIR = "dir"
+LINK = "link"
+PARENT = "parent"
+
+
+class FileEntry:
+    __slots__ = ("name", "size", "mtime", "kind", "permissions", "target", "precision")
+
+    def __init__(self, name, size=None, mtime=None, kind=FILE, permissions="", target=None, precision=0):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.kind = kind
+        self.permissions = permissions
+        # Where a symbolic link points, when the listing tells
+        self.target = target
+        # Seconds the listing may have cut off mtime by (LIST shows minutes, or only days)
+        self.precision = precision
+
+    @property
+    def is_dir(self):
+        return self.kind in (DIR, PARENT)
+
+    def renamed(self, name):
+        return FileEntry(name, self.size, self.mtime, self.kind, self.permissions, self.target, self.precision)
+
+    def __repr__(self):
+        return f"FileEntry({self.name!r}, size={self.size!r}, kind={self.kind!r})"
+
+
+PARENT_ENTRY = FileEntry("..", kind=PARENT)
+
+
+def format_size(num_bytes):
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def parse_mlsd_time(value):
+    # YYYYMMDDHHMMSS[.sss] in UTC
+    try:
+        return calendar.timegm((int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                                int(value[8:10]), int(value[10:12]), int(value[12:14]))) + float(value[14:] or 0)
+    except (ValueError, IndexError):
+        return None
+
+
+def entry_from_facts(name, facts):
+    fact_type = facts.get("type", "file").lower()
+    if fact_type == "dir":
+        kind = DIR
+    elif "symlink" in fact_type or fact_type.startswith("os.unix=slink"):
+        kind = LINK
+    else:
+        kind = FILE
+
+    size = facts.get("size") or facts.get("sizd")
+    modify = facts.get("modify")
+    mode = facts.get("unix.mode")
+    if mode:
+        try:
+            permissions = stat.filemode(int(mode, 8) | (stat.S_IFDIR if kind == DIR else stat.S_IFREG))
+        except ValueError:
+            permissions = mode
+    else:
+        permissions = facts.get("perm", "")
+
+    return FileEntry(
+        name,
+        int(size) if size and size.isdigit() else None,
+        parse_mlsd_time(modify) if modify else None,
+        kind,
+        permissions,
+    )
+
+
+def entry_from_stat(name, st):
+    if stat.S_ISDIR(st.st_mode):
+        kind = DIR
+    elif stat.S_ISLNK(st.st_mode):
+        kind = LINK
+    else:
+        kind = FILE
+    return FileEntry(name, st.st_size if kind == FILE else None, st.st_mtime, kind, stat.filemode(st.st_mode))
\ No newline at end of file
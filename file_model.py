@@ -0,0 +1,171 @@
+import time
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QMimeData, QSortFilterProxyModel
+from PyQt5.QtWidgets import QFileIconProvider
+from file_entries import DIR, LINK, PARENT, PARENT_ENTRY, format_size
+
+COLUMNS = ("Name", "Size", "Modified", "Type", "Permissions")
+NAME, SIZE, MODIFIED, TYPE, PERMISSIONS = range(len(COLUMNS))
+TYPE_NAMES = {DIR: "Folder", LINK: "Link", PARENT: ""}
+EntryRole = Qt.UserRole
+
+
+def sort_key(column):
+    if column == SIZE:
+        return lambda e: e.size or 0
+    if column == MODIFIED:
+        return lambda e: e.mtime or 0
+    if column == TYPE:
+        return lambda e: (e.kind, e.name.lower())
+    if column == PERMISSIONS:
+        return lambda e: e.permissions
+    return lambda e: e.name.lower()
+
+
+class FileTableModel(QAbstractTableModel):
+    """Table of FileEntry rows; a ".." row, when shown, always stays on top."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.sort_column = -1
+        self.sort_order = Qt.AscendingOrder
+        provider = QFileIconProvider()
+        self.folder_icon = provider.icon(QFileIconProvider.Folder)
+        self.file_icon = provider.icon(QFileIconProvider.File)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        entry = self.entries[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == NAME:
+                return entry.name
+            if column == SIZE:
+                return format_size(entry.size) if entry.size is not None and not entry.is_dir else ""
+            if column == MODIFIED:
+                return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime)) if entry.mtime else ""
+            if column == TYPE:
+                return TYPE_NAMES.get(entry.kind, "File")
+            if column == PERMISSIONS:
+                return entry.permissions
+        elif role == Qt.DecorationRole and column == NAME:
+            return self.folder_icon if entry.is_dir else self.file_icon
+        elif role == Qt.TextAlignmentRole and column == SIZE:
+            return Qt.AlignRight | Qt.AlignVCenter
+        elif role == EntryRole:
+            return entry
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid():
+            flags |= Qt.ItemIsDragEnabled
+        return flags | Qt.ItemIsDropEnabled
+
+    def mimeTypes(self):
+        return ["text/plain"]
+
+    def mimeData(self, indexes):
+        rows = sorted({index.row() for index in indexes})
+        mime_data = QMimeData()
+        mime_data.setText("\n".join(self.entries[row].name for row in rows))
+        return mime_data
+
+    def supportedDropActions(self):
+        return Qt.CopyAction | Qt.MoveAction
+
+    def entry(self, row):
+        return self.entries[row]
+
+    def set_entries(self, entries, show_parent=False):
+        self.beginResetModel()
+        self.entries = ([PARENT_ENTRY] if show_parent else []) + list(entries)
+        self.sort_entries()
+        self.endResetModel()
+
+    def append_entries(self, entries):
+        """Add a batch of rows at the bottom, sorted among themselves.
+
+        Re-sorting every row per batch would make streaming a large
+        listing quadratic, so call finish_entries() once it is complete.
+        """
+        if not entries:
+            return
+        entries = self.sorted_entries(entries)
+        start = len(self.entries)
+        self.beginInsertRows(QModelIndex(), start, start + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    def refresh_rows(self):
+        if self.entries:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.entries) - 1, len(COLUMNS) - 1))
+
+    def apply_changes(self, added, removed):
+        """Insert `added` entries (replacing same-named rows) and drop `removed` names."""
+        removed = set(removed) | {e.name for e in added}
+        for row in range(len(self.entries) - 1, -1, -1):
+            entry = self.entries[row]
+            if entry.kind != PARENT and entry.name in removed:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.entries[row]
+                self.endRemoveRows()
+        self.append_entries(added)
+        self.finish_entries()
+
+    def finish_entries(self):
+        if self.sort_column >= 0:
+            self.sort(self.sort_column, self.sort_order)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        moved = [self.entries[index.row()] for index in old_indexes]
+        self.sort_entries()
+        self.changePersistentIndexList(
+            old_indexes,
+            [self.index(self.entries.index(entry), index.column()) for entry, index in zip(moved, old_indexes)],
+        )
+        self.layoutChanged.emit()
+
+    def sort_entries(self):
+        parent = self.entries[:1] if self.entries and self.entries[0].kind == PARENT else []
+        self.entries = parent + self.sorted_entries(self.entries[len(parent):])
+
+    def sorted_entries(self, entries):
+        if self.sort_column < 0:
+            return list(entries)
+        entries = sorted(entries, key=sort_key(self.sort_column), reverse=self.sort_order == Qt.DescendingOrder)
+        return [e for e in entries if e.kind == DIR] + [e for e in entries if e.kind != DIR]
+
+
+class FileFilterProxy(QSortFilterProxyModel):
+    """Filters rows by a case-insensitive name substring.
+
+    Filtering stays in C++ so an empty filter costs nothing per row, and
+    sorting is delegated to the source model, which sorts its entry list
+    directly instead of comparing rows one pair at a time through lessThan.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterKeyColumn(NAME)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+    def set_pattern(self, pattern):
+        self.setFilterFixedString(pattern)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
\ No newline at end of file
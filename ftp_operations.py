@@ -1,13 +1,387 @@
 import shutil
-from ftplib import FTP
+import ssl
+import time
+import posixpath
+from ftplib import error_perm, error_reply, error_temp
 import os
+import zlib
+from compression import COMPRESSION_LEVEL, compressed_extension, worth_compressing
+from file_entries import FileEntry, DIR, PARENT, entry_from_facts
+from listing_cache import ListingCache, child_key
+from list_parser import ListParser, server_dialects
+from ftps import new_ftp
+from metrics import InstrumentedFTP
+
+# Data connection buffers are sized per file between these two; a
+# block_size argument or FTP_BLOCK_SIZE (bytes) in the environment wins
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 4 * 1024 * 1024
+# Files above this are read with a hint to drop them from the page cache
+# behind the transfer, so one huge upload does not evict everything else
+HUGE_FILE = 1024 * 1024 * 1024
+# Commands pipeline() sends ahead of their replies; bounded so a server
+# that reads one command at a time never has too many buffered
+PIPELINE_DEPTH = 32
+
+
+def open_connection(credentials, remote_path="/"):
+    ftp = new_ftp(credentials)
+    ftp.connect(credentials["server"], credentials["port"])
+    ftp.login(credentials["username"], credentials["password"])
+    if credentials.get("tls"):
+        ftp.prot_p()
+    ftp.cwd(remote_path)
+    return ftp
+
+
+def server_features(ftp):
+    features = getattr(ftp, "features", None)
+    if features is None:
+        features = set()
+        try:
+            resp = ftp.sendcmd("FEAT")
+            for line in resp.splitlines()[1:-1]:
+                features.add(line.strip().upper())
+        except error_perm:
+            pass
+        ftp.features = features
+    return features
+
+
+def has_feature(ftp, name):
+    name = name.upper()
+    return any(f == name or f.startswith(name + " ") for f in server_features(ftp))
+
+
+def remote_size(ftp, file_name):
+    try:
+        ftp.voidcmd("TYPE I")
+        return ftp.size(file_name)
+    except error_perm:
+        return None
+
+
+def parse_mlsd_line(line):
+    facts_found, _, name = line.partition(' ')
+    if name in ('.', '..'):
+        return None
+    facts = {}
+    for fact in facts_found[:-1].split(";"):
+        key, _, value = fact.partition("=")
+        facts[key.lower()] = value
+    if facts.get('type') in ('cdir', 'pdir'):
+        return None
+    return entry_from_facts(name, facts)
+
+
+def iter_listing(ftp, path):
+    """Yield a FileEntry per item of `path` as the listing lines arrive.
+
+    Stopping the iteration early leaves the control connection waiting
+    for a transfer reply, so the session should be discarded afterwards.
+    """
+    set_transfer_mode(ftp, False)
+    ftp.sendcmd("TYPE A")
+    parser = None
+    try:
+        conn = ftp.transfercmd(f"MLSD {path}")
+        parse = parse_mlsd_line
+
+    #LIST command
+    except error_perm:
+        conn = ftp.transfercmd(f"LIST {path}")
+        parser = ListParser(server_dialects.get((ftp.host, ftp.port)))
+        parse = parser.parse
+
+    with conn, conn.makefile("r", encoding=ftp.encoding) as fp:
+        for line in fp:
+            entry = parse(line.rstrip("\r\n"))
+            if entry:
+                yield entry
+    ftp.voidresp()
+    if parser is not None and parser.dialect is not None:
+        server_dialects[(ftp.host, ftp.port)] = parser.dialect
+
+
+def list_remote(ftp, path):
+    return list(iter_listing(ftp, path))
+
+
+def ensure_remote_dir(ftp, path):
+    try:
+        ftp.mkd(path)
+    except error_perm:
+        # Already there if we can change into it
+        ftp.cwd(path)
+
+
+def parent_dirs(path):
+    """'/a/b/c' -> ['/a', '/a/b', '/a/b/c']."""
+    path = posixpath.normpath(path)
+    parts = [part for part in path.split("/") if part]
+    prefix = "/" if path.startswith("/") else ""
+    return [prefix + "/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def make_remote_dirs(ftp, path):
+    """Create `path` and any missing parents (mkdir -p) in one pipelined round trip.
+
+    Returns how many directories were created.
+    """
+    results = pipeline(ftp, [f"MKD {directory}" for directory in parent_dirs(path)])
+    if results and isinstance(results[-1], Exception):
+        try:
+            # Already there if we can change into it
+            ftp.cwd(path)
+        except error_perm:
+            raise results[-1]
+    return sum(not isinstance(result, Exception) for result in results)
+
+
+def remove_remote_tree(ftp, path):
+    """Delete a remote directory and everything below it."""
+    files = []
+    for entry in list_remote(ftp, path):
+        child = posixpath.join(path, entry.name)
+        if entry.kind == DIR:
+            remove_remote_tree(ftp, child)
+        else:
+            files.append(child)
+    for result in pipeline(ftp, [f"DELE {child}" for child in files]):
+        if isinstance(result, Exception):
+            raise result
+    ftp.rmd(path)
+
+
+def pipeline(ftp, commands):
+    """Send `commands` on a plain ftplib session without waiting for each reply.
+
+    Returns the reply, or the ftplib error it raised, of every command in
+    order. One round trip per window of PIPELINE_DEPTH commands instead
+    of one per command is what makes deleting or renaming thousands of
+    items bearable. Connection errors are raised.
+    """
+    results = []
+    for start in range(0, len(commands), PIPELINE_DEPTH):
+        window = commands[start:start + PIPELINE_DEPTH]
+        if any("\r" in cmd or "\n" in cmd for cmd in window):
+            raise ValueError("an illegal newline character should not be contained")
+        ftp.sock.sendall("".join(f"{cmd}\r\n" for cmd in window).encode(ftp.encoding))
+        for _ in window:
+            try:
+                results.append(ftp.getresp())
+            except (error_perm, error_temp, error_reply) as e:
+                results.append(e)
+    return results
+
+
+def set_remote_mtime(ftp, file_name, mtime):
+    """Set a remote file's modification time with MFMT, if the server has it."""
+    if not has_feature(ftp, "MFMT"):
+        return False
+    ftp.sendcmd(f"MFMT {time.strftime('%Y%m%d%H%M%S', time.gmtime(mtime))} {file_name}")
+    return True
+
+
+def block_size_for(total, block_size=None):
+    """Buffer size for a transfer of `total` bytes: about 1/64 of it, a power of two."""
+    block_size = block_size or int(os.environ.get("FTP_BLOCK_SIZE", 0))
+    if block_size:
+        return block_size
+    size = MIN_BLOCK_SIZE
+    while size < MAX_BLOCK_SIZE and size * 64 < total:
+        size *= 2
+    return size
+
+
+def advise(fd, offset, length, advice):
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass
+
+
+def set_transfer_mode(ftp, compressed):
+    """Switch between MODE Z (deflate) and plain stream mode, if not already there.
+
+    Pooled sessions keep their mode between jobs, so every transfer sets
+    the one it needs.
+    """
+    mode = "Z" if compressed else "S"
+    if getattr(ftp, "transfer_mode", "S") != mode:
+        ftp.voidcmd(f"MODE {mode}")
+        ftp.transfer_mode = mode
+
+
+def close_data(conn):
+    # Like ftplib, end TLS on the data connection before closing it
+    if isinstance(conn, ssl.SSLSocket):
+        conn.unwrap()
+    conn.close()
+
+
+def upload_file(ftp, local_path, filename, callback=None, offset=0, block_size=None, compress=None, digest=None):
+    """Send a local file with socket.sendfile, so plain connections copy it in the kernel.
+
+    With `compress` (by default: when the server has MODE Z and the file
+    looks compressible), the file is deflated on the fly instead.
+    `callback` gets the number of file bytes sent by each step. A `digest`
+    (see checksums.StreamHasher) is updated with the file data as it is
+    sent, which means reading it in instead of using sendfile.
+    """
+    if compress is None:
+        compress = has_feature(ftp, "MODE Z") and worth_compressing(local_path)
+    with open(local_path, "rb") as f:
+        total = os.fstat(f.fileno()).st_size
+        block_size = block_size_for(total, block_size)
+        if offset and not has_feature(ftp, "REST STREAM"):
+            command, rest = f"APPE {filename}", None
+        else:
+            command, rest = f"STOR {filename}", offset or None
+        if hasattr(os, "POSIX_FADV_SEQUENTIAL"):
+            advise(f.fileno(), offset, 0, os.POSIX_FADV_SEQUENTIAL)
+
+        set_transfer_mode(ftp, compress)
+        ftp.voidcmd("TYPE I")
+        conn = ftp.transfercmd(command, rest)
+        try:
+            if compress:
+                f.seek(offset)
+                send_compressed(conn, f, block_size, callback, digest)
+            elif digest is not None:
+                f.seek(offset)
+                send_read(conn, f, block_size, callback, digest)
+            else:
+                send_plain(conn, f, offset, block_size, callback, total >= HUGE_FILE)
+            close_data(conn)
+        finally:
+            conn.close()
+    return ftp.voidresp()
+
+
+def send_plain(conn, f, offset, block_size, callback, huge=False):
+    huge = huge and hasattr(os, "POSIX_FADV_DONTNEED")
+    position = offset
+    while True:
+        sent = conn.sendfile(f, position, block_size)
+        if not sent:
+            break
+        if huge:
+            advise(f.fileno(), position, sent, os.POSIX_FADV_DONTNEED)
+        position += sent
+        if callback:
+            callback(sent)
+
+
+def send_read(conn, f, block_size, callback, digest):
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    while True:
+        read = f.readinto(buffer)
+        if not read:
+            break
+        digest.update(view[:read])
+        conn.sendall(view[:read])
+        if callback:
+            callback(read)
+
+
+def send_compressed(conn, f, block_size, callback, digest=None):
+    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    while True:
+        read = f.readinto(buffer)
+        if not read:
+            break
+        if digest is not None:
+            digest.update(view[:read])
+        conn.sendall(compressor.compress(view[:read]))
+        if callback:
+            callback(read)
+    conn.sendall(compressor.flush())
+
+
+def download_file(ftp, local_path, file_name, callback=None, offset=0, block_size=None, compress=None,
+                  digest=None):
+    """Receive a file into one reusable buffer and write it out once the buffer fills.
+
+    With `compress` (by default: when the server has MODE Z and the name
+    is not a compressed format), the data arrives deflated and is
+    inflated on the fly. `callback` gets the number of file bytes
+    received by each step, and a `digest` is updated with the file data.
+    """
+    if compress is None:
+        compress = has_feature(ftp, "MODE Z") and not compressed_extension(file_name)
+    set_transfer_mode(ftp, compress)
+    ftp.voidcmd("TYPE I")
+    conn, size = ftp.ntransfercmd(f"RETR {file_name}", rest=offset or None)
+    try:
+        view = memoryview(bytearray(block_size_for(size or 0, block_size)))
+        with open(local_path, "r+b" if offset else "wb", buffering=0) as f:
+            f.seek(offset)
+            f.truncate()
+            if compress:
+                receive_compressed(conn, f, view, callback, digest)
+            else:
+                receive_plain(conn, f, view, callback, digest)
+        close_data(conn)
+    finally:
+        conn.close()
+    return ftp.voidresp()
+
+
+def receive_plain(conn, f, view, callback, digest=None):
+    done = False
+    while not done:
+        filled = 0
+        while filled < len(view):
+            received = conn.recv_into(view[filled:])
+            if not received:
+                done = True
+                break
+            filled += received
+            if callback:
+                callback(received)
+        if digest is not None and filled:
+            digest.update(view[:filled])
+        write_all(f, view[:filled])
+
+
+def receive_compressed(conn, f, view, callback, digest=None):
+    decompressor = zlib.decompressobj()
+    while True:
+        received = conn.recv_into(view)
+        if not received:
+            break
+        data = decompressor.decompress(view[:received])
+        if digest is not None:
+            digest.update(data)
+        write_all(f, data)
+        if callback:
+            callback(len(data))
+    data = decompressor.flush()
+    if digest is not None:
+        digest.update(data)
+    write_all(f, data)
+    if callback and data:
+        callback(len(data))
+
+
+def write_all(f, data):
+    # Unbuffered file writes may be partial
+    view = memoryview(data)
+    while view:
+        view = view[f.write(view):]
+
 
 class FTPClient:
     def __init__(self):
-        self.ftp = FTP
+        self.ftp = InstrumentedFTP
 
-    def connect(self, host, port, username, password):
-        self.ftp.connect(host, port)
+    def connect(self, host, port, username, password, tls=False, tls_verify=True):
+        self.ftp.connect(host, port, tls, tls_verify)
         self.ftp.login(username, password)
         self.ftp.cwd(self.remote_current_path)
 
@@ -17,80 +391,70 @@ class FTPClient:
         except:
             self.ftp.close()
 
-    def refresh_local_list(self):
-        self.localList.clear()
-        self.localList.addItem("..")
-        entries = os.listdir(self.local_current_path)
-        for e in entries:
-            full_path = os.path.join(self.local_current_path, e)
-            if os.path.isdir(full_path):
-                self.localList.addItem("📁 " + e)
-            else:
-                self.localList.addItem(e)
+    def refresh_local_list(self, use_cache=True):
+        current_dir = self.local_current_path
+        FTPClient.watch_local_directory(self)
+        entries = self.local_lister.cached(current_dir) if use_cache else None
+        if entries is None:
+            self.localList.set_entries([], show_parent=True)
+            self.local_path_label.setText(f"Local Dir: {current_dir} (loading...)")
+            self.local_lister.list(current_dir)
+            return
 
-        self.local_path_label.setText(f"Local Dir: {self.local_current_path}")
+        self.local_lister.cancel()
+        self.localList.set_entries(entries, show_parent=True)
+        self.local_path_label.setText(f"Local Dir: {current_dir}")
 
-    def refresh_remote_list(self):
-        self.remoteList.clear()
-        current_dir = self.ftp.pwd()
-        if current_dir != "/":
-            self.remoteList.addItem("..")
+    def update_local_list(self):
+        entries = [e for e in self.localList.file_model.entries if e.kind != PARENT]
+        self.local_lister.update(self.local_current_path, entries)
 
-        try:
-            for name, facts in self.ftp.mlsd():
-                if name in ('.', '..'):
-                    continue
+    def watch_local_directory(self):
+        watched = self.local_watcher.directories()
+        if watched != [self.local_current_path]:
+            if watched:
+                self.local_watcher.removePaths(watched)
+            self.local_watcher.addPath(self.local_current_path)
 
-                if facts['type'] == 'dir':
-                    self.remoteList.addItem(f"📁 {name}")
-                else:
-                    self.remoteList.addItem(name)
-
-        #LIST command
-        except Exception:
-            lines = []
-            self.ftp.retrlines('LIST', lines.append)
-
-            for line in lines:
-                parts = line.split()
-                if not parts:
-                    continue
-                if len(parts) < 6:
-                    continue
-                is_dir = parts[0].startswith('d')
-                name = ' '.join(parts[8:])
+    def remote_cache_key(self, path=None):
+        return ListingCache.key(self.login_credentials, path or self.remote_current_path)
 
-                if is_dir:
-                    self.remoteList.addItem(f"📁 {name}")
-                else:
-                    self.remoteList.addItem(name)
+    def refresh_remote_list(self, use_cache=True):
+        current_dir = self.remote_current_path
+        key = FTPClient.remote_cache_key(self)
+        entries = self.listing_cache.get(key) if use_cache else None
+
+        if entries is None:
+            self.remoteList.set_entries([], show_parent=current_dir != "/")
+            self.remote_path_label.setText(f"Remote Dir: {current_dir} (loading...)")
+            self.remote_lister.list(current_dir)
+            return
 
+        self.remote_lister.cancel()
+        self.remoteList.set_entries(entries.values(), show_parent=current_dir != "/")
         self.remote_path_label.setText(f"Remote Dir: {current_dir}")
 
     def upload(self, local_path, filename):
         try:
             self.ftp.cwd(self.remote_current_path)
-            with open(local_path, "rb") as f:
-                self.ftp.storbinary(f"STOR {filename}", f)
+            upload_file(self.ftp, local_path, filename)
         except:
             raise
 
     def download(self, local_path, file_name):
         try:
             self.ftp.cwd(self.remote_current_path)
-            with open(local_path, "wb") as f:
-                self.ftp.retrbinary(f"RETR {file_name}", f.write)
+            download_file(self.ftp, local_path, file_name)
         except:
             raise
 
     def delete(self, item, is_local):
         try:
-            text = item.text()
-            if text == "..":
+            if item.kind == PARENT:
                 return
 
-            is_dir = text.startswith("📁 ")
-            name = text.replace("📁 ", "") if is_dir else text
+            is_dir = item.is_dir
+            name = item.name
             full_path = os.path.join(self.local_current_path, name)
 
             if is_local:
@@ -99,10 +463,14 @@ class FTPClient:
                 else:
                     os.remove(full_path)
             else:
+                key = FTPClient.remote_cache_key(self)
+                remote_path = posixpath.join(self.remote_current_path, name)
                 if is_dir:
-                    self.ftp.rmd(name)
+                    self.ftp.rmd(remote_path)
+                    self.listing_cache.invalidate_tree(child_key(key, name))
                 else:
-                    self.ftp.delete(name)
+                    self.ftp.delete(remote_path)
+                self.listing_cache.remove_entry(key, name)
         except:
             raise
 
@@ -113,7 +481,11 @@ class FTPClient:
                 new_path = os.path.join(self.local_current_path, new_name)
                 os.rename(old_path, new_path)
             else:
-                self.ftp.rename(old_name, new_name)
+                key = FTPClient.remote_cache_key(self)
+                self.ftp.rename(posixpath.join(self.remote_current_path, old_name),
+                                posixpath.join(self.remote_current_path, new_name))
+                self.listing_cache.invalidate_tree(child_key(key, old_name))
+                self.listing_cache.rename_entry(key, old_name, new_name)
 
         except:
             raise
@@ -124,6 +496,7 @@ class FTPClient:
                 full_path = os.path.join(self.local_current_path, dir_name)
                 os.mkdir(full_path)
             else:
-                self.ftp.mkd(dir_name)
+                self.ftp.mkd(posixpath.join(self.remote_current_path, dir_name))
+                self.listing_cache.add_entry(FTPClient.remote_cache_key(self), FileEntry(dir_name, kind=DIR))
         except:
             raise
\ No newline at end of file
@@ -0,0 +1,76 @@
+import ssl
+import threading
+import time
+from ftplib import FTP, FTP_TLS, error_perm, error_proto
+from metrics import InstrumentedFTP
+
+# Latest TLS session of each (context, host, port), for the next control connection to resume
+tls_sessions = {}
+tls_sessions_lock = threading.Lock()
+# One context per verification setting; a session can only be resumed by the context that made it
+tls_contexts = {}
+
+
+def tls_context(verify=True):
+    with tls_sessions_lock:
+        context = tls_contexts.get(verify)
+        if context is None:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            tls_contexts[verify] = context
+        return context
+
+
+def new_ftp(credentials):
+    """An unconnected FTP object for `credentials`: FTPS when its "tls" is set."""
+    if credentials.get("tls"):
+        return FTPS(context=tls_context(credentials.get("tls_verify", True)))
+    return InstrumentedFTP()
+
+
+class FTPS(InstrumentedFTP, FTP_TLS):
+    """FTP over explicit TLS (AUTH TLS) that resumes TLS sessions.
+
+    A new control connection resumes the last session to the same server,
+    so only the first connection of a pool pays for a full handshake. Data
+    connections resume the session of their control connection, which
+    saves a handshake per file and is what servers with
+    require_ssl_reuse (vsftpd, FileZilla Server) insist on. Each handshake
+    is reported to `metrics` with its time and whether it was resumed.
+    """
+
+    def auth(self):
+        if isinstance(self.sock, ssl.SSLSocket):
+            raise ValueError("Already using TLS")
+        try:
+            resp = self.voidcmd("AUTH TLS")
+        except error_perm as e:
+            # Not a login failure, so do not let it pass for one
+            raise error_proto(f"The server does not support FTPS: {e}") from e
+        with tls_sessions_lock:
+            session = tls_sessions.get((self.context, self.host, self.port))
+        self.sock = self.handshake(self.sock, "control", session)
+        self.file = self.sock.makefile(mode="r", encoding=self.encoding)
+        return resp
+
+    def login(self, user="", passwd="", acct="", secure=True):
+        resp = super().login(user, passwd, acct, secure)
+        # With TLS 1.3 the session ticket arrives after the handshake, so it is only there now
+        if isinstance(self.sock, ssl.SSLSocket) and self.sock.session is not None:
+            with tls_sessions_lock:
+                tls_sessions[(self.context, self.host, self.port)] = self.sock.session
+        return resp
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            conn = self.handshake(conn, "data", self.sock.session)
+        return conn, size
+
+    def handshake(self, sock, channel, session):
+        started = time.perf_counter()
+        sock = self.context.wrap_socket(sock, server_hostname=self.host, session=session)
+        self.metrics.tls_handshake(self.host, channel, time.perf_counter() - started, sock.session_reused)
+        return sock
\ No newline at end of file
@@ -0,0 +1,205 @@
+import calendar
+import re
+import time
+from file_entries import FileEntry, DIR, FILE, LINK
+
+UNIX = "unix"
+DOS = "dos"
+VMS = "vms"
+EPLF = "eplf"
+
+MONTHS = {name: number for number, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+# Times shown as HH:MM are only to the minute, and dates with a year but no time to the day
+MINUTE = 60
+DAY = 86400
+
+# drwxr-xr-x  2 owner group  4096 Jan  5 12:34 name
+# The group, the link count and the seconds are all optional in the wild;
+# device files show "major, minor" where the size would be. The name is
+# everything after the single space that follows the time or year, so
+# leading spaces in names survive.
+UNIX_LINE = re.compile(
+    r"([bcdlps\-?])([rwxsStTL\-]{9})\S*\s+"
+    r"(?:\d+\s+)?"
+    r"(\S+)\s+(?:(\S+)\s+)??"
+    r"(?:\d+,\s*)?(\d+)\s+"
+    r"(?:([A-Za-z]{3})\s+(\d{1,2})\s+(?:(\d{1,2}):(\d{2})(?::\d{2})?|(\d{4}))"
+    r"|(\d{4})-(\d{2})-(\d{2})\s+(\d{2}):(\d{2}))"
+    r" (.+)"
+)
+# 01-16-02  11:14AM       <DIR>          name    (IIS; also with 4-digit years and 24-hour times)
+DOS_LINE = re.compile(
+    r"(\d{2})-(\d{2})-(\d{2}|\d{4})\s+(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s+(<DIR>|\d+)\s+(.+)"
+)
+# NAME.EXT;1    2/4    7-JUN-2004 11:24:53  [GROUP,OWNER]  (RWED,RWED,RE,)
+VMS_LINE = re.compile(
+    r"(\S+);\d+\s+(\d+)(?:/\d+)?\s+(\d{1,2})-([A-Za-z]{3})-(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?.*"
+)
+# A long VMS name on a line of its own; the rest of the entry follows on the next line
+VMS_NAME = re.compile(r"(\S+);\d+")
+VMS_REST = re.compile(
+    r"\s+(\d+)(?:/\d+)?\s+(\d{1,2})-([A-Za-z]{3})-(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?.*"
+)
+# Header and summary lines that carry no entry
+SKIP_LINE = re.compile(r"total \d+|Directory \S+|Total of \d+ files?.*|\s*$", re.IGNORECASE)
+
+# Servers that answered one listing in a dialect, keyed by (host, port)
+server_dialects = {}
+
+
+class ListParser:
+    """Parses LIST output from Unix, DOS/IIS, VMS and EPLF servers into FileEntry objects.
+
+    The dialect is detected from the first line that parses and then
+    tried first for every other line. One parser should be used per
+    listing; pass the dialect of an earlier listing to skip detection.
+    """
+
+    def __init__(self, dialect=None, now=None):
+        self.dialect = dialect
+        self.now = time.time() if now is None else now
+        self.this_year = time.gmtime(self.now).tm_year
+        self.pending_name = None
+        self.days = {}
+        self.dialects = {UNIX: self.parse_unix, DOS: self.parse_dos, VMS: self.parse_vms, EPLF: self.parse_eplf}
+
+    def utc_time(self, year, month, day, hour=0, minute=0, second=0):
+        # Listings show the server's local time without saying which zone that is;
+        # like most clients, treat it as UTC. Day starts are cached, as a listing
+        # usually holds few distinct dates.
+        start = self.days.get((year, month, day), False)
+        if start is False:
+            valid = 1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]
+            start = calendar.timegm((year, month, day, 0, 0, 0)) if valid else None
+            self.days[(year, month, day)] = start
+        if start is None or hour > 23 or minute > 59 or second > 60:
+            return None
+        return start + hour * 3600 + minute * 60 + second
+
+    def parse(self, line):
+        if self.pending_name is not None:
+            return self.parse_vms_rest(line)
+        if self.dialect is not None:
+            entry = self.dialects[self.dialect](line)
+            if entry is not None or self.pending_name is not None:
+                return entry
+        if SKIP_LINE.fullmatch(line):
+            return None
+        for dialect, parse in self.dialects.items():
+            if dialect == self.dialect:
+                continue
+            entry = parse(line)
+            if entry is not None or self.pending_name is not None:
+                self.dialect = dialect
+                return entry
+        return None
+
+    def parse_unix(self, line):
+        match = UNIX_LINE.match(line)
+        if match is None:
+            return None
+        (kind_char, _, _, _, size, month, day, hour, minute, year,
+         iso_year, iso_month, iso_day, iso_hour, iso_minute, name) = match.groups()
+        target = None
+        if kind_char == "d":
+            kind = DIR
+        elif kind_char == "l":
+            kind = LINK
+            name, _, target = name.partition(" -> ")
+        else:
+            kind = FILE
+        if name in (".", ".."):
+            return None
+
+        precision = MINUTE
+        if iso_year:
+            mtime = self.utc_time(int(iso_year), int(iso_month), int(iso_day), int(iso_hour), int(iso_minute))
+        else:
+            month = MONTHS.get(month.lower())
+            if month is None:
+                return None
+            if year:
+                mtime = self.utc_time(int(year), month, int(day))
+                precision = DAY
+            else:
+                # No year: the date is within the last six months, so a date ahead of now is last year's
+                year = self.this_year
+                mtime = self.utc_time(year, month, int(day), int(hour), int(minute))
+                if mtime is not None and mtime > self.now + DAY:
+                    year -= 1
+                    mtime = self.utc_time(year, month, int(day), int(hour), int(minute))
+                if mtime is None and (month, int(day)) == (2, 29):
+                    # Not in a year without a Feb 29: then it is the last leap year's
+                    year -= 1
+                    while not calendar.isleap(year):
+                        year -= 1
+                    mtime = self.utc_time(year, month, int(day), int(hour), int(minute))
+        permissions = match.group(1) + match.group(2)
+        # Device files show their device numbers in the size column
+        size = int(size) if kind_char == "-" else None
+        return FileEntry(name, size, mtime, kind, permissions, target, precision)
+
+    def parse_dos(self, line):
+        match = DOS_LINE.match(line)
+        if match is None:
+            return None
+        month, day, year, hour, minute, meridiem, size, name = match.groups()
+        year = int(year)
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+        hour = int(hour)
+        if meridiem:
+            hour = hour % 12 + (12 if meridiem.upper() == "PM" else 0)
+        mtime = self.utc_time(year, int(month), int(day), hour, int(minute))
+        if size == "<DIR>":
+            return FileEntry(name, None, mtime, DIR, "", None, MINUTE)
+        return FileEntry(name, int(size), mtime, FILE, "", None, MINUTE)
+
+    def parse_vms(self, line):
+        match = VMS_LINE.fullmatch(line)
+        if match is not None:
+            return self.vms_entry(match.group(1), *match.groups()[1:])
+        match = VMS_NAME.fullmatch(line)
+        if match is not None and self.dialect == VMS:
+            self.pending_name = match.group(1)
+        return None
+
+    def parse_vms_rest(self, line):
+        name, self.pending_name = self.pending_name, None
+        match = VMS_REST.fullmatch(line)
+        return self.vms_entry(name, *match.groups()) if match else None
+
+    def vms_entry(self, name, blocks, day, month, year, hour, minute, second):
+        month = MONTHS.get(month.lower())
+        if month is None:
+            return None
+        mtime = self.utc_time(int(year), month, int(day), int(hour), int(minute), int(second or 0))
+        if name.upper().endswith(".DIR"):
+            return FileEntry(name[:-4], None, mtime, DIR)
+        # Sizes are in 512-byte blocks, so they are only approximate
+        return FileEntry(name, int(blocks) * 512, mtime, FILE)
+
+    def parse_eplf(self, line):
+        # +i8388621.48594,m825718503,r,s280,\tname
+        if not line.startswith("+"):
+            return None
+        facts, tab, name = line[1:].partition("\t")
+        if not tab or not name:
+            return None
+        kind = FILE
+        size = None
+        mtime = None
+        for fact in facts.split(","):
+            if fact == "/":
+                kind = DIR
+            elif fact[:1] == "s" and fact[1:].isdigit():
+                size = int(fact[1:])
+            elif fact[:1] == "m" and fact[1:].isdigit():
+                mtime = int(fact[1:])
+        return FileEntry(name, size if kind == FILE else None, mtime, kind)
+
+
+def parse_list_line(line):
+    """Parse one LIST line on its own; see ListParser for whole listings."""
+    return ListParser().parse(line)
\ No newline at end of file
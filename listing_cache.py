@@ -0,0 +1,94 @@
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+
+class ListingCache:
+    """Remote directory listings keyed by (server, port, username, path).
+
+    Listings older than `ttl` seconds are dropped on lookup, and the least
+    recently used ones are evicted once more than `max_entries` directory
+    entries are held in total. Listings are dicts of name -> FileEntry so
+    the client can patch them after its own changes instead of relisting.
+    """
+
+    def __init__(self, ttl=60, max_entries=200000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.listings = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(credentials, path):
+        return (credentials["server"], credentials["port"], credentials["username"], path)
+
+    def get(self, key):
+        with self.lock:
+            cached = self.listings.get(key)
+            if cached is None:
+                return None
+            stored_at, entries = cached
+            if time.monotonic() - stored_at > self.ttl:
+                self.drop(key)
+                return None
+            self.listings.move_to_end(key)
+            return entries
+
+    def put(self, key, entries):
+        entries = {entry.name: entry for entry in entries}
+        with self.lock:
+            self.drop(key)
+            self.listings[key] = (time.monotonic(), entries)
+            self.size += len(entries)
+            while self.size > self.max_entries and len(self.listings) > 1:
+                self.drop(next(iter(self.listings)))
+        return entries
+
+    def invalidate(self, key):
+        with self.lock:
+            self.drop(key)
+
+    def invalidate_tree(self, key):
+        prefix = key[-1].rstrip("/") + "/"
+        with self.lock:
+            for cached in [k for k in self.listings if k[:-1] == key[:-1]]:
+                if cached[-1] == key[-1] or cached[-1].startswith(prefix):
+                    self.drop(cached)
+
+    def clear(self):
+        with self.lock:
+            self.listings.clear()
+            self.size = 0
+
+    def add_entry(self, key, entry):
+        with self.lock:
+            cached = self.listings.get(key)
+            if cached is not None:
+                if entry.name not in cached[1]:
+                    self.size += 1
+                cached[1][entry.name] = entry
+
+    def remove_entry(self, key, name):
+        with self.lock:
+            cached = self.listings.get(key)
+            if cached is not None and cached[1].pop(name, None) is not None:
+                self.size -= 1
+
+    def rename_entry(self, key, old_name, new_name):
+        with self.lock:
+            cached = self.listings.get(key)
+            if cached is not None and old_name in cached[1]:
+                if new_name in cached[1]:
+                    self.size -= 1
+                cached[1][new_name] = cached[1].pop(old_name).renamed(new_name)
+
+    def drop(self, key):
+        cached = self.listings.pop(key, None)
+        if cached is not None:
+            self.size -= len(cached[1])
+
+
+def child_key(key, name):
+    return key[:-1] + (posixpath.join(key[-1], name),)
\ No newline at end of file
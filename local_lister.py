@@ -0,0 +1,148 @@
+import os
+import time
+from itertools import count
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from file_entries import entry_from_stat
+from local_scanner import ScanCache, scan_directory, fill_stats, directory_mtime
+
+STATS_INTERVAL = 0.1
+STATS_BATCH = 500
+
+
+class ScanRequest:
+    def __init__(self, request_id, path, known=None):
+        self.request_id = request_id
+        self.path = path
+        self.known = known
+        self.cancelled = False
+
+
+class ScanSignals(QObject):
+    # request_id, path, entries
+    listed = pyqtSignal(int, str, list)
+    # request_id, path, finished
+    stats = pyqtSignal(int, str, bool)
+    # request_id, path, added entries, removed names
+    changed = pyqtSignal(int, str, list, list)
+    failed = pyqtSignal(int, str, str)
+
+
+class ScanWorker(QRunnable):
+    def __init__(self, request, cache, signals):
+        super().__init__()
+        self.request = request
+        self.cache = cache
+        self.signals = signals
+
+    def run(self):
+        request = self.request
+        try:
+            mtime = directory_mtime(request.path)
+            scanned = scan_directory(request.path)
+            if request.known is None:
+                self.list_all(request, mtime, scanned)
+            else:
+                self.apply_changes(request, mtime, scanned)
+        except Exception as e:
+            self.signals.failed.emit(request.request_id, request.path, str(e))
+
+    def list_all(self, request, mtime, entries):
+        self.signals.listed.emit(request.request_id, request.path, entries)
+        last_emit = time.monotonic()
+        for start in range(0, len(entries), STATS_BATCH):
+            if not fill_stats(request.path, entries[start:start + STATS_BATCH], lambda: request.cancelled):
+                return
+            now = time.monotonic()
+            if now - last_emit >= STATS_INTERVAL:
+                last_emit = now
+                self.signals.stats.emit(request.request_id, request.path, False)
+        self.cache.put(request.path, mtime, entries)
+        self.signals.stats.emit(request.request_id, request.path, True)
+
+    def apply_changes(self, request, mtime, scanned):
+        known = request.known
+        names = {e.name for e in scanned}
+        added = [e for e in scanned if e.name not in known]
+        removed = [name for name in known if name not in names]
+        # Entries whose stat was cut short by an earlier cancelled scan too
+        fill_stats(request.path, added + [e for e in known.values() if e.mtime is None])
+        self.cache.put(request.path, mtime, [known.get(e.name) or e for e in scanned])
+        self.signals.changed.emit(request.request_id, request.path, added, removed)
+
+
+class LocalLister(QObject):
+    """Scans local directories on a pool thread.
+
+    A full scan first delivers names and types, then fills in sizes and
+    times in the background. An update scan reports only the entries
+    added or removed compared to what the panel already shows.
+    """
+
+    listed = pyqtSignal(str, list)
+    stats = pyqtSignal(str, bool)
+    changed = pyqtSignal(str, list, list)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = ScanCache()
+        self.request = None
+        self.request_ids = count(1)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.signals = ScanSignals(self)
+        self.signals.listed.connect(self.on_listed)
+        self.signals.stats.connect(self.on_stats)
+        self.signals.changed.connect(self.on_changed)
+        self.signals.failed.connect(self.on_failed)
+
+    def cached(self, path):
+        return self.cache.get(path)
+
+    def list(self, path):
+        self.start(path, None)
+
+    def update(self, path, entries):
+        self.start(path, {e.name: e for e in entries})
+
+    def update_entry(self, path, name):
+        try:
+            st = os.stat(os.path.join(path, name))
+        except OSError:
+            return None
+        entry = entry_from_stat(name, st)
+        self.cache.update_entry(path, entry)
+        return entry
+
+    def start(self, path, known):
+        self.cancel()
+        self.request = ScanRequest(next(self.request_ids), path, known)
+        self.thread_pool.start(ScanWorker(self.request, self.cache, self.signals))
+
+    def cancel(self):
+        if self.request is not None:
+            self.request.cancelled = True
+            self.request = None
+
+    def is_current(self, request_id):
+        return self.request is not None and self.request.request_id == request_id
+
+    def on_listed(self, request_id, path, entries):
+        if self.is_current(request_id):
+            self.listed.emit(path, entries)
+
+    def on_stats(self, request_id, path, finished):
+        if self.is_current(request_id):
+            if finished:
+                self.request = None
+            self.stats.emit(path, finished)
+
+    def on_changed(self, request_id, path, added, removed):
+        if self.is_current(request_id):
+            self.request = None
+            self.changed.emit(path, added, removed)
+
+    def on_failed(self, request_id, path, message):
+        if self.is_current(request_id):
+            self.request = None
+            self.failed.emit(path, message)
\ No newline at end of file
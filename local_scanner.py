@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from file_entries import FileEntry, DIR, FILE, entry_from_stat
+
+# A directory modified this recently may still change within the same
+# mtime tick, so its scan is not trusted by the cache yet
+MTIME_SETTLE = 2.0
+
+
+def scan_directory(path):
+    """List `path` with os.scandir, taking file types from the DirEntry.
+
+    Size, mtime and permissions are left empty where they would cost a
+    stat() call; fill_stats() adds them later. On Windows scandir already
+    returns them, so they are filled in right away.
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for e in it:
+            if os.name == "nt":
+                try:
+                    entries.append(entry_from_stat(e.name, e.stat()))
+                    continue
+                except OSError:
+                    pass
+            try:
+                is_dir = e.is_dir()
+            except OSError:
+                is_dir = False
+            entries.append(FileEntry(e.name, kind=DIR if is_dir else FILE))
+    return entries
+
+
+def fill_stats(path, entries, cancelled=lambda: False):
+    """stat() each entry that has no mtime yet and update it in place."""
+    for entry in entries:
+        if cancelled():
+            return False
+        if entry.mtime is not None:
+            continue
+        try:
+            st = os.stat(os.path.join(path, entry.name))
+        except OSError:
+            continue
+        filled = entry_from_stat(entry.name, st)
+        entry.size = filled.size
+        entry.mtime = filled.mtime
+        entry.kind = filled.kind
+        entry.permissions = filled.permissions
+    return True
+
+
+def directory_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ScanCache:
+    """Local directory scans, valid while the directory's mtime is unchanged."""
+
+    def __init__(self, max_dirs=32):
+        self.max_dirs = max_dirs
+        self.scans = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        mtime = directory_mtime(path)
+        with self.lock:
+            cached = self.scans.get(path)
+            if cached is None or mtime is None or cached[0] != mtime:
+                return None
+            self.scans.move_to_end(path)
+            return cached[1]
+
+    def put(self, path, mtime, entries):
+        if mtime is None or time.time() - mtime / 1e9 < MTIME_SETTLE:
+            return
+        with self.lock:
+            self.scans[path] = (mtime, list(entries))
+            self.scans.move_to_end(path)
+            while len(self.scans) > self.max_dirs:
+                self.scans.popitem(last=False)
+
+    def update_entry(self, path, entry):
+        with self.lock:
+            cached = self.scans.get(path)
+            if cached is not None:
+                entries = [e for e in cached[1] if e.name != entry.name]
+                entries.append(entry)
+                self.scans[path] = (cached[0], entries)
+
+    def invalidate(self, path):
+        with self.lock:
+            self.scans.pop(path, None)
\ No newline at end of file
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import time
+from ftplib import FTP, Error
+
+# Upper bounds, in seconds, of the command round-trip histogram buckets
+RTT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class CommandStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.buckets = [0] * len(RTT_BUCKETS)
+
+    def add(self, seconds, ok):
+        self.count += 1
+        self.errors += not ok
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        for i, bound in enumerate(RTT_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Counters for control commands and data transfers.
+
+    Every FTP command is timed from sending it to its reply (for RETR and
+    STOR that is the 150 reply, before any data), grouped by verb. Finished
+    transfers add their bytes, time, stalls and verification retries, and
+    TLS handshakes their time, split by channel and by whether the session
+    was resumed. The totals can be rendered as Prometheus text; with a log file, each event is also appended to it
+    as one JSON line.
+    """
+
+    def __init__(self, log_path=None):
+        self.lock = threading.Lock()
+        self.commands = {}
+        self.transfers = {}
+        self.handshakes = {}
+        self.log = None
+        if log_path:
+            self.log_to(log_path)
+
+    def log_to(self, path):
+        log = open(path, "a", encoding="utf-8", buffering=1) if path else None
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+            self.log = log
+
+    def write_event(self, event):
+        # Callers hold the lock
+        if self.log is not None:
+            event["time"] = round(time.time(), 3)
+            self.log.write(json.dumps(event) + "\n")
+
+    def command(self, host, verb, seconds, reply):
+        with self.lock:
+            self.commands.setdefault(verb, CommandStats()).add(seconds, reply[:1] in "123")
+            self.write_event({"event": "command", "host": host, "command": verb,
+                              "rtt_ms": round(seconds * 1000, 2), "reply": reply[:3]})
+
+    def transfer(self, job):
+        with self.lock:
+            totals = self.transfers.setdefault((job.direction, job.status), [0, 0, 0.0, 0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += job.transferred - job.offset
+            totals[2] += job.elapsed
+            totals[3] += job.stalls
+            totals[4] += job.stalled
+            totals[5] += job.retries
+            self.write_event({
+                "event": "transfer", "host": job.credentials.get("server"), "direction": job.direction,
+                "status": job.status, "path": f"{job.remote_path.rstrip('/')}/{job.remote_name}",
+                "bytes": job.transferred - job.offset, "seconds": round(job.elapsed, 3),
+                "average_rate": round(job.average_rate()), "peak_rate": round(job.peak_rate),
+                "stalls": job.stalls, "stalled_seconds": round(job.stalled, 3),
+                "verified": job.verified, "retries": job.retries, "error": job.error,
+            })
+
+    def tls_handshake(self, host, channel, seconds, resumed):
+        with self.lock:
+            self.handshakes.setdefault((channel, resumed), CommandStats()).add(seconds, True)
+            self.write_event({"event": "tls_handshake", "host": host, "channel": channel,
+                              "ms": round(seconds * 1000, 2), "resumed": resumed})
+
+    def tls_summary(self):
+        """(handshakes, resumed, average seconds of a full one, average seconds of a resumed one)."""
+        totals = {False: [0, 0.0], True: [0, 0.0]}
+        with self.lock:
+            for (_, resumed), stats in self.handshakes.items():
+                totals[resumed][0] += stats.count
+                totals[resumed][1] += stats.total
+        (full, full_time), (resumed, resumed_time) = totals[False], totals[True]
+        return (full + resumed, resumed, full_time / full if full else 0.0,
+                resumed_time / resumed if resumed else 0.0)
+
+    def command_summary(self):
+        """(verb, count, average seconds, last seconds, max seconds) per verb, slowest first."""
+        with self.lock:
+            rows = [(verb, s.count, s.average(), s.last, s.max) for verb, s in self.commands.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def prometheus(self):
+        lines = [
+            "# HELP ftp_command_rtt_seconds Time from sending an FTP command to its reply.",
+            "# TYPE ftp_command_rtt_seconds histogram",
+        ]
+        with self.lock:
+            for verb, stats in sorted(self.commands.items()):
+                for bound, count in zip(RTT_BUCKETS, stats.buckets):
+                    lines.append(f'ftp_command_rtt_seconds_bucket{{command="{verb}",le="{bound}"}} {count}')
+                lines.append(f'ftp_command_rtt_seconds_bucket{{command="{verb}",le="+Inf"}} {stats.count}')
+                lines.append(f'ftp_command_rtt_seconds_sum{{command="{verb}"}} {stats.total:.6f}')
+                lines.append(f'ftp_command_rtt_seconds_count{{command="{verb}"}} {stats.count}')
+            lines.append("# HELP ftp_command_errors_total Commands answered with a 4xx or 5xx reply.")
+            lines.append("# TYPE ftp_command_errors_total counter")
+            for verb, stats in sorted(self.commands.items()):
+                lines.append(f'ftp_command_errors_total{{command="{verb}"}} {stats.errors}')
+            if self.handshakes:
+                lines.append("# HELP ftp_tls_handshake_seconds Time taken by TLS handshakes, full or resumed.")
+                lines.append("# TYPE ftp_tls_handshake_seconds histogram")
+            for (channel, resumed), stats in sorted(self.handshakes.items()):
+                labels = f'channel="{channel}",resumed="{str(resumed).lower()}"'
+                for bound, count in zip(RTT_BUCKETS, stats.buckets):
+                    lines.append(f'ftp_tls_handshake_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'ftp_tls_handshake_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'ftp_tls_handshake_seconds_sum{{{labels}}} {stats.total:.6f}')
+                lines.append(f'ftp_tls_handshake_seconds_count{{{labels}}} {stats.count}')
+
+            for index, (name, help_text) in enumerate((
+                ("ftp_transfers_total", "Transfers that ended, by direction and outcome."),
+                ("ftp_transfer_bytes_total", "Bytes moved over data connections."),
+                ("ftp_transfer_seconds_total", "Time spent transferring."),
+                ("ftp_transfer_stalls_total", "Pauses in the data stream longer than the stall threshold."),
+                ("ftp_transfer_stalled_seconds_total", "Time spent in those pauses."),
+                ("ftp_transfer_retries_total", "Transfers sent again because the copy failed verification."),
+            )):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (direction, status), totals in sorted(self.transfers.items()):
+                    value = totals[index]
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f'{name}{{direction="{direction}",status="{status}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Write then rename, so a node_exporter textfile collector never reads half a file
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temp_path, path)
+
+
+# Shared by every InstrumentedFTP; FTP_METRICS_LOG in the environment names a JSONL log
+registry = Metrics(os.environ.get("FTP_METRICS_LOG"))
+
+
+class InstrumentedFTP(FTP):
+    """ftplib.FTP that reports the round-trip time of every command to `metrics`."""
+
+    def __init__(self, *args, metrics=None, **kwargs):
+        self.metrics = metrics or registry
+        self.pending = None
+        super().__init__(*args, **kwargs)
+
+    def putcmd(self, line):
+        self.pending = (line.split(" ", 1)[0].upper(), time.perf_counter())
+        super().putcmd(line)
+
+    def getresp(self):
+        # Replies nobody asked for just now, like the 226 closing a transfer, are not timed
+        pending, self.pending = self.pending, None
+        try:
+            resp = super().getresp()
+        except Error as e:
+            if pending is not None:
+                self.metrics.command(self.host, pending[0], time.perf_counter() - pending[1], str(e))
+            raise
+        if pending is not None:
+            self.metrics.command(self.host, pending[0], time.perf_counter() - pending[1], resp)
+        return resp
\ No newline at end of file
@@ -0,0 +1,110 @@
+import os
+import posixpath
+import threading
+from file_entries import DIR, FILE
+from ftp_operations import ensure_remote_dir, iter_listing
+from transfer_queue import TransferJob, UPLOAD
+
+
+class MirrorCancelled(Exception):
+    pass
+
+
+class TreeMirror:
+    """Copies a directory tree through a TransferQueue.
+
+    The tree is walked on a background thread (os.scandir locally, MLSD
+    remotely). Each directory is created before anything inside it is
+    queued, and files are queued as soon as they are found, so transfers
+    start while the walk is still running.
+    """
+
+    def __init__(self, queue, credentials, direction, local_path, remote_path, priority=0, on_finished=None):
+        self.queue = queue
+        self.credentials = credentials
+        self.direction = direction
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.priority = priority
+        self.on_finished = on_finished
+        self.job_ids = []
+        self.directories = 0
+        self.error = None
+        self.cancelled = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+        for job_id in self.job_ids:
+            self.queue.cancel(job_id)
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+        self.queue.wait()
+
+    def run(self):
+        pool = self.queue.session_pool(self.credentials)
+        ftp = None
+        broken = False
+        try:
+            ftp = pool.acquire()
+            self.walk(ftp)
+        except MirrorCancelled:
+            broken = True
+            self.error = "Transfer cancelled."
+        except Exception as e:
+            broken = True
+            self.error = str(e)
+        finally:
+            if ftp is not None:
+                pool.release(ftp, discard=broken)
+            if self.on_finished:
+                self.on_finished(self)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise MirrorCancelled()
+
+    def submit(self, local_path, remote_dir, name, mtime=None):
+        job = TransferJob(self.direction, local_path, remote_dir, name, self.credentials, self.priority)
+        job.mtime = mtime
+        self.job_ids.append(self.queue.submit(job))
+
+    def walk(self, ftp):
+        if self.direction == UPLOAD:
+            self.walk_local(ftp)
+        else:
+            self.walk_remote(ftp)
+
+    def walk_local(self, ftp):
+        pending = [(self.local_path, self.remote_path)]
+        while pending:
+            local_dir, remote_dir = pending.pop()
+            ensure_remote_dir(ftp, remote_dir)
+            self.directories += 1
+            with os.scandir(local_dir) as it:
+                for e in it:
+                    self.check_cancelled()
+                    if e.is_dir(follow_symlinks=False):
+                        pending.append((e.path, posixpath.join(remote_dir, e.name)))
+                    elif e.is_file():
+                        self.submit(e.path, remote_dir, e.name)
+
+    def walk_remote(self, ftp):
+        pending = [(self.remote_path, self.local_path)]
+        while pending:
+            remote_dir, local_dir = pending.pop()
+            os.makedirs(local_dir, exist_ok=True)
+            self.directories += 1
+            for entry in iter_listing(ftp, remote_dir):
+                self.check_cancelled()
+                if entry.kind == DIR:
+                    pending.append((posixpath.join(remote_dir, entry.name), os.path.join(local_dir, entry.name)))
+                elif entry.kind == FILE:
+                    self.submit(os.path.join(local_dir, entry.name), remote_dir, entry.name)
\ No newline at end of file
@@ -0,0 +1,264 @@
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+from batch_operations import RemoteBatch
+from file_entries import FileEntry, DIR, PARENT
+from ftp_operations import iter_listing
+
+# Rows of one account; every query is scoped to the server, port and username
+ACCOUNT = "server=? AND port=? AND username=?"
+# Results returned by one search
+SEARCH_LIMIT = 500
+# Seconds between progress reports of a crawl
+PROGRESS_INTERVAL = 0.5
+
+
+def default_index_path():
+    return os.path.join(os.path.expanduser("~"), ".ftp_client", "index.db")
+
+
+def account_of(credentials):
+    return (credentials["server"], credentials["port"], credentials["username"])
+
+
+def ancestors(path):
+    while path not in ("/", ""):
+        path = posixpath.dirname(path)
+        yield path
+
+
+class RemoteIndex:
+    """On-disk index of remote trees: every item with its size and mtime.
+
+    Directories are stored one listing at a time, so a directory listed
+    again only writes what changed. Each listed directory also keeps the
+    total size and file count of everything indexed below it, which stay
+    up to date as listings change. Names are searched through an FTS5
+    trigram index when SQLite has one, and by a scan otherwise.
+    """
+
+    def __init__(self, path=None):
+        path = path or default_index_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY,"
+            " server TEXT, port INTEGER, username TEXT,"
+            " parent TEXT, name TEXT, kind TEXT, size INTEGER, mtime REAL,"
+            " UNIQUE (server, port, username, parent, name))"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS directories ("
+            " server TEXT, port INTEGER, username TEXT,"
+            " path TEXT, parent TEXT, listed REAL, total_size INTEGER, files INTEGER,"
+            " PRIMARY KEY (server, port, username, path))"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS directories_parent ON directories (server, port, username, parent)")
+        try:
+            self.db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5("
+                " name, content='entries', content_rowid='id', tokenize='trigram')"
+            )
+            self.db.execute(
+                "CREATE TRIGGER IF NOT EXISTS entry_added AFTER INSERT ON entries BEGIN"
+                " INSERT INTO names (rowid, name) VALUES (new.id, new.name); END"
+            )
+            self.db.execute(
+                "CREATE TRIGGER IF NOT EXISTS entry_removed AFTER DELETE ON entries BEGIN"
+                " INSERT INTO names (names, rowid, name) VALUES ('delete', old.id, old.name); END"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite before 3.34 has no trigram tokenizer
+            self.fts = False
+        self.db.commit()
+
+    def update_directory(self, credentials, path, entries):
+        """Store the listing of `path`, replacing what the index had for it."""
+        account = account_of(credentials)
+        path = posixpath.normpath(path)
+        new = {entry.name: entry for entry in entries if entry.kind != PARENT}
+        with self.lock:
+            old = {name: (kind, size, mtime) for name, kind, size, mtime in self.db.execute(
+                f"SELECT name, kind, size, mtime FROM entries WHERE {ACCOUNT} AND parent=?", account + (path,))}
+            row = self.db.execute(
+                f"SELECT total_size, files FROM directories WHERE {ACCOUNT} AND path=?", account + (path,)).fetchone()
+            children = self.db.execute(
+                f"SELECT path, total_size, files FROM directories WHERE {ACCOUNT} AND parent=?",
+                account + (path,)).fetchall()
+
+            # Subtrees of directories that are gone, or are no longer directories
+            gone = {posixpath.join(path, name) for name, (kind, _, _) in old.items() if kind == DIR}
+            gone.update(child for child, _, _ in children)
+            gone -= {posixpath.join(path, name) for name, entry in new.items() if entry.kind == DIR}
+            for child in gone:
+                self.remove_tree(account, child)
+
+            self.db.executemany(
+                f"DELETE FROM entries WHERE {ACCOUNT} AND parent=? AND name=?",
+                [account + (path, name) for name in old if name not in new]
+            )
+            self.db.executemany(
+                "INSERT INTO entries (server, port, username, parent, name, kind, size, mtime)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (server, port, username, parent, name)"
+                " DO UPDATE SET kind=excluded.kind, size=excluded.size, mtime=excluded.mtime",
+                [account + (path, name, entry.kind, entry.size, entry.mtime) for name, entry in new.items()
+                 if old.get(name) != (entry.kind, entry.size, entry.mtime)]
+            )
+
+            files = [entry for entry in new.values() if entry.kind != DIR]
+            total_size = sum(entry.size or 0 for entry in files)
+            total_files = len(files)
+            for child, size, count in children:
+                if child not in gone:
+                    total_size += size
+                    total_files += count
+            parent = posixpath.dirname(path) if path != "/" else None
+            self.db.execute(
+                "INSERT INTO directories (server, port, username, path, parent, listed, total_size, files)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (server, port, username, path)"
+                " DO UPDATE SET listed=excluded.listed, total_size=excluded.total_size, files=excluded.files",
+                account + (path, parent, time.time(), total_size, total_files)
+            )
+            # Roll the change up into every indexed directory above
+            size_delta = total_size - (row[0] if row else 0)
+            files_delta = total_files - (row[1] if row else 0)
+            if size_delta or files_delta:
+                self.db.executemany(
+                    f"UPDATE directories SET total_size=total_size+?, files=files+? WHERE {ACCOUNT} AND path=?",
+                    [(size_delta, files_delta) + account + (above,) for above in ancestors(path)]
+                )
+            self.db.commit()
+
+    def remove_tree(self, account, path):
+        # Paths below `path` sort between path + "/" and path + "0", the character after "/"
+        below = (path, path + "/", path + "0")
+        self.db.execute(
+            f"DELETE FROM entries WHERE {ACCOUNT} AND (parent=? OR (parent>=? AND parent<?))", account + below)
+        self.db.execute(
+            f"DELETE FROM directories WHERE {ACCOUNT} AND (path=? OR (path>=? AND path<?))", account + below)
+
+    def has_directory(self, credentials, path):
+        with self.lock:
+            return self.db.execute(
+                f"SELECT 1 FROM directories WHERE {ACCOUNT} AND path=?",
+                account_of(credentials) + (posixpath.normpath(path),)
+            ).fetchone() is not None
+
+    def directory(self, credentials, path):
+        """(total size, file count, time listed) of an indexed directory, or None."""
+        with self.lock:
+            return self.db.execute(
+                f"SELECT total_size, files, listed FROM directories WHERE {ACCOUNT} AND path=?",
+                account_of(credentials) + (posixpath.normpath(path),)
+            ).fetchone()
+
+    def folders(self, credentials, path):
+        """(path, total size, file count) of the indexed folders in `path`, largest first."""
+        with self.lock:
+            return self.db.execute(
+                f"SELECT path, total_size, files FROM directories WHERE {ACCOUNT} AND parent=?"
+                " ORDER BY total_size DESC, path",
+                account_of(credentials) + (posixpath.normpath(path),)
+            ).fetchall()
+
+    def counts(self, credentials):
+        """(items, directories listed, time of the latest listing) for one account."""
+        account = account_of(credentials)
+        with self.lock:
+            items, = self.db.execute(f"SELECT count(*) FROM entries WHERE {ACCOUNT}", account).fetchone()
+            directories, listed = self.db.execute(
+                f"SELECT count(*), max(listed) FROM directories WHERE {ACCOUNT}", account).fetchone()
+        return items, directories, listed
+
+    def search(self, credentials, text, limit=SEARCH_LIMIT):
+        """(parent path, FileEntry) pairs whose name matches `text`, case-insensitively.
+
+        `text` is a glob when it contains *, ? or [, and a substring of the
+        name otherwise. A glob with a / is matched against the end of the
+        full path, or the whole of it when it starts with /.
+        Directories carry the total size of what is indexed below them.
+        """
+        text = text.strip()
+        if not text:
+            return []
+        full_path = "CASE e.parent WHEN '/' THEN '/' || e.name ELSE e.parent || '/' || e.name END"
+        like = None
+        if any(c in text for c in "*?["):
+            if "/" in text:
+                pattern = text if text.startswith("/") else "*/" + text
+                conditions, values = [f"lower({full_path}) GLOB ?"], [pattern.lower()]
+            else:
+                conditions, values = ["lower(e.name) GLOB ?"], [text.lower()]
+                if "[" not in text:
+                    like = text.replace("*", "%").replace("?", "_")
+        else:
+            conditions, values = ["instr(lower(e.name), ?) > 0"], [text.lower()]
+            like = f"%{text}%"
+        # Let the trigram index pick the candidates; a % or _ in the text only makes LIKE match more.
+        # CROSS JOIN keeps SQLite from walking every row of the account and probing the index for each.
+        source = "entries e"
+        if self.fts and like is not None and len(text.replace("*", "").replace("?", "")) >= 3:
+            source = "names CROSS JOIN entries e ON e.id = names.rowid"
+            conditions.insert(0, "names.name LIKE ?")
+            values.insert(0, like)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT e.parent, e.name, e.kind, coalesce(d.total_size, e.size), e.mtime FROM {source}"
+                " LEFT JOIN directories d ON e.kind = 'dir' AND d.server = e.server AND d.port = e.port"
+                f" AND d.username = e.username AND d.path = {full_path}"
+                " WHERE e.server=? AND e.port=? AND e.username=?"
+                f" AND {' AND '.join(conditions)} LIMIT ?",
+                account_of(credentials) + tuple(values) + (limit,)
+            ).fetchall()
+        # Sorted here rather than in SQL, so the query stops at `limit` matches
+        return [(parent, FileEntry(name, size, mtime, kind)) for parent, name, kind, size, mtime in sorted(rows)]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class RemoteCrawl(RemoteBatch):
+    """Lists a remote tree on pooled sessions and records it in a RemoteIndex.
+
+    Directories are listed in parallel, each stored as soon as it has been
+    read, so a crawl that is cancelled still leaves what it saw. `done`
+    counts the directories listed and `entries` the items found in them;
+    on_progress is called with the crawl now and then while it runs.
+    """
+
+    action = "indexed"
+
+    def __init__(self, queue, credentials, index, root="/", on_finished=None, on_progress=None, sessions=4):
+        super().__init__(queue, credentials, on_finished, sessions)
+        self.index = index
+        self.root = root
+        self.on_progress = on_progress
+        self.entries = 0
+        self.reported = 0
+
+    def execute(self, pool):
+        self.run_tasks(pool, [self.root], self.walk)
+
+    def walk(self, ftp, path):
+        entries = list(iter_listing(ftp, path))
+        self.index.update_directory(self.credentials, path, entries)
+        with self.lock:
+            self.entries += len(entries)
+            self.done += 1
+            now = time.monotonic()
+            report = now - self.reported >= PROGRESS_INTERVAL
+            if report:
+                self.reported = now
+        if report and self.on_progress:
+            self.on_progress(self)
+        return [posixpath.join(path, entry.name) for entry in entries if entry.kind == DIR]
\ No newline at end of file
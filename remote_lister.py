@@ -0,0 +1,140 @@
+import time
+from itertools import count
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from ftp_operations import iter_listing
+from session_pool import SessionPool
+
+# The first batch is sent early so the panel fills while the listing runs
+FIRST_BATCH_SIZE = 100
+BATCH_SIZE = 2000
+BATCH_INTERVAL = 0.05
+
+
+class ListingCancelled(Exception):
+    pass
+
+
+class ListingRequest:
+    def __init__(self, request_id, path):
+        self.request_id = request_id
+        self.path = path
+        self.cancelled = False
+
+
+class ListingSignals(QObject):
+    # request_id, path, [FileEntry, ...]
+    batch = pyqtSignal(int, str, list)
+    finished = pyqtSignal(int, str, list)
+    failed = pyqtSignal(int, str, str)
+
+
+class ListingWorker(QRunnable):
+    def __init__(self, request, pool, signals):
+        super().__init__()
+        self.request = request
+        self.pool = pool
+        self.signals = signals
+
+    def run(self):
+        request = self.request
+        ftp = None
+        entries = []
+        try:
+            if request.cancelled:
+                raise ListingCancelled()
+            ftp = self.pool.acquire()
+            batch = []
+            batch_size = FIRST_BATCH_SIZE
+            last_emit = time.monotonic()
+            for entry in iter_listing(ftp, request.path):
+                if request.cancelled:
+                    raise ListingCancelled()
+                batch.append(entry)
+                now = time.monotonic()
+                if len(batch) >= batch_size or now - last_emit >= BATCH_INTERVAL:
+                    self.signals.batch.emit(request.request_id, request.path, batch)
+                    entries.extend(batch)
+                    batch = []
+                    batch_size = BATCH_SIZE
+                    last_emit = now
+            if batch:
+                self.signals.batch.emit(request.request_id, request.path, batch)
+                entries.extend(batch)
+            self.pool.release(ftp)
+            ftp = None
+            self.signals.finished.emit(request.request_id, request.path, entries)
+        except ListingCancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(request.request_id, request.path, str(e))
+        finally:
+            if ftp is not None:
+                self.pool.release(ftp, discard=True)
+
+
+class RemoteLister(QObject):
+    """Lists remote directories on a pool thread, one request at a time.
+
+    Starting a new listing cancels the running one, and only the signals
+    of the latest request are forwarded.
+    """
+
+    batch = pyqtSignal(str, list)
+    finished = pyqtSignal(str, list)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None, sessions=2):
+        super().__init__(parent)
+        self.sessions = sessions
+        self.pool = None
+        self.request = None
+        self.request_ids = count(1)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(sessions)
+        self.signals = ListingSignals(self)
+        self.signals.batch.connect(self.on_batch)
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+
+    def set_credentials(self, credentials, session=None):
+        """Use `credentials` from now on; `session`, already logged in with them, serves the next listing."""
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = SessionPool(credentials, self.sessions)
+        if session is not None:
+            self.pool.adopt(session)
+
+    def list(self, path):
+        self.cancel()
+        if self.pool is None:
+            # Not logged in yet; the first listing is asked for once it is
+            return
+        self.request = ListingRequest(next(self.request_ids), path)
+        self.thread_pool.start(ListingWorker(self.request, self.pool, self.signals))
+
+    def cancel(self):
+        if self.request is not None:
+            self.request.cancelled = True
+            self.request = None
+
+    def shutdown(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.close()
+
+    def is_current(self, request_id):
+        return self.request is not None and self.request.request_id == request_id
+
+    def on_batch(self, request_id, path, entries):
+        if self.is_current(request_id):
+            self.batch.emit(path, entries)
+
+    def on_finished(self, request_id, path, entries):
+        if self.is_current(request_id):
+            self.request = None
+            self.finished.emit(path, entries)
+
+    def on_failed(self, request_id, path, message):
+        if self.is_current(request_id):
+            self.request = None
+            self.failed.emit(path, message)
\ No newline at end of file
@@ -0,0 +1,151 @@
+import posixpath
+import time
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+    QLabel, QPushButton
+)
+from file_entries import DIR, format_size
+
+COLUMNS = ("Path", "Size", "Modified")
+PATH, SIZE, MODIFIED = range(len(COLUMNS))
+# Typing pauses this long (ms) before the index is searched
+SEARCH_DELAY = 150
+
+
+def format_time(mtime):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)) if mtime else ""
+
+
+class SearchDialog(QDialog):
+    """Searches the remote index of the connected server and shows folder sizes.
+
+    With no search text it lists the folders of the current remote
+    directory, largest first, with the total size of what is indexed in
+    each. Double-clicking a result emits open_path with the directory to
+    show in the remote panel.
+    """
+
+    open_path = pyqtSignal(str)
+
+    def __init__(self, engine, window):
+        super().__init__(window)
+        self.engine = engine
+        self.index = engine.remote_index()
+        self.window = window
+        self.crawl = None
+        self.setWindowTitle("Search Server")
+        self.resize(700, 450)
+        layout = QVBoxLayout(self)
+
+        self.search_input = QLineEdit("")
+        self.search_input.setPlaceholderText("Part of a name, or a pattern like *.iso or docs/*/report*")
+        self.search_input.setClearButtonEnabled(True)
+        layout.addWidget(self.search_input)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(PATH, QHeaderView.Stretch)
+        self.table.itemDoubleClicked.connect(self.on_item_double_clicked)
+        layout.addWidget(self.table)
+
+        footer = QHBoxLayout()
+        self.status_label = QLabel("")
+        footer.addWidget(self.status_label)
+        footer.addStretch()
+        self.btn_index = QPushButton("Index Server")
+        self.btn_index.clicked.connect(self.toggle_crawl)
+        self.btn_index.setEnabled(self.index is not None)
+        footer.addWidget(self.btn_index)
+        layout.addLayout(footer)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        engine.crawl_progress.connect(self.on_crawl_progress)
+        engine.crawl_finished.connect(self.on_crawl_finished)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_button()
+        self.refresh()
+        self.search_input.setFocus()
+
+    def refresh(self):
+        if self.index is None:
+            self.status_label.setText("The search index could not be opened.")
+            return
+        text = self.search_input.text().strip()
+        if text:
+            self.show_results(text)
+        else:
+            self.show_folders()
+
+    def show_results(self, text):
+        started = time.perf_counter()
+        results = self.index.search(self.window.login_credentials, text)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.set_rows([(posixpath.join(parent, entry.name), entry.size, entry.mtime, entry.kind == DIR, "")
+                       for parent, entry in results])
+        self.status_label.setText(f"{len(results)} match(es) in {elapsed:.0f} ms")
+
+    def show_folders(self):
+        credentials = self.window.login_credentials
+        path = self.window.remote_current_path
+        self.set_rows([(folder, size, None, True, f"{files} file(s)")
+                       for folder, size, files in self.index.folders(credentials, path)])
+        summary = self.index.directory(credentials, path)
+        if summary is None:
+            items, directories, listed = self.index.counts(credentials)
+            self.status_label.setText(f"{path} is not indexed yet ({items} item(s) indexed on this server)")
+        else:
+            total_size, files, listed = summary
+            self.status_label.setText(
+                f"{path}: {format_size(total_size)} in {files} file(s), indexed {format_time(listed)}")
+
+    def set_rows(self, rows):
+        self.table.setRowCount(len(rows))
+        for row, (path, size, mtime, is_dir, note) in enumerate(rows):
+            name = QTableWidgetItem(f"📁 {path}" if is_dir else path)
+            name.setData(Qt.UserRole, path if is_dir else posixpath.dirname(path))
+            self.table.setItem(row, PATH, name)
+            size_text = format_size(size) if size is not None else ""
+            size_item = QTableWidgetItem(f"{size_text} ({note})" if note else size_text)
+            size_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.table.setItem(row, SIZE, size_item)
+            self.table.setItem(row, MODIFIED, QTableWidgetItem(format_time(mtime)))
+
+    def on_item_double_clicked(self, item):
+        self.open_path.emit(self.table.item(item.row(), PATH).data(Qt.UserRole))
+
+    def toggle_crawl(self):
+        if self.crawl is not None:
+            self.crawl.cancel()
+            return
+        self.crawl = self.engine.crawl("/")
+        self.btn_index.setText("Stop Indexing")
+        self.status_label.setText("Indexing...")
+
+    def update_button(self):
+        if self.crawl is None and self.index is not None:
+            items, directories, listed = self.index.counts(self.window.login_credentials)
+            self.btn_index.setText("Update Index" if directories else "Index Server")
+
+    def on_crawl_progress(self, crawl):
+        if crawl is self.crawl:
+            self.status_label.setText(f"Indexing... {crawl.done} folder(s), {crawl.entries} item(s)")
+
+    def on_crawl_finished(self, crawl):
+        if crawl is not self.crawl:
+            return
+        self.crawl = None
+        self.update_button()
+        self.refresh()
+        if crawl.error or crawl.errors:
+            problem = crawl.error or f"{len(crawl.errors)} folder(s) could not be listed"
+            self.status_label.setText(f"{self.status_label.text()} ({problem})")
\ No newline at end of file
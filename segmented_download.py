@@ -0,0 +1,135 @@
+import os
+import threading
+from ftplib import error_reply, error_temp, error_perm
+from ftp_operations import block_size_for, has_feature, set_transfer_mode
+
+# Files smaller than this are always fetched over a single stream
+SEGMENT_THRESHOLD = 64 * 1024 * 1024
+MAX_SEGMENTS = 4
+# Bytes read back per step when hashing a segmented download
+HASH_BLOCK = 1024 * 1024
+
+
+def can_segment(ftp, total):
+    return hasattr(os, "pwrite") and total >= SEGMENT_THRESHOLD and has_feature(ftp, "REST STREAM")
+
+
+def split_ranges(total, count):
+    step = -(-total // count)
+    return [(start, min(step, total - start)) for start in range(0, total, step)]
+
+
+def fetch_range(ftp, file_name, fd, offset, length, callback):
+    # Ranges are cut off early, which only works on a plain stream
+    set_transfer_mode(ftp, False)
+    ftp.voidcmd("TYPE I")
+    conn = ftp.transfercmd(f"RETR {file_name}", rest=offset)
+    buffer = bytearray(block_size_for(length))
+    position = offset
+    remaining = length
+    try:
+        while remaining > 0:
+            received = conn.recv_into(buffer, min(len(buffer), remaining))
+            if not received:
+                break
+            view = memoryview(buffer)[:received]
+            while view:
+                written = os.pwrite(fd, view, position)
+                view = view[written:]
+                position += written
+            remaining -= received
+            callback(received)
+    finally:
+        conn.close()
+
+    if remaining > 0:
+        raise EOFError(f"Connection closed {remaining} bytes before the end of the segment.")
+
+    # Closing the data connection early makes most servers answer 426
+    try:
+        ftp.voidresp()
+    except (error_reply, error_temp, error_perm):
+        pass
+
+
+def download_segmented(ftp, pool, remote_path, file_name, local_path, total, callback, digest=None):
+    """Fetch `file_name` as byte ranges over `ftp` plus any idle sessions of `pool`.
+
+    Each range is requested with REST + RETR on its own connection and
+    written in place into the preallocated local file. The ranges arrive
+    out of order, so a `digest` is fed by a thread that reads the file
+    back in order just behind the writes, while it is in the page cache.
+    """
+    extra = []
+    while len(extra) < MAX_SEGMENTS - 1:
+        session = pool.try_acquire()
+        if session is None:
+            break
+        extra.append(session)
+
+    lock = threading.Condition()
+    errors = []
+    broken = set()
+    ranges = split_ranges(total, len(extra) + 1)
+    # Bytes written so far at the start of each range
+    written = [0] * len(ranges)
+    stopped = []
+
+    def run(session, index, change_dir):
+        def report(size):
+            with lock:
+                written[index] += size
+                callback(size)
+                lock.notify_all()
+
+        offset, length = ranges[index]
+        try:
+            if change_dir:
+                session.cwd(remote_path)
+            fetch_range(session, file_name, fd, offset, length, report)
+        except Exception as e:
+            broken.add(id(session))
+            errors.append(e)
+
+    def follow():
+        for index, (offset, length) in enumerate(ranges):
+            position = 0
+            while position < length:
+                with lock:
+                    while written[index] <= position and not stopped:
+                        lock.wait()
+                    available = written[index]
+                if available <= position:
+                    return
+                while position < available:
+                    data = os.pread(fd, min(HASH_BLOCK, available - position), offset + position)
+                    digest.update(data)
+                    position += len(data)
+
+    fd = os.open(local_path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        os.ftruncate(fd, total)
+        threads = []
+        for index, session in enumerate(extra, 1):
+            thread = threading.Thread(target=run, args=(session, index, True), daemon=True)
+            thread.start()
+            threads.append(thread)
+        follower = None
+        if digest is not None:
+            follower = threading.Thread(target=follow, daemon=True)
+            follower.start()
+        run(ftp, 0, False)
+        for thread in threads:
+            thread.join()
+        if follower is not None:
+            with lock:
+                stopped.append(True)
+                lock.notify_all()
+            follower.join()
+    finally:
+        os.close(fd)
+        for session in extra:
+            pool.release(session, discard=id(session) in broken)
+
+    if errors:
+        raise errors[0]
\ No newline at end of file
@@ -0,0 +1,424 @@
+import posixpath
+import threading
+import time
+from ftplib import error_temp
+from ftp_operations import open_connection
+from ftps import new_ftp
+
+# Idle sessions get a NOOP this often so the server does not time them out
+KEEPALIVE_INTERVAL = 30.0
+# A session idle for longer than this is checked with a NOOP before use
+CHECK_IDLE = 10.0
+# ftplib methods that are not retried after a reconnect: those that consume
+# a file or a data connection could send or write part of the data twice,
+# and a change the server made before the connection dropped would fail
+# the second time round (DELE, RNTO, MKD, ... then get a 550)
+NO_RETRY = {"storbinary", "storlines", "retrbinary", "retrlines", "transfercmd", "ntransfercmd", "sendcmd",
+            "voidcmd", "delete", "rename", "mkd", "rmd"}
+
+
+def host_key(credentials):
+    return (credentials["server"], credentials["port"], credentials["username"])
+
+
+def is_connection_error(error):
+    # 421: the server is closing the control connection, e.g. on idle timeout
+    return isinstance(error, (OSError, EOFError)) or (isinstance(error, error_temp) and str(error).startswith("421"))
+
+
+def alive(ftp):
+    try:
+        ftp.voidcmd("NOOP")
+        return True
+    except Exception:
+        return False
+
+
+class SessionPool:
+    """Hands out up to `size` logged-in FTP sessions for one account.
+
+    Idle sessions are kept alive with NOOP and dropped once the server has
+    closed them. A session that sat idle for a while is checked before it
+    is handed out and replaced by a fresh login if it is dead, so callers
+    do not see stale connections. warm() logs sessions in ahead of time.
+    Over TLS the first session is logged in on its own, so the rest can
+    resume its TLS session instead of each making a full handshake.
+    """
+
+    def __init__(self, credentials, size=4, keepalive=KEEPALIVE_INTERVAL):
+        self.credentials = dict(credentials)
+        self.size = size
+        self.keepalive = keepalive
+        self.warm_count = 0
+        self.idle = []
+        self.opened = 0
+        self.resumable = False
+        self.first_login = threading.Lock()
+        self.closed = False
+        self.lock = threading.Condition()
+        self.stopped = threading.Event()
+        self.keeper = None
+
+    def acquire(self, timeout=None):
+        with self.lock:
+            while not self.idle and self.opened >= self.size:
+                if self.closed:
+                    raise RuntimeError("Session pool is closed.")
+                if not self.lock.wait(timeout):
+                    raise TimeoutError("No FTP session available.")
+            if self.closed:
+                raise RuntimeError("Session pool is closed.")
+            if self.idle:
+                ftp = self.idle.pop()
+            else:
+                self.opened += 1
+                ftp = None
+        if ftp is None:
+            return self.open_session()
+        return self.checked(ftp)
+
+    def acquire_in(self, path, timeout=None):
+        """acquire() a session and change to `path` on it.
+
+        A session released only moments ago is handed out unchecked, and
+        its connection may have dropped since. When the CWD finds it dead,
+        it is replaced by a fresh login and the CWD is tried once more.
+        """
+        ftp = self.acquire(timeout)
+        try:
+            ftp.cwd(path)
+            return ftp
+        except Exception as e:
+            if not is_connection_error(e):
+                self.release(ftp)
+                raise
+        ftp.close()
+        # Keeps the slot of the dead session; open_session() gives it back if it fails
+        ftp = self.open_session()
+        try:
+            ftp.cwd(path)
+        except Exception:
+            self.release(ftp, discard=True)
+            raise
+        return ftp
+
+    def try_acquire(self):
+        with self.lock:
+            if self.closed:
+                return None
+            if self.idle:
+                ftp = self.idle.pop()
+            elif self.opened >= self.size:
+                return None
+            else:
+                self.opened += 1
+                ftp = None
+        try:
+            return self.open_session() if ftp is None else self.checked(ftp)
+        except Exception:
+            return None
+
+    def checked(self, ftp):
+        if time.monotonic() - ftp.last_used < CHECK_IDLE or alive(ftp):
+            return ftp
+        ftp.close()
+        return self.open_session()
+
+    def open_session(self):
+        try:
+            ftp = self.connect()
+        except Exception:
+            with self.lock:
+                self.opened -= 1
+                self.lock.notify()
+            raise
+        self.start_keepalive()
+        return ftp
+
+    def connect(self):
+        if self.credentials.get("tls") and not self.resumable:
+            with self.first_login:
+                if not self.resumable:
+                    ftp = open_connection(self.credentials)
+                    self.resumable = True
+                    return ftp
+        return open_connection(self.credentials)
+
+    def release(self, ftp, discard=False):
+        with self.lock:
+            if discard or self.closed:
+                self.opened -= 1
+            else:
+                ftp.last_used = time.monotonic()
+                self.idle.append(ftp)
+                ftp = None
+            self.lock.notify()
+        if ftp is not None:
+            close_session(ftp)
+
+    def adopt(self, ftp):
+        """Keep a session that was logged in elsewhere, if there is room for it."""
+        with self.lock:
+            if not self.closed and self.opened < self.size:
+                self.opened += 1
+                self.resumable = True
+                ftp.last_used = time.monotonic()
+                self.idle.append(ftp)
+                self.lock.notify()
+                ftp = None
+        if ftp is not None:
+            close_session(ftp)
+        else:
+            self.start_keepalive()
+
+    def warm(self, count=1):
+        """Log in up to `count` sessions in the background and keep them open."""
+        self.warm_count = min(max(self.warm_count, count), self.size)
+        threading.Thread(target=self.top_up, daemon=True).start()
+
+    def top_up(self):
+        while True:
+            with self.lock:
+                if self.closed or len(self.idle) >= self.warm_count or self.opened >= self.size:
+                    return
+                self.opened += 1
+            try:
+                ftp = self.open_session()
+            except Exception:
+                return
+            self.release(ftp)
+
+    def start_keepalive(self):
+        with self.lock:
+            if self.keeper is not None or not self.keepalive:
+                return
+            self.keeper = threading.Thread(target=self.keep_alive, daemon=True)
+        self.keeper.start()
+
+    def keep_alive(self):
+        while not self.stopped.wait(self.keepalive):
+            now = time.monotonic()
+            with self.lock:
+                stale = [ftp for ftp in self.idle if now - ftp.last_used >= self.keepalive]
+                self.idle = [ftp for ftp in self.idle if now - ftp.last_used < self.keepalive]
+            for ftp in stale:
+                self.release(ftp, discard=not alive(ftp))
+            if self.warm_count:
+                self.top_up()
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.opened -= len(idle)
+            self.lock.notify_all()
+        for ftp in idle:
+            close_session(ftp)
+
+
+class ReconnectingFTP:
+    """A long-lived FTP session that survives idle timeouts and dropped connections.
+
+    Use it like ftplib.FTP. Calls are forwarded to a logged-in FTP object;
+    when the connection turns out to be dead, it logs in again, changes
+    back to the directory it was in and retries the call once. While idle,
+    a NOOP every `keepalive` seconds keeps the server from timing it out.
+    With `tls`, it uses FTPS and protects the data connections too.
+    """
+
+    def __init__(self, keepalive=KEEPALIVE_INTERVAL):
+        self.ftp = new_ftp({})
+        self.credentials = {}
+        self.directory = None
+        self.keepalive = keepalive
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.keeper = None
+
+    def __getattr__(self, name):
+        attr = getattr(self.ftp, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def open(self, credentials, directory="/"):
+        """Log in with `credentials` on a background thread; calls made meanwhile wait for it."""
+        self.credentials.update(credentials)
+        self.directory = directory
+        threading.Thread(target=self.open_now, daemon=True).start()
+        self.start_keepalive()
+
+    def open_now(self):
+        with self.lock:
+            if self.ftp.sock is not None:
+                return
+            try:
+                self.reconnect()
+            except Exception:
+                # The next call tries again and reports the error
+                pass
+
+    def connect(self, host, port=21, tls=False, tls_verify=True):
+        self.credentials.update(server=host, port=port, tls=tls, tls_verify=tls_verify)
+        with self.lock:
+            self.ftp.close()
+            self.ftp = new_ftp(self.credentials)
+            return self.ftp.connect(host, port)
+
+    def login(self, user, passwd):
+        self.credentials.update(username=user, password=passwd)
+        with self.lock:
+            resp = self.ftp.login(user, passwd)
+            if self.credentials.get("tls"):
+                self.ftp.prot_p()
+            self.last_used = time.monotonic()
+        self.start_keepalive()
+        return resp
+
+    def cwd(self, path):
+        resp = self.call("cwd", path)
+        self.directory = posixpath.normpath(posixpath.join(self.directory or "/", path))
+        return resp
+
+    def call(self, name, *args, **kwargs):
+        with self.lock:
+            if "password" in self.credentials and (
+                    self.ftp.sock is None or (time.monotonic() - self.last_used >= CHECK_IDLE and not alive(self.ftp))):
+                self.reconnect()
+            try:
+                result = getattr(self.ftp, name)(*args, **kwargs)
+            except Exception as e:
+                if "password" not in self.credentials or not is_connection_error(e):
+                    raise
+                if name in NO_RETRY:
+                    # Whatever is called next logs in again first
+                    self.ftp.close()
+                    raise
+                self.reconnect()
+                result = getattr(self.ftp, name)(*args, **kwargs)
+            self.last_used = time.monotonic()
+            return result
+
+    def reconnect(self):
+        self.ftp.close()
+        self.ftp = open_connection(self.credentials, self.directory or "/")
+        self.last_used = time.monotonic()
+
+    def start_keepalive(self):
+        if self.keeper is None and self.keepalive:
+            self.keeper = threading.Thread(target=self.keep_alive, daemon=True)
+            self.keeper.start()
+
+    def keep_alive(self):
+        while not self.stopped.wait(self.keepalive):
+            # Skip the round if a call is in progress; it keeps the session busy anyway
+            if not self.lock.acquire(blocking=False):
+                continue
+            try:
+                if time.monotonic() - self.last_used >= self.keepalive:
+                    if alive(self.ftp):
+                        self.last_used = time.monotonic()
+                    else:
+                        self.reconnect()
+            except Exception:
+                # Still down; the next call tries again
+                pass
+            finally:
+                self.lock.release()
+
+    def quit(self):
+        self.stopped.set()
+        with self.lock:
+            return self.ftp.quit()
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            self.ftp.close()
+
+
+def close_session(ftp):
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
+
+class Preconnector:
+    """Opens the control connection to a server before the login is known.
+
+    start() resolves the host and connects in the background, making the
+    TLS handshake too for FTPS, so that login() only has to send the
+    username and password. Starting it again for another server drops the
+    earlier connection. login() opens a fresh connection when there is no
+    early one for the server or the server has closed it meanwhile.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.ftp = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self, host, port=21, tls=False, tls_verify=True):
+        key = (host, port, tls, tls_verify)
+        with self.lock:
+            if not host or key == self.key:
+                return
+            ftp, self.ftp = self.ftp, None
+            self.key = key
+            self.thread = threading.Thread(target=self.open, args=(key,), daemon=True)
+            self.thread.start()
+        if ftp is not None:
+            ftp.close()
+
+    def open(self, key):
+        host, port, tls, tls_verify = key
+        ftp = new_ftp({"tls": tls, "tls_verify": tls_verify})
+        try:
+            ftp.connect(host, port)
+            if tls:
+                ftp.auth()
+        except Exception:
+            ftp.close()
+            return
+        with self.lock:
+            if self.key == key:
+                self.ftp, ftp = ftp, None
+        if ftp is not None:
+            ftp.close()
+
+    def login(self, credentials, remote_path="/"):
+        """A logged-in session in `remote_path`, on the early connection when there is one."""
+        key = (credentials["server"], credentials["port"], bool(credentials.get("tls")),
+               credentials.get("tls_verify", True))
+        with self.lock:
+            thread = self.thread if self.key == key else None
+        if thread is not None:
+            thread.join()
+        with self.lock:
+            ftp = self.ftp if self.key == key else None
+            if ftp is not None:
+                self.ftp = None
+                self.key = None
+        if ftp is not None:
+            try:
+                ftp.login(credentials["username"], credentials["password"])
+                if credentials.get("tls"):
+                    ftp.prot_p()
+                ftp.cwd(remote_path)
+                return ftp
+            except Exception as e:
+                ftp.close()
+                if not is_connection_error(e):
+                    raise
+        return open_connection(credentials, remote_path)
+
+    def close(self):
+        with self.lock:
+            ftp, self.ftp = self.ftp, None
+            self.key = None
+        if ftp is not None:
+            ftp.close()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import os
+import posixpath
+import shutil
+from ftplib import error_perm
+from checksums import local_checksum, remote_checksum
+from file_entries import DIR, FILE
+from ftp_operations import ensure_remote_dir, list_remote, remove_remote_tree
+from local_scanner import scan_directory, fill_stats
+from mirror import TreeMirror
+from transfer_queue import UPLOAD
+
+COPY = "copy"
+MKDIR = "mkdir"
+DELETE = "delete"
+
+# Servers and filesystems that keep whole seconds (or FAT's two) round
+# modification times, so closer than this counts as the same time
+MTIME_TOLERANCE = 2.0
+
+
+class SyncAction:
+    __slots__ = ("action", "path", "reason", "size")
+
+    def __init__(self, action, path, reason="", size=None):
+        self.action = action
+        self.path = path
+        self.reason = reason
+        self.size = size
+
+    def __str__(self):
+        return f"{self.action:6} {self.path}" + (f" ({self.reason})" if self.reason else "")
+
+
+class TreeSync(TreeMirror):
+    """Makes one tree match the other, copying only what differs.
+
+    Both sides are listed a directory at a time, so the only per-file cost
+    of an unchanged file is comparing its size and mtime. A file is copied
+    when it is missing, its size differs, or the copy is older than the
+    source; with `use_hash`, an older copy of the same size is compared by
+    checksum (HASH, XMD5 or XCRC) instead. Copies get the source's mtime
+    (MFMT remotely) so the next run can trust it.
+
+    With `dry_run` nothing is changed and `actions` is the report. With
+    `delete`, items only present on the target side are removed.
+    """
+
+    def __init__(self, queue, credentials, direction, local_path, remote_path, priority=0,
+                 on_finished=None, dry_run=False, delete=False, use_hash=False):
+        super().__init__(queue, credentials, direction, local_path, remote_path, priority, on_finished)
+        self.dry_run = dry_run
+        self.delete = delete
+        self.use_hash = use_hash
+        self.actions = []
+        self.skipped = 0
+
+    def record(self, action, path, reason="", size=None):
+        self.actions.append(SyncAction(action, path, reason, size))
+
+    def walk(self, ftp):
+        upload = self.direction == UPLOAD
+        if upload:
+            target_exists = self.remote_exists(ftp, self.remote_path)
+        else:
+            target_exists = os.path.isdir(self.local_path)
+        if not target_exists:
+            self.make_target_dir(ftp, "")
+        pending = [("", target_exists)]
+        while pending:
+            relative, target_exists = pending.pop()
+            local_dir = os.path.join(self.local_path, *relative.split("/")) if relative else self.local_path
+            remote_dir = posixpath.join(self.remote_path, relative) if relative else self.remote_path
+            # A target directory that does not exist yet (or only would, in a dry run) is empty
+            local = self.local_entries(local_dir) if upload or target_exists else {}
+            remote = self.remote_entries(ftp, remote_dir) if not upload or target_exists else {}
+            source, target = (local, remote) if upload else (remote, local)
+            self.directories += 1
+
+            for name, entry in source.items():
+                self.check_cancelled()
+                path = posixpath.join(relative, name)
+                existing = target.get(name)
+                if entry.kind == DIR:
+                    exists = existing is not None and existing.kind == DIR
+                    if not exists:
+                        self.make_target_dir(ftp, path)
+                    pending.append((path, exists))
+                elif entry.kind == FILE:
+                    reason = self.compare(ftp, entry, existing, os.path.join(local_dir, name),
+                                          posixpath.join(remote_dir, name))
+                    if reason is None:
+                        self.skipped += 1
+                        continue
+                    self.record(COPY, path, reason, entry.size)
+                    if not self.dry_run:
+                        self.submit(os.path.join(local_dir, name), remote_dir, name, entry.mtime)
+
+            if self.delete:
+                for name, entry in target.items():
+                    if name not in source:
+                        self.check_cancelled()
+                        self.remove_target(ftp, posixpath.join(relative, name), entry,
+                                           os.path.join(local_dir, name), posixpath.join(remote_dir, name))
+
+    def compare(self, ftp, source, target, local_path, remote_path):
+        """Why `source` needs copying over `target`, or None if it is up to date."""
+        if target is None:
+            return "new"
+        if target.kind != FILE:
+            return "type"
+        if source.size != target.size:
+            return "size"
+        if source.mtime is None or target.mtime is None:
+            return None
+        # A LIST time on the target side may be cut to the minute or the day
+        if target.mtime + target.precision >= source.mtime - MTIME_TOLERANCE:
+            return None
+        if self.use_hash:
+            checksum = remote_checksum(ftp, remote_path)
+            if checksum is not None:
+                algorithm, digest = checksum
+                return None if local_checksum(local_path, algorithm) == digest else "checksum"
+        return "newer"
+
+    def make_target_dir(self, ftp, relative):
+        self.record(MKDIR, relative or ".")
+        if self.dry_run:
+            return
+        if self.direction == UPLOAD:
+            ensure_remote_dir(ftp, posixpath.join(self.remote_path, relative) if relative else self.remote_path)
+        else:
+            os.makedirs(os.path.join(self.local_path, *relative.split("/")) if relative else self.local_path,
+                        exist_ok=True)
+
+    def remove_target(self, ftp, relative, entry, local_path, remote_path):
+        self.record(DELETE, relative, "extraneous", entry.size)
+        if self.dry_run:
+            return
+        if self.direction == UPLOAD:
+            if entry.kind == DIR:
+                remove_remote_tree(ftp, remote_path)
+            else:
+                ftp.delete(remote_path)
+        elif os.path.islink(local_path):
+            # Scanned as the directory it points to, but only the link is extraneous
+            os.unlink(local_path)
+        elif entry.kind == DIR:
+            shutil.rmtree(local_path)
+        else:
+            os.remove(local_path)
+
+    def remote_exists(self, ftp, path):
+        try:
+            ftp.cwd(path)
+            return True
+        except error_perm:
+            return False
+
+    def local_entries(self, path):
+        try:
+            entries = scan_directory(path)
+        except FileNotFoundError:
+            return {}
+        fill_stats(path, entries)
+        return {e.name: e for e in entries}
+
+    def remote_entries(self, ftp, path):
+        return {e.name: e for e in list_remote(ftp, path)}
\ No newline at end of file
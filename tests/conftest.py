@@ -0,0 +1,48 @@
+import os
+import sys
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    # The transfer journal and the remote index live under ~/.ftp_client
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    return tmp_path / "home"
+
+
+@pytest.fixture(scope="session")
+def app():
+    QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+    # Kept for the whole run; a QApplication collected under live widgets crashes
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def ftp_root(tmp_path):
+    root = tmp_path / "server"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def credentials(ftp_root):
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("user", "secret", str(ftp_root), perm="elradfmwMT")
+
+    class Handler(FTPHandler):
+        pass
+
+    Handler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"handle_exit": False}, daemon=True)
+    thread.start()
+    yield {"server": "127.0.0.1", "port": server.address[1], "username": "user", "password": "secret"}
+    server.close_all()
\ No newline at end of file
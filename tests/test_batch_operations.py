@@ -0,0 +1,27 @@
+import batch_operations
+from batch_operations import RemoteDelete
+from transfer_queue import TransferQueue
+
+
+def test_delete_skips_directories_that_could_not_be_listed(credentials, ftp_root, monkeypatch):
+    (ftp_root / "tree" / "broken").mkdir(parents=True)
+    (ftp_root / "tree" / "broken" / "kept.txt").write_bytes(b"1")
+    (ftp_root / "tree" / "ok").mkdir()
+    (ftp_root / "tree" / "ok" / "gone.txt").write_bytes(b"2")
+    iter_listing = batch_operations.iter_listing
+
+    def failing_listing(ftp, path):
+        if path == "/tree/broken":
+            raise OSError("listing failed")
+        return iter_listing(ftp, path)
+
+    monkeypatch.setattr(batch_operations, "iter_listing", failing_listing)
+    queue = TransferQueue(workers=1)
+    try:
+        batch = RemoteDelete(queue, credentials, directories=["/tree"]).start()
+        batch.wait()
+    finally:
+        queue.shutdown()
+    assert [path for path, error in batch.errors].count("/tree/broken") == 1
+    assert (ftp_root / "tree" / "broken" / "kept.txt").exists()
+    assert not (ftp_root / "tree" / "ok").exists()
\ No newline at end of file
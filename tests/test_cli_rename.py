@@ -0,0 +1,24 @@
+import cli
+
+
+def run(credentials, *args):
+    return cli.main(["-H", credentials["server"], "-P", str(credentials["port"]), "-u", credentials["username"],
+                     "-p", credentials["password"], "-q", *args])
+
+
+def test_rename_does_not_overwrite_items_outside_include(credentials, ftp_root, capsys):
+    (ftp_root / "photo_1.JPG").write_bytes(b"to rename")
+    (ftp_root / "photo_1.jpg").write_bytes(b"keep me")
+
+    assert run(credentials, "rename", "/", r"\.JPG$", ".jpg", "--include", "*.JPG") == 1
+    assert "would replace the existing item photo_1.jpg" in capsys.readouterr().err
+    assert (ftp_root / "photo_1.jpg").read_bytes() == b"keep me"
+    assert (ftp_root / "photo_1.JPG").read_bytes() == b"to rename"
+
+
+def test_rename_with_include(credentials, ftp_root):
+    (ftp_root / "IMG_1.jpg").write_bytes(b"1")
+    (ftp_root / "IMG_2.png").write_bytes(b"2")
+
+    assert run(credentials, "rename", "/", r"^IMG_", "photo_", "--include", "*.jpg") == 0
+    assert sorted(path.name for path in ftp_root.iterdir()) == ["IMG_2.png", "photo_1.jpg"]
\ No newline at end of file
@@ -0,0 +1,47 @@
+import pytest
+
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+from PyQt5.QtWidgets import QApplication
+import client
+from test_client_sync import process_until
+
+
+def connect(window, credentials):
+    window.connect_ftp(credentials["server"], credentials["port"], credentials["username"], credentials["password"])
+
+
+def test_upload_before_login_finishes(app, credentials, ftp_root, tmp_path):
+    local = tmp_path / "drop.txt"
+    local.write_bytes(b"dropped")
+
+    window = client.MainWindow()
+    connect(window, credentials)
+    # As a file dropped on the remote panel right away would be
+    window.upload_external_file(str(local))
+    try:
+        process_until(app, lambda: (ftp_root / "drop.txt").exists() and not window.transfer_engine.queue.unfinished)
+        assert (ftp_root / "drop.txt").read_bytes() == b"dropped"
+    finally:
+        window.transfer_engine.shutdown()
+        window.remote_lister.shutdown()
+        window.ftp.close()
+        window.deleteLater()
+
+
+def test_login_finishing_after_logout_is_ignored(app, monkeypatch, credentials):
+    monkeypatch.setattr(client, "show_login_and_connect", lambda window: (None, False))
+    monkeypatch.setattr(QApplication, "quit", staticmethod(lambda: None))
+    closed = []
+    monkeypatch.setattr(client, "close_session", closed.append, raising=False)
+
+    window = client.MainWindow()
+    connect(window, credentials)
+    window.return_to_login()
+    process_until(app, lambda: closed or window.remote_lister.pool is not None)
+    try:
+        assert window.remote_lister.pool is None
+    finally:
+        for ftp in closed:
+            ftp.close()
+        window.remote_lister.shutdown()
+        window.deleteLater()
\ No newline at end of file
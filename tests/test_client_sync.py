@@ -0,0 +1,53 @@
+import time
+import pytest
+
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QMessageBox
+import client
+
+
+def process_until(app, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        app.processEvents(QEventLoop.AllEvents, 20)
+
+
+def answer(monkeypatch, choice):
+    """Make every QMessageBox pick the button labelled `choice`, or Yes when it has none."""
+    def exec_(box):
+        for button in box.buttons():
+            if button.text() == choice:
+                button.click()
+                return 0
+        return QMessageBox.Yes
+    monkeypatch.setattr(QMessageBox, "exec_", exec_)
+    monkeypatch.setattr(QMessageBox, "information", staticmethod(lambda *args: None))
+    monkeypatch.setattr(QMessageBox, "critical", staticmethod(lambda *args: pytest.fail(str(args[2]))))
+
+
+def test_sync_remote_to_local(app, monkeypatch, credentials, ftp_root, tmp_path):
+    (ftp_root / "docs").mkdir()
+    (ftp_root / "docs" / "a.txt").write_bytes(b"alpha")
+    (ftp_root / "b.bin").write_bytes(b"\0" * 5000)
+    local = tmp_path / "local"
+    local.mkdir()
+
+    window = client.MainWindow()
+    window.local_current_path = str(local)
+    window.connect_ftp(credentials["server"], credentials["port"], credentials["username"], credentials["password"])
+    process_until(app, lambda: window.remote_path_label.text() == "Remote Dir: /")
+
+    answer(monkeypatch, "Remote → Local")
+    window.sync_directories()
+    process_until(app, lambda: (local / "docs" / "a.txt").exists() and (local / "b.bin").exists()
+                  and not window.transfer_engine.queue.unfinished)
+    try:
+        assert (local / "docs" / "a.txt").read_bytes() == b"alpha"
+        assert (local / "b.bin").read_bytes() == b"\0" * 5000
+    finally:
+        window.transfer_engine.shutdown()
+        window.remote_lister.shutdown()
+        window.ftp.close()
+        window.deleteLater()
\ No newline at end of file
@@ -0,0 +1,17 @@
+import calendar
+import pytest
+from list_parser import ListParser
+
+LEAP_DAY = "-rw-r--r--   1 owner    group        1234 Feb 29 12:30 leap.txt"
+
+
+@pytest.mark.parametrize("now, year", [
+    ((2025, 6, 1), 2024),
+    ((2027, 1, 10), 2024),
+    # Feb 29 of this leap year is still ahead
+    ((2028, 1, 10), 2024),
+    ((2028, 5, 1), 2028),
+])
+def test_leap_day_without_year(now, year):
+    parser = ListParser(now=calendar.timegm(now + (0, 0, 0)))
+    assert parser.parse(LEAP_DAY).mtime == calendar.timegm((year, 2, 29, 12, 30, 0))
\ No newline at end of file
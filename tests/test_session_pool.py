@@ -0,0 +1,28 @@
+import socket
+import pytest
+from session_pool import ReconnectingFTP
+
+
+@pytest.fixture
+def session(credentials):
+    ftp = ReconnectingFTP(keepalive=0)
+    ftp.connect(credentials["server"], credentials["port"])
+    ftp.login(credentials["username"], credentials["password"])
+    yield ftp
+    ftp.close()
+
+
+def test_dropped_connection_is_retried(session):
+    session.cwd("/")
+    session.ftp.sock.shutdown(socket.SHUT_RDWR)
+    assert session.pwd() == "/"
+
+
+def test_changes_are_not_retried(session, ftp_root):
+    (ftp_root / "old.txt").write_bytes(b"1")
+    session.ftp.sock.shutdown(socket.SHUT_RDWR)
+    # The server may have renamed it before the connection dropped; sending it again would fail
+    with pytest.raises((OSError, EOFError)):
+        session.rename("old.txt", "new.txt")
+    session.mkd("made")
+    assert sorted(path.name for path in ftp_root.iterdir()) == ["made", "old.txt"]
\ No newline at end of file
@@ -0,0 +1,25 @@
+import os
+import pytest
+from sync import TreeSync
+from transfer_queue import DOWNLOAD, TransferQueue
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="needs symlinks")
+def test_download_sync_deletes_symlink_not_its_directory(credentials, ftp_root, tmp_path):
+    (ftp_root / "a.txt").write_bytes(b"a")
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    (elsewhere / "keep.txt").write_bytes(b"keep")
+    local = tmp_path / "local"
+    local.mkdir()
+    os.symlink(elsewhere, local / "link", target_is_directory=True)
+
+    queue = TransferQueue(workers=1)
+    try:
+        sync = TreeSync(queue, credentials, DOWNLOAD, str(local), "/", delete=True).start()
+        sync.wait()
+    finally:
+        queue.shutdown()
+    assert sync.error is None
+    assert sorted(os.listdir(local)) == ["a.txt"]
+    assert (elsewhere / "keep.txt").read_bytes() == b"keep"
\ No newline at end of file
@@ -0,0 +1,95 @@
+import socket
+import transfer_queue
+from transfer_journal import TransferJournal
+from transfer_queue import CANCELLED, DONE, DOWNLOAD, QUEUED, TransferJob, TransferListener, TransferQueue
+
+
+class StopOnProgress(TransferListener):
+    """Calls `stop` with the queue as soon as a job reports progress."""
+
+    def __init__(self, stop):
+        self.stop = stop
+        self.queue = None
+
+    def job_progress(self, job, rate):
+        if job.status == transfer_queue.RUNNING:
+            self.stop(self.queue, job)
+
+
+def download_job(credentials, tmp_path):
+    return TransferJob(DOWNLOAD, str(tmp_path / "data.bin"), "/", "data.bin", credentials)
+
+
+def test_job_reconnects_when_pooled_session_dropped(credentials, ftp_root, tmp_path):
+    (ftp_root / "data.bin").write_bytes(b"x" * 1000)
+    queue = TransferQueue(workers=1, per_host=1)
+    try:
+        # Leaves a logged-in session in the pool, last used just now
+        pool = queue.session_pool(credentials)
+        ftp = pool.acquire()
+        pool.release(ftp)
+        ftp.sock.shutdown(socket.SHUT_RDWR)
+
+        job = download_job(credentials, tmp_path)
+        queue.submit(job)
+        queue.wait()
+        assert job.status == DONE, job.error
+        assert (tmp_path / "data.bin").read_bytes() == b"x" * 1000
+    finally:
+        queue.shutdown()
+
+
+def run_until_stopped(credentials, ftp_root, tmp_path, monkeypatch, stop):
+    monkeypatch.setattr(transfer_queue, "PROGRESS_INTERVAL", 0)
+    (ftp_root / "data.bin").write_bytes(b"x" * 10_000_000)
+    journal = TransferJournal(":memory:")
+    listener = StopOnProgress(stop)
+    queue = listener.queue = TransferQueue(workers=1, per_host=1, listener=listener, journal=journal)
+    job = download_job(credentials, tmp_path)
+    queue.submit(job)
+    queue.wait()
+    queue.shutdown()
+    assert job.status == CANCELLED
+    return journal.pending(credentials)
+
+
+def test_cancelled_job_is_not_resumed(credentials, ftp_root, tmp_path, monkeypatch):
+    assert run_until_stopped(credentials, ftp_root, tmp_path, monkeypatch,
+                             lambda queue, job: queue.cancel(job.job_id)) == []
+
+
+def test_job_stopped_by_shutdown_is_resumed(credentials, ftp_root, tmp_path, monkeypatch):
+    pending = run_until_stopped(credentials, ftp_root, tmp_path, monkeypatch, lambda queue, job: queue.shutdown())
+    assert [entry["remote_name"] for entry in pending] == ["data.bin"]
+
+
+def test_cancelled_queued_job_is_not_resumed(credentials, tmp_path):
+    journal = TransferJournal(":memory:")
+    job = download_job(credentials, tmp_path)
+    # Left over from an earlier session, then cancelled before it got to run again
+    journal.begin(job, 1000, 500)
+    job.cancelled = True
+    queue = TransferQueue(workers=1, per_host=1, journal=journal)
+    try:
+        queue.submit(job)
+        queue.wait()
+    finally:
+        queue.shutdown()
+    assert job.status == CANCELLED
+    assert journal.pending(credentials) == []
+
+def test_shutdown_leaves_pending_jobs_queued(credentials, ftp_root, tmp_path):
+    (ftp_root / "data.bin").write_bytes(b"x" * 1000)
+    failed = []
+    listener = TransferListener()
+    listener.job_failed = lambda job, message: failed.append(job)
+    queue = TransferQueue(workers=2, per_host=2, listener=listener)
+    jobs = [TransferJob(DOWNLOAD, str(tmp_path / f"{i}.bin"), "/", "data.bin", credentials) for i in range(50)]
+    for job in jobs:
+        queue.submit(job)
+    queue.shutdown()
+    queue.wait()
+    for thread in queue.threads:
+        thread.join(5)
+    assert len(failed) <= 2
+    assert sum(job.status == QUEUED for job in jobs) >= 48
\ No newline at end of file
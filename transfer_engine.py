@@ -0,0 +1,177 @@
+import os
+import sqlite3
+from PyQt5.QtCore import QObject, pyqtSignal
+from batch_operations import RemoteDelete, RemoteRename, RemoteMakeDirs
+from mirror import TreeMirror
+from remote_index import RemoteIndex, RemoteCrawl
+from sync import TreeSync
+from transfer_journal import TransferJournal
+from transfer_queue import TransferQueue, TransferListener, TransferJob, UPLOAD, DOWNLOAD
+
+
+class TransferEngine(QObject, TransferListener):
+    """Qt front end of a TransferQueue.
+
+    Queue callbacks arrive on worker threads and are re-emitted as signals,
+    which Qt delivers on the GUI thread.
+    """
+
+    # job_id, transferred bytes, total bytes, bytes per second
+    progress = pyqtSignal(int, int, int, float)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(int, str)
+    job_done = pyqtSignal(int)
+    job_error = pyqtSignal(int, str)
+    # TreeMirror whose walk has ended; its error is set if it stopped early
+    mirror_finished = pyqtSignal(object)
+    mirror_done = pyqtSignal(object)
+    # RemoteBatch that has ended, with its done count and errors
+    batch_finished = pyqtSignal(object)
+    batch_done = pyqtSignal(object)
+    # RemoteCrawl filling the remote index, while it runs and once it has ended
+    crawl_progress = pyqtSignal(object)
+    crawl_finished = pyqtSignal(object)
+    crawl_done = pyqtSignal(object)
+
+    def __init__(self, parent=None, max_workers=4, per_host=4):
+        super().__init__(parent)
+        self.credentials = {}
+        try:
+            self.journal = TransferJournal()
+        except (OSError, sqlite3.Error):
+            self.journal = None
+        # The remote index is opened on first use; most sessions never search
+        self.index = None
+        self.index_opened = False
+        self.queue = TransferQueue(max_workers, per_host, self, self.journal)
+        self.job_done.connect(self.on_finished)
+        self.job_error.connect(self.on_failed)
+        self.mirror_done.connect(self.on_mirror_done)
+        self.batch_done.connect(self.on_batch_done)
+        self.crawl_done.connect(self.on_crawl_done)
+        self.mirrors = []
+        self.batches = []
+
+    def set_credentials(self, credentials):
+        self.credentials = dict(credentials)
+
+    def set_verify(self, verify):
+        """Check every transfer that starts from now on against the server; see TransferQueue."""
+        self.queue.verify = verify
+
+    def upload(self, local_path, remote_path, remote_name, priority=0):
+        return self.submit(UPLOAD, local_path, remote_path, remote_name, priority)
+
+    def download(self, local_path, remote_path, remote_name, priority=0):
+        return self.submit(DOWNLOAD, local_path, remote_path, remote_name, priority)
+
+    def submit(self, direction, local_path, remote_path, remote_name, priority=0):
+        job = TransferJob(direction, local_path, remote_path, remote_name, self.credentials, priority)
+        return self.queue.submit(job)
+
+    def mirror(self, direction, local_path, remote_path, priority=0):
+        """Transfer a whole directory tree; files are queued while it is walked."""
+        mirror = TreeMirror(self.queue, self.credentials, direction, local_path, remote_path,
+                            priority, self.mirror_done.emit)
+        self.mirrors.append(mirror)
+        return mirror.start()
+
+    def sync(self, direction, local_path, remote_path, dry_run=False, delete=False, use_hash=False, priority=0):
+        """Like mirror(), but only copies what differs; reported through mirror_finished too."""
+        sync = TreeSync(self.queue, self.credentials, direction, local_path, remote_path, priority,
+                        self.mirror_done.emit, dry_run, delete, use_hash)
+        self.mirrors.append(sync)
+        return sync.start()
+
+    def delete_remote(self, files=(), directories=()):
+        """Delete remote files and directory trees; reported through batch_finished."""
+        return self.run_batch(RemoteDelete(self.queue, self.credentials, files, directories, self.batch_done.emit,
+                                           self.queue.per_host))
+
+    def rename_remote(self, directory, renames):
+        return self.run_batch(RemoteRename(self.queue, self.credentials, directory, renames, self.batch_done.emit,
+                                           self.queue.per_host))
+
+    def make_remote_dirs(self, paths):
+        return self.run_batch(RemoteMakeDirs(self.queue, self.credentials, paths, self.batch_done.emit,
+                                             self.queue.per_host))
+
+    def remote_index(self):
+        """The RemoteIndex of searched and crawled servers, or None when it cannot be opened."""
+        if not self.index_opened:
+            self.index_opened = True
+            try:
+                self.index = RemoteIndex()
+            except (OSError, sqlite3.Error):
+                self.index = None
+        return self.index
+
+    def crawl(self, root="/"):
+        """Index the remote tree under `root` in the background; reported through crawl_finished."""
+        crawl = RemoteCrawl(self.queue, self.credentials, self.remote_index(), root, self.crawl_done.emit,
+                            self.crawl_progress.emit, self.queue.per_host)
+        return self.run_batch(crawl)
+
+    def run_batch(self, batch):
+        self.batches.append(batch)
+        return batch.start()
+
+    def resume_pending(self):
+        if self.journal is None:
+            return []
+        job_ids = []
+        for entry in self.journal.pending(self.credentials):
+            if entry["direction"] == UPLOAD and not os.path.exists(entry["local_path"]):
+                self.journal.finish(entry["id"])
+                continue
+            job_ids.append(self.submit(entry["direction"], entry["local_path"], entry["remote_path"], entry["remote_name"]))
+        return job_ids
+
+    def job(self, job_id):
+        return self.queue.job(job_id)
+
+    def counts(self):
+        return self.queue.counts()
+
+    def cancel_all(self):
+        for task in self.mirrors + self.batches:
+            task.cancel()
+        self.queue.cancel_all()
+
+    def shutdown(self):
+        # The queue goes first, so that its jobs count as interrupted rather than cancelled
+        self.queue.shutdown()
+        for task in self.mirrors + self.batches:
+            task.cancel()
+
+    def job_progress(self, job, rate):
+        self.progress.emit(job.job_id, job.transferred, job.total, rate)
+
+    def job_finished(self, job):
+        self.job_done.emit(job.job_id)
+
+    def job_failed(self, job, message):
+        self.job_error.emit(job.job_id, message)
+
+    def on_finished(self, job_id):
+        self.finished.emit(job_id)
+        self.queue.forget(job_id)
+
+    def on_failed(self, job_id, message):
+        self.failed.emit(job_id, message)
+        self.queue.forget(job_id)
+
+    def on_mirror_done(self, mirror):
+        if mirror in self.mirrors:
+            self.mirrors.remove(mirror)
+        self.mirror_finished.emit(mirror)
+
+    def on_batch_done(self, batch):
+        if batch in self.batches:
+            self.batches.remove(batch)
+        self.batch_finished.emit(batch)
+
+    def on_crawl_done(self, crawl):
+        if crawl in self.batches:
+            self.batches.remove(crawl)
+        self.crawl_finished.emit(crawl)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def default_journal_path():
+    return os.path.join(os.path.expanduser("~"), ".ftp_client", "journal.db")
+
+
+class TransferJournal:
+    """On-disk record of unfinished transfers, used to resume them later.
+
+    A row is written when a transfer starts, its offset is advanced while
+    data flows and the row is removed once the transfer completes or is
+    cancelled.
+    """
+
+    def __init__(self, path=None):
+        path = path or default_journal_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transfers ("
+            " id INTEGER PRIMARY KEY,"
+            " server TEXT, port INTEGER, username TEXT, direction TEXT,"
+            " local_path TEXT, remote_path TEXT, remote_name TEXT,"
+            " size INTEGER, offset INTEGER, updated REAL)"
+        )
+        self.db.commit()
+
+    def find(self, job):
+        server, port, username = job.host
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, offset FROM transfers WHERE server=? AND port=? AND username=? AND direction=?"
+                " AND local_path=? AND remote_path=? AND remote_name=?",
+                (server, port, username, job.direction, job.local_path, job.remote_path, job.remote_name),
+            ).fetchone()
+
+    def begin(self, job, size, offset):
+        found = self.find(job)
+        with self.lock:
+            if found:
+                self.db.execute(
+                    "UPDATE transfers SET size=?, offset=?, updated=? WHERE id=?",
+                    (size, offset, time.time(), found[0]),
+                )
+                entry_id = found[0]
+            else:
+                server, port, username = job.host
+                entry_id = self.db.execute(
+                    "INSERT INTO transfers (server, port, username, direction, local_path, remote_path,"
+                    " remote_name, size, offset, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (server, port, username, job.direction, job.local_path, job.remote_path,
+                     job.remote_name, size, offset, time.time()),
+                ).lastrowid
+            self.db.commit()
+        return entry_id
+
+    def update(self, entry_id, offset):
+        with self.lock:
+            self.db.execute("UPDATE transfers SET offset=?, updated=? WHERE id=?", (offset, time.time(), entry_id))
+            self.db.commit()
+
+    def finish(self, entry_id):
+        with self.lock:
+            self.db.execute("DELETE FROM transfers WHERE id=?", (entry_id,))
+            self.db.commit()
+
+    def pending(self, credentials):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, direction, local_path, remote_path, remote_name, size, offset FROM transfers"
+                " WHERE server=? AND port=? AND username=? ORDER BY id",
+                (credentials["server"], credentials["port"], credentials["username"]),
+            ).fetchall()
+        keys = ("id", "direction", "local_path", "remote_path", "remote_name", "size", "offset")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
\ No newline at end of file
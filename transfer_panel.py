@@ -0,0 +1,185 @@
+import time
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QLabel,
+    QPushButton, QFileDialog, QMessageBox
+)
+from file_entries import format_size
+from metrics import registry
+from transfer_queue import UPLOAD
+
+COLUMNS = ("Name", "Progress", "Rate", "Average", "ETA", "Stalls", "Status")
+NAME, PROGRESS, RATE, AVERAGE, ETA, STALLS, STATUS = range(len(COLUMNS))
+# Finished rows beyond this are dropped, oldest first
+MAX_FINISHED = 200
+# Slowest command verbs shown under the table
+SHOWN_COMMANDS = 6
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return ""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class TransferPanel(QWidget):
+    """Live view of a TransferEngine: one row per transfer, plus command round-trip times."""
+
+    def __init__(self, engine, parent=None, metrics=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.metrics = metrics or registry
+        self.rows = {}
+        self.finished = []
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(NAME, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        footer = QHBoxLayout()
+        self.commands_label = QLabel("")
+        self.commands_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        footer.addWidget(self.commands_label)
+        footer.addStretch()
+        self.btn_export = QPushButton("Export Metrics")
+        self.btn_export.clicked.connect(self.export_metrics)
+        footer.addWidget(self.btn_export)
+        self.btn_log = QPushButton("Log to File")
+        self.btn_log.setCheckable(True)
+        self.btn_log.setChecked(self.metrics.log is not None)
+        self.btn_log.toggled.connect(self.toggle_log)
+        footer.addWidget(self.btn_log)
+        layout.addLayout(footer)
+
+        engine.progress.connect(self.on_progress)
+        engine.finished.connect(self.on_finished)
+        engine.failed.connect(self.on_failed)
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh_commands)
+        self.timer.start()
+
+    def row_for(self, job):
+        row = self.rows.get(job.job_id)
+        if row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            arrow = "⬆" if job.direction == UPLOAD else "⬇"
+            self.table.setItem(row, NAME, QTableWidgetItem(f"{arrow} {job.name}"))
+            for column in range(1, len(COLUMNS)):
+                item = QTableWidgetItem("")
+                if column != STATUS:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+            self.rows[job.job_id] = row
+        return row
+
+    def set_text(self, row, column, text):
+        self.table.item(row, column).setText(text)
+
+    def on_progress(self, job_id, transferred, total, rate):
+        job = self.engine.job(job_id)
+        if job is None:
+            return
+        row = self.row_for(job)
+        progress = f"{transferred * 100 // total}%" if total else ""
+        self.set_text(row, PROGRESS, f"{progress} {format_size(transferred)}".strip())
+        self.set_text(row, RATE, f"{format_size(rate)}/s")
+        if job.started_at is not None:
+            elapsed = max(1e-6, job.elapsed or time.monotonic() - job.started_at)
+            self.set_text(row, AVERAGE, f"{format_size((transferred - job.offset) / elapsed)}/s")
+        self.set_text(row, ETA, format_duration(job.eta(rate)))
+        self.set_text(row, STALLS, str(job.stalls) if job.stalls else "")
+        self.set_text(row, STATUS, "Running")
+
+    def on_finished(self, job_id):
+        job = self.engine.job(job_id)
+        if job is None:
+            return
+        row = self.row_for(job)
+        self.set_text(row, RATE, "")
+        self.set_text(row, AVERAGE, f"{format_size(job.average_rate())}/s")
+        self.set_text(row, ETA, "")
+        self.set_text(row, STALLS, f"{job.stalls} ({job.stalled:.1f} s)" if job.stalls else "")
+        status = f"Done in {job.elapsed:.1f} s"
+        if job.verified:
+            status += f", {job.verified} verified"
+        if job.retries:
+            status += f" after {job.retries} retry(s)"
+        self.set_text(row, STATUS, status)
+        self.retire(job_id)
+
+    def on_failed(self, job_id, message):
+        job = self.engine.job(job_id)
+        if job is None:
+            return
+        row = self.row_for(job)
+        self.set_text(row, RATE, "")
+        self.set_text(row, ETA, "")
+        self.set_text(row, STATUS, message)
+        self.table.item(row, STATUS).setToolTip(message)
+        self.retire(job_id)
+
+    def retire(self, job_id):
+        self.finished.append(job_id)
+        while len(self.finished) > MAX_FINISHED:
+            self.remove_row(self.finished.pop(0))
+
+    def remove_row(self, job_id):
+        row = self.rows.pop(job_id)
+        self.table.removeRow(row)
+        for other, other_row in self.rows.items():
+            if other_row > row:
+                self.rows[other] = other_row - 1
+
+    def refresh_commands(self):
+        if not self.isVisible():
+            return
+        summary = self.metrics.command_summary()[:SHOWN_COMMANDS]
+        text = "RTT  " + "   ".join(
+            f"{verb} {average * 1000:.0f} ms (max {longest * 1000:.0f})"
+            for verb, count, average, last, longest in summary
+        ) if summary else ""
+        handshakes, resumed, full_average, resumed_average = self.metrics.tls_summary()
+        if handshakes:
+            text += (f"   TLS {handshakes - resumed} full ({full_average * 1000:.0f} ms),"
+                     f" {resumed} resumed ({resumed_average * 1000:.0f} ms)")
+        self.commands_label.setText(text)
+
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "ftp_client.prom",
+                                              "Prometheus text (*.prom);;All files (*)")
+        if not path:
+            return
+        try:
+            self.metrics.write_prometheus(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not export metrics:\n{e}")
+
+    def toggle_log(self, enabled):
+        path = None
+        if enabled:
+            path, _ = QFileDialog.getSaveFileName(self, "Log Metrics", "ftp_client_metrics.jsonl",
+                                                  "JSON Lines (*.jsonl);;All files (*)")
+            if not path:
+                self.uncheck_log()
+                return
+        try:
+            self.metrics.log_to(path)
+        except OSError as e:
+            self.uncheck_log()
+            QMessageBox.critical(self, "Error", f"Could not open the log file:\n{e}")
+
+    def uncheck_log(self):
+        self.btn_log.blockSignals(True)
+        self.btn_log.setChecked(False)
+        self.btn_log.blockSignals(False)
\ No newline at end of file
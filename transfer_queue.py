@@ -0,0 +1,363 @@
+import heapq
+import os
+import threading
+import time
+from ftplib import error_perm
+from itertools import count
+from checksums import ChecksumMismatch, StreamHasher, checksum_algorithm, verify_transfer
+from ftp_operations import remote_size, set_remote_mtime, upload_file, download_file
+from metrics import registry
+from segmented_download import can_segment, download_segmented
+from session_pool import SessionPool, host_key
+
+UPLOAD = "upload"
+DOWNLOAD = "download"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Minimum seconds between two progress reports of the same job
+PROGRESS_INTERVAL = 0.1
+# Minimum seconds between two journal writes of the same job
+JOURNAL_INTERVAL = 1.0
+# A gap of at least this many seconds between two chunks counts as a stall
+STALL_TIME = 1.0
+# Times a transfer that fails verification is started over
+VERIFY_RETRIES = 2
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class TransferJob:
+    def __init__(self, direction, local_path, remote_path, remote_name, credentials, priority=0):
+        self.job_id = None
+        self.direction = direction
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.remote_name = remote_name
+        self.credentials = credentials
+        self.priority = priority
+        self.status = QUEUED
+        self.error = None
+        self.total = 0
+        self.offset = 0
+        self.transferred = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        # Highest rate over one progress interval, and pauses in the data stream
+        self.peak_rate = 0.0
+        self.stalls = 0
+        self.stalled = 0.0
+        self.cancelled = False
+        # Modification time to give the copy once it is complete
+        self.mtime = None
+        # What the copy was checked with ("SHA-256", "SIZE", ...), and how often it was sent again
+        self.verified = None
+        self.retries = 0
+
+    @property
+    def name(self):
+        return self.remote_name
+
+    @property
+    def host(self):
+        return host_key(self.credentials)
+
+    def average_rate(self):
+        return (self.transferred - self.offset) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def eta(self, rate):
+        """Seconds left at `rate` bytes per second, or None when it cannot be told."""
+        if not self.total or rate <= 0:
+            return None
+        return max(0, self.total - self.transferred) / rate
+
+
+class TransferListener:
+    """Callbacks of a TransferQueue, invoked on its worker threads."""
+
+    def job_progress(self, job, rate):
+        pass
+
+    def job_finished(self, job):
+        pass
+
+    def job_failed(self, job, message):
+        pass
+
+
+class TransferQueue:
+    """Runs transfer jobs on `workers` threads sharing pooled, logged-in sessions.
+
+    Jobs run in priority order (lower first) and FIFO within a priority.
+    No more than `per_host` jobs of the same account run at once.
+    With a `journal`, interrupted single-stream transfers continue from
+    where they stopped the next time the same job is submitted; jobs that
+    are cancelled are dropped from it, while those stopped by shutdown()
+    are kept. With
+    `verify`, each copy is checked against the server's checksum (or at
+    least its size) and transferred again if it does not match.
+    """
+
+    def __init__(self, workers=4, per_host=4, listener=None, journal=None, metrics=None, verify=False):
+        self.per_host = per_host
+        self.verify = verify
+        self.listener = listener or TransferListener()
+        self.journal = journal
+        self.metrics = metrics or registry
+        self.jobs = {}
+        self.pending = {}
+        self.running = {}
+        self.pools = {}
+        self.unfinished = 0
+        self.closed = False
+        self.job_ids = count(1)
+        self.order = count()
+        self.lock = threading.Condition()
+        self.threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self.work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, job):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Transfer queue is closed.")
+            job.job_id = next(self.job_ids)
+            job.status = QUEUED
+            self.jobs[job.job_id] = job
+            heapq.heappush(self.pending.setdefault(job.host, []), (job.priority, next(self.order), job))
+            self.unfinished += 1
+            self.lock.notify()
+        return job.job_id
+
+    def job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def forget(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in (QUEUED, RUNNING):
+                del self.jobs[job_id]
+
+    def counts(self):
+        with self.lock:
+            queued = sum(len(heap) for heap in self.pending.values())
+            running = sum(self.running.values())
+        return queued, running
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancelled = True
+
+    def cancel_all(self):
+        for job in list(self.jobs.values()):
+            job.cancelled = True
+
+    def wait(self):
+        with self.lock:
+            while self.unfinished:
+                self.lock.wait()
+
+    def shutdown(self):
+        # Closed first, so that the jobs stopped here are kept in the journal
+        with self.lock:
+            self.closed = True
+            # Jobs that have not started are not run at all; they stay queued
+            self.unfinished -= sum(len(heap) for heap in self.pending.values())
+            self.pending.clear()
+            self.lock.notify_all()
+        self.cancel_all()
+        for pool in self.pools.values():
+            pool.close()
+
+    def take(self):
+        best = None
+        for host, heap in self.pending.items():
+            if heap and self.running.get(host, 0) < self.per_host:
+                if best is None or heap[0] < self.pending[best][0]:
+                    best = host
+        if best is None:
+            return None
+        return heapq.heappop(self.pending[best])[2]
+
+    def session_pool(self, credentials):
+        with self.lock:
+            return self.pool_for(credentials)
+
+    def pool_for(self, credentials):
+        key = host_key(credentials)
+        pool = self.pools.get(key)
+        if pool is None or pool.credentials != credentials:
+            if pool is not None:
+                pool.close()
+            pool = SessionPool(credentials, self.per_host)
+            self.pools[key] = pool
+        return pool
+
+    def work(self):
+        while True:
+            with self.lock:
+                if self.closed:
+                    return
+                job = self.take()
+                while job is None:
+                    if self.closed:
+                        return
+                    self.lock.wait()
+                    job = self.take()
+                self.running[job.host] = self.running.get(job.host, 0) + 1
+                pool = self.pool_for(job.credentials)
+
+            try:
+                self.run_job(pool, job)
+            finally:
+                with self.lock:
+                    self.running[job.host] -= 1
+                    self.unfinished -= 1
+                    self.lock.notify_all()
+
+    def run_job(self, pool, job):
+        ftp = None
+        try:
+            if job.cancelled:
+                raise TransferCancelled()
+            job.status = RUNNING
+            ftp = pool.acquire_in(job.remote_path)
+            if job.direction == UPLOAD:
+                job.total = os.path.getsize(job.local_path)
+            else:
+                job.total = remote_size(ftp, job.remote_name) or 0
+
+            job.offset = self.resume_offset(ftp, job)
+            job.transferred = job.offset
+            segmented = job.direction == DOWNLOAD and not job.offset and can_segment(ftp, job.total)
+            entry = None
+            if self.journal is not None and not segmented:
+                entry = self.journal.begin(job, job.total, job.offset)
+
+            job.started_at = time.monotonic()
+            on_chunk = self.progress_callback(job, entry)
+            while True:
+                try:
+                    self.transfer(ftp, pool, job, segmented, on_chunk)
+                    break
+                except ChecksumMismatch:
+                    if job.retries >= VERIFY_RETRIES:
+                        raise
+                    # Start over; the part already there is what did not match
+                    job.retries += 1
+                    job.offset = job.transferred = 0
+                    if entry is not None:
+                        self.journal.update(entry, 0)
+
+            job.elapsed = time.monotonic() - job.started_at
+            job.peak_rate = max(job.peak_rate, job.average_rate())
+            if job.mtime is not None:
+                self.preserve_mtime(ftp, job)
+            if entry is not None:
+                self.journal.finish(entry)
+            pool.release(ftp)
+            ftp = None
+            job.status = DONE
+            self.metrics.transfer(job)
+            self.listener.job_progress(job, job.average_rate())
+            self.listener.job_finished(job)
+        except TransferCancelled:
+            job.status = CANCELLED
+            job.error = "Transfer cancelled."
+            if not self.closed:
+                self.forget_entry(job)
+            self.job_ended(job)
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            self.job_ended(job)
+        finally:
+            if ftp is not None:
+                pool.release(ftp, discard=True)
+
+    def transfer(self, ftp, pool, job, segmented, on_chunk):
+        hasher = None
+        if self.verify:
+            algorithm = checksum_algorithm(ftp)
+            if algorithm is not None:
+                hasher = StreamHasher(algorithm, job.local_path, job.offset)
+        try:
+            if job.direction == UPLOAD:
+                upload_file(ftp, job.local_path, job.remote_name, on_chunk, job.offset, digest=hasher)
+            elif segmented:
+                download_segmented(ftp, pool, job.remote_path, job.remote_name, job.local_path, job.total, on_chunk,
+                                   hasher)
+            else:
+                download_file(ftp, job.local_path, job.remote_name, on_chunk, job.offset, digest=hasher)
+        finally:
+            if hasher is not None:
+                hasher.close()
+        if self.verify:
+            job.verified = verify_transfer(ftp, job.local_path, job.remote_name, hasher)
+
+    def job_ended(self, job):
+        if job.started_at is not None:
+            job.elapsed = time.monotonic() - job.started_at
+        self.metrics.transfer(job)
+        self.listener.job_failed(job, job.error)
+
+    def forget_entry(self, job):
+        """Drop the journal row of `job`, so that it is not resumed later."""
+        if self.journal is None:
+            return
+        found = self.journal.find(job)
+        if found is not None:
+            self.journal.finish(found[0])
+
+    def preserve_mtime(self, ftp, job):
+        try:
+            if job.direction == UPLOAD:
+                set_remote_mtime(ftp, job.remote_name, job.mtime)
+            else:
+                os.utime(job.local_path, (job.mtime, job.mtime))
+        except (OSError, error_perm):
+            pass
+
+    def resume_offset(self, ftp, job):
+        if self.journal is None or self.journal.find(job) is None:
+            return 0
+        if job.direction == DOWNLOAD:
+            done = os.path.getsize(job.local_path) if os.path.exists(job.local_path) else 0
+        else:
+            done = remote_size(ftp, job.remote_name) or 0
+        return done if done < job.total else 0
+
+    def progress_callback(self, job, entry=None):
+        last = [job.started_at, job.transferred, job.started_at, None]
+
+        def on_chunk(size):
+            if job.cancelled:
+                raise TransferCancelled()
+            job.transferred += size
+            now = time.monotonic()
+            # The wait for the first chunk is connection setup, not a stall
+            if last[3] is not None and now - last[3] >= STALL_TIME:
+                job.stalls += 1
+                job.stalled += now - last[3]
+            last[3] = now
+            if now - last[0] >= PROGRESS_INTERVAL:
+                # A transfer started over after a failed verification counts from zero again
+                rate = max(0.0, (job.transferred - last[1]) / (now - last[0]))
+                job.peak_rate = max(job.peak_rate, rate)
+                last[0] = now
+                last[1] = job.transferred
+                self.listener.job_progress(job, rate)
+            if entry is not None and now - last[2] >= JOURNAL_INTERVAL:
+                last[2] = now
+                self.journal.update(entry, job.transferred)
+
+        return on_chunk
\ No newline at end of file